@@ -16,4 +16,33 @@ class Settings:
     APP_NAME: str = "Your Project Name"
     DEBUG: bool = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
 
+    # Telegram channels to scrape
+    # Add more channels from https://et.tgstat.com/medicine as needed
+    TELEGRAM_CHANNELS: list = [
+        'https://t.me/CheMed123',
+        'https://t.me/lobelia4cosmetics',
+        'https://t.me/tikvahpharma',
+    ]
+
+    # Fields of each scraped message kept in the data lake JSON records
+    # (id, date, channel_id and channel_name are always kept)
+    TELEGRAM_MESSAGE_FIELDS: list = [
+        field.strip()
+        for field in os.getenv(
+            "TELEGRAM_MESSAGE_FIELDS",
+            "id,date,message,sender_id,channel_id,channel_name,views,forwards,"
+            "replies_count,has_media,media_type,media_local_path",
+        ).split(",")
+        if field.strip()
+    ]
+    # Also write each message's full Telethon payload to cold storage (data/raw/telegram_messages_full)
+    KEEP_RAW_MESSAGE_PAYLOAD: bool = os.getenv("KEEP_RAW_MESSAGE_PAYLOAD", "False").lower() in ("true", "1", "t")
+
+    # First day covered by the date-partitioned Dagster assets
+    PARTITIONS_START_DATE: str = os.getenv("PARTITIONS_START_DATE", "2024-01-01")
+
+def channel_name_from_url(channel_url: str) -> str:
+    """Returns the channel username for a t.me URL or @handle (e.g. 'https://t.me/CheMed123' -> 'CheMed123')."""
+    return channel_url.rstrip('/').split('/')[-1].lstrip('@')
+
 settings = Settings()
@@ -0,0 +1,565 @@
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from dotenv import load_dotenv
+
+# Allow `python scripts/benchmark_pipeline.py` to import the sibling pipeline scripts
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.utils.logging_config import configure_logging  # noqa: E402
+
+# --- Configuration ---
+
+DBT_PROJECT_PATH = os.path.join(PROJECT_ROOT, 'src', 'dbt')
+DEFAULT_OUTPUT_PATH = os.path.join(PROJECT_ROOT, 'data', 'processed', 'benchmarks')
+
+# Synthetic rows use IDs far above real Telegram message IDs so they can be
+# cleaned up without touching real data in the same database.
+SYNTHETIC_ID_OFFSET = 9_000_000_000
+SYNTHETIC_CHANNEL_PREFIX = 'bench_channel_'
+# dbt models that copy synthetic rows, with the column holding a synthetic message or
+# channel ID. Synthetic channel IDs start at SYNTHETIC_ID_OFFSET too.
+DBT_SYNTHETIC_ROW_COLUMNS = {
+    'stg_telegram_messages': 'message_id',
+    'fct_messages': 'message_id',
+    'fct_image_detections': 'message_id',
+    'agg_daily_detections': 'channel_id',
+    'dim_channels': 'channel_id',
+}
+
+SAMPLE_WORDS = [
+    'paracetamol', 'ibuprofen', 'amoxicillin', 'vaccine', 'tablet', 'syrup',
+    'cream', 'mask', 'sanitizer', 'antibiotic', 'price', 'available', 'delivery',
+    'pharmacy', 'Addis', 'Ababa', 'call', 'order', 'new', 'stock', 'discount',
+]
+
+# API endpoints exercised by the load test: (name, path template)
+API_ENDPOINTS = [
+    ('top_products', '/api/reports/top-products?limit=10'),
+    ('channel_activity', '/api/channels/{channel_name}/activity'),
+    ('search_messages', '/api/search/messages?query=tablet&limit=100'),
+    ('object_class_frequency', '/api/detections/classes?limit=20'),
+    ('channel_detections', '/api/channels/{channel_name}/detections'),
+    ('top_detection_images', '/api/detections/person/top-images?limit=20'),
+    ('messages_with_object_class', '/api/detections/person/messages?min_confidence=0.5&limit=100'),
+]
+
+logger = logging.getLogger(__name__)
+
+# --- Synthetic Data Generation ---
+
+def generate_synthetic_data(root_path, num_channels, messages_per_channel, image_ratio, days, seed=42):
+    """
+    Generates synthetic Telegram messages and images in the data/raw layout:
+    <root>/telegram_messages/YYYY-MM-DD/<channel>/<id>.json and
+    <root>/images/<channel>/<id>.jpg.
+    Returns a summary dict with the generated counts and paths.
+    """
+    from PIL import Image # Only needed when generating images
+
+    rng = random.Random(seed)
+    messages_path = os.path.join(root_path, 'telegram_messages')
+    images_path = os.path.join(root_path, 'images')
+    end_date = datetime.now(timezone.utc).replace(hour=12, minute=0, second=0, microsecond=0)
+
+    message_count = 0
+    image_count = 0
+    channel_names = []
+    for channel_index in range(num_channels):
+        channel_name = f"{SYNTHETIC_CHANNEL_PREFIX}{channel_index}"
+        channel_names.append(channel_name)
+        channel_id = SYNTHETIC_ID_OFFSET + channel_index
+
+        for i in range(messages_per_channel):
+            message_id = SYNTHETIC_ID_OFFSET + channel_index * messages_per_channel + i
+            message_date = end_date - timedelta(days=rng.randrange(days), minutes=rng.randrange(24 * 60))
+            date_dir = os.path.join(messages_path, message_date.strftime('%Y-%m-%d'), channel_name)
+            os.makedirs(date_dir, exist_ok=True)
+
+            media_path = None
+            if rng.random() < image_ratio:
+                channel_image_path = os.path.join(images_path, channel_name)
+                os.makedirs(channel_image_path, exist_ok=True)
+                media_path = os.path.join(channel_image_path, f"{message_id}.jpg")
+                color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+                Image.new('RGB', (640, 480), color).save(media_path, 'JPEG')
+                image_count += 1
+
+            text = ' '.join(rng.choice(SAMPLE_WORDS) for _ in range(rng.randint(5, 40)))
+            message_data = {
+                'id': message_id,
+                'date': message_date.isoformat(),
+                'message': text,
+                'sender_id': None,
+                'channel_id': channel_id,
+                'channel_name': channel_name,
+                'views': rng.randrange(10000),
+                'forwards': rng.randrange(100),
+                'replies_count': rng.randrange(20),
+                'has_media': media_path is not None,
+                'media_type': 'MessageMediaPhoto' if media_path else None,
+                'media_local_path': media_path,
+            }
+            with open(os.path.join(date_dir, f"{message_id}.json"), 'w', encoding='utf-8') as f:
+                json.dump(message_data, f, ensure_ascii=False, separators=(',', ':'))
+            message_count += 1
+
+    logger.info(f"Generated {message_count} synthetic messages and {image_count} images in {root_path}")
+    return {
+        'messages_path': messages_path,
+        'images_path': images_path,
+        'channel_names': channel_names,
+        'message_count': message_count,
+        'image_count': image_count,
+    }
+
+# --- Helpers ---
+
+def get_git_commit():
+    """Returns the current git commit hash, or None outside a git checkout."""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def summarize_latencies(latencies_ms):
+    """Returns count/mean/percentile statistics for a list of latencies in milliseconds."""
+    if not latencies_ms:
+        return {'count': 0}
+    ordered = sorted(latencies_ms)
+
+    def percentile(p):
+        index = min(len(ordered) - 1, int(round(p / 100.0 * (len(ordered) - 1))))
+        return round(ordered[index], 3)
+
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.mean(ordered), 3),
+        'p50_ms': percentile(50),
+        'p95_ms': percentile(95),
+        'p99_ms': percentile(99),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+def cleanup_synthetic_rows(conn):
+    """
+    Removes synthetic benchmark rows from the raw tables, and from the dbt models
+    built from them in whichever schema the dbt target uses, so each run starts
+    clean and the marts serve only real data afterwards.
+    """
+    from psycopg2 import sql
+
+    with conn.cursor() as cur:
+        for table in ('raw.telegram_messages', 'raw.image_detections'):
+            cur.execute("SELECT to_regclass(%s)", (table,))
+            if cur.fetchone()[0] is None:
+                continue
+            column = 'id' if table == 'raw.telegram_messages' else 'message_id'
+            cur.execute(f"DELETE FROM {table} WHERE {column} >= %s", (SYNTHETIC_ID_OFFSET,))
+
+        cur.execute(
+            """
+            SELECT c.table_schema, c.table_name, c.column_name
+            FROM information_schema.columns AS c
+            JOIN information_schema.tables AS t USING (table_schema, table_name)
+            WHERE t.table_type = 'BASE TABLE' AND c.table_schema <> 'raw'
+              AND (c.table_name, c.column_name) IN (SELECT * FROM unnest(%s::text[], %s::text[]))
+            """,
+            (list(DBT_SYNTHETIC_ROW_COLUMNS), list(DBT_SYNTHETIC_ROW_COLUMNS.values())),
+        )
+        for schema, table, column in cur.fetchall():
+            cur.execute(
+                sql.SQL("DELETE FROM {}.{} WHERE {} >= %s").format(
+                    sql.Identifier(schema), sql.Identifier(table), sql.Identifier(column)
+                ),
+                (SYNTHETIC_ID_OFFSET,),
+            )
+            if cur.rowcount:
+                logger.info(f"Removed {cur.rowcount} synthetic rows from {schema}.{table}.")
+    conn.commit()
+
+# --- Stage Benchmarks ---
+
+def benchmark_load(synthetic):
+    """Times load_json_to_postgres over the synthetic landing zone."""
+    from scripts import load_to_postgres
+
+    conn = load_to_postgres.get_db_connection()
+    try:
+        cleanup_synthetic_rows(conn)
+    finally:
+        conn.close()
+
+    start = time.perf_counter()
+    load_to_postgres.load_json_to_postgres(raw_messages_path=synthetic['messages_path'])
+    duration = time.perf_counter() - start
+
+    conn = load_to_postgres.get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM raw.telegram_messages WHERE id >= %s", (SYNTHETIC_ID_OFFSET,))
+            rows_loaded = cur.fetchone()[0]
+    finally:
+        conn.close()
+
+    return {
+        'duration_s': round(duration, 4),
+        'rows_loaded': rows_loaded,
+        'messages_per_s': round(rows_loaded / duration, 2) if duration else None,
+    }
+
+class _StubBoxes:
+    """Mimics the subset of ultralytics Boxes used by process_image_for_detection."""
+
+    def __init__(self, detections):
+        self.xyxy = [d[0] for d in detections]
+        self.cls = [d[1] for d in detections]
+        self.conf = [d[2] for d in detections]
+
+class _StubResult:
+    def __init__(self, detections):
+        self.boxes = _StubBoxes(detections)
+
+class StubDetector:
+    """
+    Stand-in for a YOLO model: decodes the image (so file I/O is still measured)
+    and returns a deterministic set of fake detections. Like YOLO it also accepts
+    an already decoded array (e.g. from the image cache).
+    """
+    names = {0: 'person', 1: 'bottle', 2: 'cup', 3: 'cell phone'}
+
+    def __call__(self, image_path, **kwargs):
+        if hasattr(image_path, 'shape'):
+            height, width = image_path.shape[:2]
+            seed = int(image_path[height // 2, width // 2].sum())
+        else:
+            from PIL import Image
+            with Image.open(image_path) as img:
+                img.load()
+                width, height = img.size
+            seed = os.path.getsize(image_path)
+        detections = [
+            ((0, 0, width, height), (seed + k) % len(self.names), 0.5 + ((seed + k) % 50) / 100.0)
+            for k in range(1 + seed % 3)
+        ]
+        return [_StubResult(detections)]
+
+def benchmark_detect(synthetic, yolo_model_path=None, use_image_cache=False):
+    """
+    Times process_image_for_detection over the synthetic images with a stub or real model.
+    With `use_image_cache` the images are preprocessed first (timed separately) and
+    detection reads the cached arrays, as a reprocessing run would.
+    """
+    try:
+        from scripts import detect_objects
+    except ImportError as e:
+        return {'skipped': True, 'reason': f"detect_objects could not be imported: {e}"}
+
+    if yolo_model_path:
+        from ultralytics import YOLO
+        model = YOLO(yolo_model_path)
+        model_name = os.path.basename(yolo_model_path)
+    else:
+        model = StubDetector()
+        model_name = 'stub'
+
+    image_files = []
+    for root, _, files in os.walk(synthetic['images_path']):
+        for file in files:
+            image_files.append((int(os.path.splitext(file)[0]), os.path.join(root, file)))
+
+    image_cache = None
+    preprocess_duration = None
+    if use_image_cache:
+        image_cache = detect_objects.ImageCache(
+            os.path.join(os.path.dirname(synthetic['images_path']), 'image_cache'),
+            size=detect_objects.MODEL_INPUT_SIZE,
+        )
+        preprocess_start = time.perf_counter()
+        detect_objects.preprocess_images(image_paths=[path for _, path in image_files], image_cache=image_cache)
+        preprocess_duration = time.perf_counter() - preprocess_start
+
+    conn = detect_objects.get_db_connection()
+    try:
+        detect_objects.setup_raw_image_detections_table(conn)
+        cleanup_synthetic_rows(conn)
+
+        latencies_ms = []
+        failures = 0
+        start = time.perf_counter()
+        for message_id, image_path in image_files:
+            image_start = time.perf_counter()
+            if not detect_objects.process_image_for_detection(
+                model, image_path, message_id, conn, image_cache=image_cache
+            ):
+                failures += 1
+            latencies_ms.append((time.perf_counter() - image_start) * 1000)
+        duration = time.perf_counter() - start
+    finally:
+        conn.close()
+
+    return {
+        'model': model_name,
+        'image_cache': use_image_cache,
+        'preprocess_s': round(preprocess_duration, 4) if preprocess_duration is not None else None,
+        'duration_s': round(duration, 4),
+        'images': len(image_files),
+        'failures': failures,
+        'images_per_s': round(len(image_files) / duration, 2) if duration else None,
+        'per_image': summarize_latencies(latencies_ms),
+    }
+
+def benchmark_dbt(select='+marts'):
+    """
+    Runs the dbt marts and returns total and per-model execution times from run_results.json.
+    Installs the packages in packages.yml first if they are missing, since `dbt run`
+    refuses to start without them.
+    """
+    dbt_executable = shutil.which('dbt')
+    if not dbt_executable:
+        return {'skipped': True, 'reason': 'dbt executable not found on PATH'}
+
+    packages_installed = os.path.isdir(os.path.join(DBT_PROJECT_PATH, 'dbt_packages'))
+    if os.path.exists(os.path.join(DBT_PROJECT_PATH, 'packages.yml')) and not packages_installed:
+        logger.info("Installing dbt packages (dbt deps)...")
+        result = subprocess.run(
+            [dbt_executable, 'deps'], cwd=DBT_PROJECT_PATH, capture_output=True, text=True, env=os.environ
+        )
+        if result.returncode != 0:
+            logger.error(f"dbt deps failed:\n{result.stdout}\n{result.stderr}")
+            return {'failed': True, 'reason': 'dbt deps failed; the dbt marts were not run'}
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [dbt_executable, 'run', '--select', select],
+        cwd=DBT_PROJECT_PATH, capture_output=True, text=True, env=os.environ
+    )
+    duration = time.perf_counter() - start
+    if result.returncode != 0:
+        logger.error(f"dbt run failed:\n{result.stdout}\n{result.stderr}")
+        return {'duration_s': round(duration, 4), 'failed': True}
+
+    models = {}
+    run_results_path = os.path.join(DBT_PROJECT_PATH, 'target', 'run_results.json')
+    if os.path.exists(run_results_path):
+        with open(run_results_path, 'r', encoding='utf-8') as f:
+            run_results = json.load(f)
+        for node in run_results.get('results', []):
+            model_name = node['unique_id'].split('.')[-1]
+            models[model_name] = {
+                'status': node.get('status'),
+                'execution_time_s': round(node.get('execution_time', 0.0), 4),
+            }
+
+    return {'duration_s': round(duration, 4), 'models': models}
+
+def _find_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _wait_for_api(base_url, timeout_s=30):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f"{base_url}/openapi.json", timeout=2):
+                return True
+        except (urllib.error.URLError, ConnectionError):
+            time.sleep(0.2)
+    return False
+
+def _timed_request(url):
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, ConnectionError):
+        status = None
+    return (time.perf_counter() - start) * 1000, status
+
+def benchmark_api(channel_name, concurrency, requests_per_endpoint, api_url=None):
+    """
+    Load-tests each FastAPI endpoint with a thread pool of `concurrency` clients.
+    Starts a local uvicorn server unless `api_url` points at a running instance.
+    """
+    server = None
+    base_url = api_url
+    if base_url is None:
+        port = _find_free_port()
+        base_url = f"http://127.0.0.1:{port}"
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'uvicorn', 'src.api.main:app', '--host', '127.0.0.1',
+             '--port', str(port), '--log-level', 'warning'],
+            cwd=PROJECT_ROOT, env=os.environ
+        )
+    try:
+        if not _wait_for_api(base_url):
+            return {'skipped': True, 'reason': f"API did not become ready at {base_url}"}
+
+        results = {}
+        for name, path in API_ENDPOINTS:
+            url = base_url + path.format(channel_name=urllib.parse.quote(channel_name))
+            _timed_request(url) # Warm-up request (connection setup, plan caching)
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                responses = list(executor.map(_timed_request, [url] * requests_per_endpoint))
+            duration = time.perf_counter() - start
+
+            status_counts = {}
+            for _, status in responses:
+                status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+            results[name] = {
+                'concurrency': concurrency,
+                'duration_s': round(duration, 4),
+                'requests_per_s': round(len(responses) / duration, 2) if duration else None,
+                'status_counts': status_counts,
+                'latency': summarize_latencies([latency for latency, _ in responses]),
+            }
+        return results
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+# --- Reporting ---
+
+def compare_with_baseline(report, baseline_path):
+    """Logs the relative change of each stage's headline duration against a previous report."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    def headline(results):
+        values = {}
+        for stage in ('load', 'detect', 'dbt'):
+            if 'duration_s' in results.get(stage, {}):
+                values[stage] = results[stage]['duration_s']
+        for name, endpoint in results.get('api', {}).items():
+            if isinstance(endpoint, dict) and 'p95_ms' in endpoint.get('latency', {}):
+                values[f"api.{name}.p95_ms"] = endpoint['latency']['p95_ms']
+        return values
+
+    current, previous = headline(report['results']), headline(baseline['results'])
+    comparison = {}
+    for key, value in current.items():
+        if previous.get(key):
+            change = (value - previous[key]) / previous[key] * 100
+            comparison[key] = {'baseline': previous[key], 'current': value, 'change_pct': round(change, 2)}
+            logger.info(f"{key}: {previous[key]} -> {value} ({change:+.1f}%)")
+    return {'baseline_commit': baseline.get('meta', {}).get('git_commit'), 'metrics': comparison}
+
+def main():
+    """Parses arguments, generates synthetic data and runs the selected stage benchmarks."""
+    parser = argparse.ArgumentParser(description="Benchmark the ingest, load, detect and API hot paths.")
+    parser.add_argument('--channels', type=int, default=3, help='Number of synthetic channels.')
+    parser.add_argument('--messages-per-channel', type=int, default=1000, help='Synthetic messages per channel.')
+    parser.add_argument('--image-ratio', type=float, default=0.3, help='Fraction of messages that carry an image.')
+    parser.add_argument('--days', type=int, default=30, help='Number of days the synthetic messages span.')
+    parser.add_argument('--stages', default='load,detect,dbt,api',
+                        help='Comma-separated stages to run (load, detect, dbt, api).')
+    parser.add_argument('--yolo-model', default=None,
+                        help='Path to YOLO weights (e.g. yolov8n.pt). Uses a stub detector if omitted.')
+    parser.add_argument('--image-cache', action='store_true',
+                        help='Preprocess images into the image cache and detect from the cached arrays.')
+    parser.add_argument('--dbt-select', default='+marts', help='dbt selector for the marts benchmark.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent API clients.')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per API endpoint.')
+    parser.add_argument('--api-url', default=None, help='Benchmark a running API instead of starting one.')
+    parser.add_argument('--data-dir', default=None, help='Where to write synthetic data (default: temp dir).')
+    parser.add_argument('--keep-data', action='store_true', help='Keep the synthetic data and database rows.')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT_PATH, help='Directory for JSON result files.')
+    parser.add_argument('--baseline', default=None, help='Previous result file to compare against.')
+    args = parser.parse_args()
+    # The pipeline scripts read their database settings from the environment on import
+    load_dotenv()
+    configure_logging()
+
+    stages = [s.strip() for s in args.stages.split(',') if s.strip()]
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='telegram_bench_')
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'git_commit': get_git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+        },
+        'results': {},
+    }
+
+    try:
+        synthetic = generate_synthetic_data(
+            data_dir, args.channels, args.messages_per_channel, args.image_ratio, args.days
+        )
+        report['results']['dataset'] = {
+            'messages': synthetic['message_count'],
+            'images': synthetic['image_count'],
+            'channels': len(synthetic['channel_names']),
+        }
+
+        if 'load' in stages:
+            logger.info("Benchmarking load_json_to_postgres...")
+            report['results']['load'] = benchmark_load(synthetic)
+        if 'detect' in stages:
+            logger.info("Benchmarking process_image_for_detection...")
+            report['results']['detect'] = benchmark_detect(synthetic, args.yolo_model, args.image_cache)
+        if 'dbt' in stages:
+            logger.info("Benchmarking dbt marts...")
+            report['results']['dbt'] = benchmark_dbt(args.dbt_select)
+        if 'api' in stages:
+            logger.info("Benchmarking API endpoints...")
+            report['results']['api'] = benchmark_api(
+                synthetic['channel_names'][0], args.concurrency, args.requests, args.api_url
+            )
+
+        if args.baseline:
+            report['comparison'] = compare_with_baseline(report, args.baseline)
+    finally:
+        if not args.keep_data:
+            if {'load', 'detect', 'dbt'} & set(stages):
+                try:
+                    from scripts import load_to_postgres
+                    conn = load_to_postgres.get_db_connection()
+                    try:
+                        cleanup_synthetic_rows(conn)
+                    finally:
+                        conn.close()
+                except Exception as e:
+                    logger.warning(f"Could not clean up synthetic rows: {e}")
+            if args.data_dir is None:
+                shutil.rmtree(data_dir, ignore_errors=True)
+
+    os.makedirs(args.output, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    output_file = os.path.join(args.output, f"{timestamp}_{report['meta']['git_commit'] or 'nogit'}.json")
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Benchmark results written to {output_file}")
+
+if __name__ == '__main__':
+    main()
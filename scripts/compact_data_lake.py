@@ -0,0 +1,227 @@
+import os
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime, timedelta, timezone
+from psycopg2 import sql
+from dotenv import load_dotenv
+
+# Allow `python scripts/compact_data_lake.py` to import the shared helpers under src/
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.utils.metrics import StageMetrics  # noqa: E402
+from src.utils.logging_config import configure_logging  # noqa: E402
+from src.utils.profiling import add_profile_argument, profiled  # noqa: E402
+from src.utils.data_lake import compact_partition, iter_message_json_files  # noqa: E402
+
+# --- Configuration and Environment Setup ---
+# Load environment variables from .env file when run as a script; importers
+# (src/cli.py, the Dagster ops) load the environment themselves.
+if __name__ == '__main__':
+    load_dotenv()
+
+# Data Lake paths, anchored at the project root like the other stages'
+RAW_MESSAGES_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw', 'telegram_messages')
+TELEGRAM_IMAGES_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw', 'images')
+
+# Daily message partitions older than this many days are compacted into Parquet
+COMPACT_AFTER_DAYS = int(os.getenv('DATA_LAKE_COMPACT_AFTER_DAYS', '7'))
+# Images older than this many days are deleted once their message is loaded and the
+# current model has processed them. 0 keeps every image.
+IMAGE_RETENTION_DAYS = int(os.getenv('IMAGE_RETENTION_DAYS', '0'))
+
+# Message IDs looked up per query when checking which images were loaded
+ID_LOOKUP_BATCH_SIZE = 10000
+
+# Log file used when run from the command line (see configure_logging)
+LOG_FILE = 'compaction.log'
+
+logger = logging.getLogger(__name__)
+
+# --- Compaction ---
+
+def compact_data_lake(raw_messages_path=None, older_than_days=None, dry_run=False, metrics=None):
+    """
+    Compacts every date/channel partition older than `older_than_days` (default
+    COMPACT_AFTER_DAYS) that still has per-message JSON files; see
+    src/utils/data_lake.py for the layout. With `dry_run` only counts what would
+    be compacted. Returns the StageMetrics for the run.
+    """
+    raw_messages_path = raw_messages_path or RAW_MESSAGES_PATH
+    older_than_days = COMPACT_AFTER_DAYS if older_than_days is None else older_than_days
+    if metrics is None:
+        metrics = StageMetrics('compact', rate_counters=('messages_compacted',))
+    if not os.path.isdir(raw_messages_path):
+        logger.warning(f"Raw messages directory does not exist: {raw_messages_path}")
+        return metrics
+
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=older_than_days)
+    for date_dir in sorted(os.listdir(raw_messages_path)):
+        date_path = os.path.join(raw_messages_path, date_dir)
+        try:
+            partition_date = datetime.strptime(date_dir, '%Y-%m-%d').date()
+        except ValueError:
+            continue # Not a daily partition
+        if not os.path.isdir(date_path) or partition_date >= cutoff:
+            continue
+
+        for channel_dir in sorted(os.listdir(date_path)):
+            channel_path = os.path.join(date_path, channel_dir)
+            if not os.path.isdir(channel_path):
+                continue
+            json_paths = list(iter_message_json_files(channel_path))
+            if not json_paths:
+                continue # Already compacted and nothing new arrived
+            json_bytes = sum(os.path.getsize(p) for p in json_paths)
+            if dry_run:
+                logger.info(f"Would compact {len(json_paths)} files ({json_bytes} bytes) in {channel_path}.")
+                metrics.increment('partitions_to_compact')
+                metrics.increment('files_to_compact', len(json_paths))
+                continue
+            try:
+                with metrics.timer('compact'):
+                    index = compact_partition(channel_path)
+            except Exception as e:
+                logger.error(f"Error compacting {channel_path}: {e}", exc_info=True)
+                metrics.increment('compaction_errors')
+                continue
+            metrics.increment('partitions_compacted')
+            metrics.increment('files_removed', len(json_paths))
+            metrics.increment('messages_compacted', index['rows'])
+            metrics.increment('json_bytes_removed', json_bytes)
+            metrics.increment('parquet_bytes_written', index['bytes'])
+            logger.info(f"Compacted {len(json_paths)} files of {channel_path} into {index['rows']} rows ({index['bytes']} bytes).")
+    return metrics
+
+# --- Image Retention ---
+
+def loaded_message_ids(conn, message_ids):
+    """Returns the subset of `message_ids` present in raw.telegram_messages."""
+    from scripts.load_to_postgres import TARGET_SCHEMA, TARGET_TABLE
+
+    loaded = set()
+    message_ids = list(message_ids)
+    query = sql.SQL("SELECT id FROM {}.{} WHERE id = ANY(%s);").format(
+        sql.Identifier(TARGET_SCHEMA), sql.Identifier(TARGET_TABLE)
+    )
+    with conn.cursor() as cur:
+        for start in range(0, len(message_ids), ID_LOOKUP_BATCH_SIZE):
+            cur.execute(query, (message_ids[start:start + ID_LOOKUP_BATCH_SIZE],))
+            loaded.update(row[0] for row in cur.fetchall())
+    return loaded
+
+def apply_image_retention(images_path=None, retention_days=None, dry_run=False, metrics=None):
+    """
+    Deletes images older than `retention_days` (default IMAGE_RETENTION_DAYS, by file
+    modification time) whose message is in raw.telegram_messages and which the
+    current detection model has already processed. Images still waiting to be
+    loaded or enriched, e.g. during a model upgrade, are kept. With `dry_run` only
+    counts what would be deleted. Returns the StageMetrics for the run.
+    """
+    from scripts import detect_objects
+
+    images_path = images_path or TELEGRAM_IMAGES_PATH
+    retention_days = IMAGE_RETENTION_DAYS if retention_days is None else retention_days
+    if metrics is None:
+        metrics = StageMetrics('compact', rate_counters=('images_deleted',))
+    if not retention_days:
+        logger.info("Image retention is disabled (IMAGE_RETENTION_DAYS=0).")
+        return metrics
+    if not os.path.isdir(images_path):
+        logger.warning(f"Image directory does not exist: {images_path}")
+        return metrics
+
+    cutoff_ts = time.time() - retention_days * 86400
+    candidates = []
+    for image_full_path in detect_objects.iter_image_files(images_path):
+        try:
+            message_id = int(os.path.splitext(os.path.basename(image_full_path))[0])
+        except ValueError:
+            continue
+        if os.path.getmtime(image_full_path) < cutoff_ts:
+            candidates.append((image_full_path, message_id))
+    logger.info(f"{len(candidates)} image(s) are older than {retention_days} days.")
+    if not candidates:
+        return metrics
+
+    conn = None
+    try:
+        conn = detect_objects.get_db_connection()
+        loaded_ids = loaded_message_ids(conn, {message_id for _, message_id in candidates})
+        enriched_ids = detect_objects.get_processed_image_ids(conn)
+    except Exception as e:
+        logger.error(f"Could not check which images were loaded and enriched; keeping all images: {e}", exc_info=True)
+        metrics.increment('retention_errors')
+        return metrics
+    finally:
+        if conn:
+            conn.close()
+
+    for image_full_path, message_id in candidates:
+        if message_id not in loaded_ids:
+            metrics.increment('images_kept_unloaded')
+            continue
+        if message_id not in enriched_ids:
+            metrics.increment('images_kept_unenriched')
+            continue
+        size_bytes = os.path.getsize(image_full_path)
+        if dry_run:
+            metrics.increment('images_to_delete')
+            metrics.increment('image_bytes_to_free', size_bytes)
+            continue
+        try:
+            os.remove(image_full_path)
+        except OSError as e:
+            logger.error(f"Error deleting {image_full_path}: {e}")
+            metrics.increment('retention_errors')
+            continue
+        metrics.increment('images_deleted')
+        metrics.increment('image_bytes_freed', size_bytes)
+    logger.info(
+        f"Image retention: {metrics.counters.get('images_deleted', 0)} deleted, "
+        f"{metrics.counters.get('images_kept_unloaded', 0)} kept (not loaded), "
+        f"{metrics.counters.get('images_kept_unenriched', 0)} kept (not enriched)."
+    )
+    return metrics
+
+def run_maintenance(raw_messages_path=None, images_path=None, older_than_days=None, retention_days=None,
+                    dry_run=False, metrics=None):
+    """Compacts old message partitions, then applies image retention. Returns the StageMetrics."""
+    if metrics is None:
+        metrics = StageMetrics('compact', rate_counters=('messages_compacted', 'images_deleted'))
+    compact_data_lake(raw_messages_path, older_than_days=older_than_days, dry_run=dry_run, metrics=metrics)
+    apply_image_retention(images_path, retention_days=retention_days, dry_run=dry_run, metrics=metrics)
+    return metrics
+
+def main():
+    """Compacts the data lake and applies image retention."""
+    parser = argparse.ArgumentParser(description="Compact old data lake partitions and apply image retention.")
+    parser.add_argument('--raw-messages-path', default=RAW_MESSAGES_PATH,
+                        help='Root of the per-message JSON partitions.')
+    parser.add_argument('--images-path', default=TELEGRAM_IMAGES_PATH,
+                        help='Directory containing the scraped images.')
+    parser.add_argument('--older-than-days', type=int, default=COMPACT_AFTER_DAYS,
+                        help='Compact daily partitions older than this many days.')
+    parser.add_argument('--image-retention-days', type=int, default=IMAGE_RETENTION_DAYS,
+                        help='Delete loaded and enriched images older than this many days (0 keeps all images).')
+    parser.add_argument('--dry-run', action='store_true',
+                        help='Report what would be compacted and deleted without changing anything.')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    configure_logging(LOG_FILE)
+
+    with profiled('compact', args.profile):
+        metrics = run_maintenance(
+            raw_messages_path=args.raw_messages_path,
+            images_path=args.images_path,
+            older_than_days=args.older_than_days,
+            retention_days=args.image_retention_days,
+            dry_run=args.dry_run,
+        )
+    metrics.emit()
+
+if __name__ == '__main__':
+    main()
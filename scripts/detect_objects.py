@@ -1,15 +1,29 @@
 import os
+import sys
 import json
+import time
 import logging
+import argparse
 from datetime import datetime
 import psycopg2
 from psycopg2 import sql
 from dotenv import load_dotenv
-from ultralytics import YOLO
-from ultralytics.utils.downloads import download # Import the download utility
+
+# Allow `python scripts/detect_objects.py` to import the shared helpers under src/
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.utils.metrics import StageMetrics  # noqa: E402
+from src.utils.image_cache import ImageCache  # noqa: E402
+from src.utils.logging_config import configure_logging  # noqa: E402
+from src.utils.profiling import add_profile_argument, profiled  # noqa: E402
 
 # --- Configuration and Environment Setup ---
-load_dotenv()
+# Load environment variables from .env file when run as a script; importers
+# (src/cli.py, the Dagster ops) load the environment themselves.
+if __name__ == '__main__':
+    load_dotenv()
 
 # PostgreSQL connection details from environment variables
 POSTGRES_USER = os.getenv('POSTGRES_USER')
@@ -18,30 +32,43 @@ POSTGRES_DB = os.getenv('POSTGRES_DB')
 POSTGRES_HOST = os.getenv('POSTGRES_HOST')
 POSTGRES_PORT = os.getenv('POSTGRES_PORT')
 
-# Data Lake paths (where images are stored)
-BASE_DATA_PATH = 'data/raw'
+# Data Lake paths (where images are stored), anchored at the project root like the
+# scraper's, so every stage reads the same tree whatever the working directory
+BASE_DATA_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw')
 TELEGRAM_IMAGES_PATH = os.path.join(BASE_DATA_PATH, 'images')
 
 # Define a directory within your project to store downloaded YOLO models
 # This will be /app/yolo_models inside the Docker container
 YOLO_MODELS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'yolo_models')
-os.makedirs(YOLO_MODELS_PATH, exist_ok=True) # Ensure the directory exists
 
 # Define the path where the YOLO model weights will be stored
-# YOLO_MODEL_NAME = 'yolov8n.pt'
-# YOLO_MODEL_NAME = 'yolov8s.pt'
-YOLO_MODEL_NAME = 'yolov8m.pt'  # Use a medium model for better accuracy
+# e.g. YOLO_MODEL_NAME=yolov8n.pt or yolov8s.pt; defaults to a medium model for better accuracy
+YOLO_MODEL_NAME = os.getenv('YOLO_MODEL_NAME', 'yolov8m.pt')
+# Release of the ultralytics/assets repository the weights are downloaded from.
+# Set a distinct value when deploying custom (e.g. fine-tuned) weights under the same name.
+YOLO_MODEL_VERSION = os.getenv('YOLO_MODEL_VERSION', 'v8.1.0')
 YOLO_MODEL_FULL_PATH = os.path.join(YOLO_MODELS_PATH, YOLO_MODEL_NAME)
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("object_detection.log"), # Log to a file
-        logging.StreamHandler()                      # Also log to console
-    ]
-)
+# Inference thresholds (the Ultralytics defaults unless overridden)
+CONFIDENCE_THRESHOLD = float(os.getenv('YOLO_CONFIDENCE_THRESHOLD', '0.25'))
+IOU_THRESHOLD = float(os.getenv('YOLO_IOU_THRESHOLD', '0.7'))
+
+# Detections made before rows were tagged with their model came from this configuration
+LEGACY_MODEL = ('yolov8m.pt', 'v8.1.0', 0.25, 0.7)
+
+# Optional cache of decoded, letterboxed model inputs (see src/utils/image_cache.py)
+IMAGE_CACHE_PATH = os.path.join(PROJECT_ROOT, 'data', 'processed', 'image_cache')
+MODEL_INPUT_SIZE = 640
+
+# Attempts --watch mode makes at an image whose detection fails before giving up on it
+WATCH_MAX_ATTEMPTS = 3
+# Longest --watch mode waits for its stop file without new images, in case the scrape
+# that should write it never runs; twice the longest FLOOD_WAIT the scraper sits out
+WATCH_MAX_WAIT_S = float(os.getenv('WATCH_MAX_WAIT_S', '7200'))
+
+# Log file used when run from the command line (see configure_logging)
+LOG_FILE = 'object_detection.log'
+
 logger = logging.getLogger(__name__)
 
 # --- Database Connection and Schema Management ---
@@ -65,7 +92,11 @@ def get_db_connection():
 def setup_raw_image_detections_table(conn):
     """
     Ensures the raw.image_detections table exists in the PostgreSQL database.
-    This table will store raw YOLO detection results.
+    This table will store raw YOLO detection results, tagged with the model name,
+    version and thresholds that produced them. Tables from before the model columns
+    existed are migrated, and their rows attributed to LEGACY_MODEL.
+    Also ensures raw.image_detection_runs, which records every image a model has
+    processed (including images without detections).
     """
     try:
         with conn.cursor() as cur:
@@ -83,12 +114,64 @@ def setup_raw_image_detections_table(conn):
                     detected_object_class TEXT NOT NULL,
                     confidence_score NUMERIC(5, 4) NOT NULL,
                     detection_timestamp TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                    -- Add a unique constraint to prevent duplicate detections for the same image/object
-                    UNIQUE (message_id, image_path, detected_object_class)
+                    model_name TEXT,
+                    model_version TEXT,
+                    confidence_threshold NUMERIC(4, 3),
+                    iou_threshold NUMERIC(4, 3),
+                    -- Add a unique constraint to prevent duplicate detections for the same image/object/model
+                    UNIQUE (message_id, image_path, detected_object_class, model_name, model_version)
+                );
+            """))
+
+            # Migrate tables created before detections were tagged with their model. Only done
+            # when the columns are missing, since ALTER TABLE locks out concurrent readers.
+            cur.execute("""
+                SELECT 1 FROM information_schema.columns
+                WHERE table_schema = 'raw' AND table_name = 'image_detections' AND column_name = 'model_name';
+            """)
+            if cur.fetchone() is None:
+                logger.info("Adding model columns to 'raw.image_detections'.")
+                cur.execute("""
+                    ALTER TABLE raw.image_detections
+                        ADD COLUMN model_name TEXT,
+                        ADD COLUMN model_version TEXT,
+                        ADD COLUMN confidence_threshold NUMERIC(4, 3),
+                        ADD COLUMN iou_threshold NUMERIC(4, 3);
+                """)
+                cur.execute("""
+                    UPDATE raw.image_detections
+                    SET model_name = %s, model_version = %s, confidence_threshold = %s, iou_threshold = %s;
+                """, LEGACY_MODEL)
+                cur.execute("""
+                    DO $$
+                    DECLARE old_key TEXT;
+                    BEGIN
+                        -- The original unique key did not include the model, so a new model could not add rows
+                        SELECT conname INTO old_key FROM pg_constraint
+                        WHERE conrelid = 'raw.image_detections'::regclass AND contype = 'u';
+                        IF old_key IS NOT NULL THEN
+                            EXECUTE format('ALTER TABLE raw.image_detections DROP CONSTRAINT %I', old_key);
+                        END IF;
+                    END $$;
+                """)
+                cur.execute("""
+                    ALTER TABLE raw.image_detections
+                        ADD UNIQUE (message_id, image_path, detected_object_class, model_name, model_version);
+                """)
+
+            cur.execute(sql.SQL("""
+                CREATE TABLE IF NOT EXISTS raw.image_detection_runs (
+                    message_id BIGINT NOT NULL,
+                    image_path TEXT NOT NULL,
+                    model_name TEXT NOT NULL,
+                    model_version TEXT NOT NULL,
+                    detections INTEGER NOT NULL,
+                    processed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (image_path, model_name, model_version)
                 );
             """))
             conn.commit()
-            logger.info("Ensured 'raw.image_detections' table exists.")
+            logger.info("Ensured 'raw.image_detections' and 'raw.image_detection_runs' tables exist.")
     except Exception as e:
         logger.error(f"Error setting up raw.image_detections table: {e}")
         raise
@@ -97,12 +180,20 @@ def setup_raw_image_detections_table(conn):
 
 def load_yolo_model():
     """Loads a pre-trained YOLOv8 model, handling download explicitly."""
+    # Imported here: ultralytics pulls in torch, which takes seconds to import
+    from ultralytics import YOLO
+    from ultralytics.utils.downloads import download
+
     try:
         # Check if model already exists locally
         if not os.path.exists(YOLO_MODEL_FULL_PATH):
+            os.makedirs(YOLO_MODELS_PATH, exist_ok=True)
             logger.info(f"Downloading YOLOv8n model weights to: {YOLO_MODEL_FULL_PATH}")
             # Use ultralytics' internal download utility
-            download(f'https://github.com/ultralytics/assets/releases/download/v8.1.0/{YOLO_MODEL_NAME}', YOLO_MODELS_PATH)
+            download(
+                f'https://github.com/ultralytics/assets/releases/download/{YOLO_MODEL_VERSION}/{YOLO_MODEL_NAME}',
+                YOLO_MODELS_PATH,
+            )
             logger.info("YOLOv8n model weights downloaded successfully.")
         else:
             logger.info(f"YOLOv8n model weights already exist at: {YOLO_MODEL_FULL_PATH}")
@@ -115,34 +206,66 @@ def load_yolo_model():
         logger.critical(f"Failed to load YOLOv8 model: {e}", exc_info=True)
         raise
 
-def get_processed_image_ids(conn):
+def describe_model():
+    """Returns the model name, version and thresholds detections are tagged with."""
+    return {
+        'model_name': YOLO_MODEL_NAME,
+        'model_version': YOLO_MODEL_VERSION,
+        'confidence_threshold': CONFIDENCE_THRESHOLD,
+        'iou_threshold': IOU_THRESHOLD,
+    }
+
+def get_processed_image_ids(conn, any_model=False):
     """
-    Retrieves a set of message_ids for images that have already been processed
-    and have entries in raw.image_detections.
+    Retrieves a set of message_ids for images that the current model (see
+    describe_model) has already processed, with or without detections. With
+    `any_model`, images processed by any model count, so a model upgrade is left
+    to the budgeted --reenrich mode instead of the regular runs.
     """
     processed_ids = set()
+    model_info = describe_model()
+    model_filter = "" if any_model else " WHERE model_name = %(model_name)s AND model_version = %(model_version)s"
     try:
         with conn.cursor() as cur:
-            cur.execute("SELECT DISTINCT message_id FROM raw.image_detections")
+            cur.execute(
+                "SELECT message_id FROM raw.image_detection_runs" + model_filter
+                + " UNION SELECT message_id FROM raw.image_detections" + model_filter + ";",
+                model_info,
+            )
             for row in cur.fetchall():
                 processed_ids.add(row[0])
-        logger.info(f"Found {len(processed_ids)} previously processed image message IDs.")
+        processed_by = "any model" if any_model else f"{model_info['model_name']} ({model_info['model_version']})"
+        logger.info(f"Found {len(processed_ids)} image message IDs already processed by {processed_by}.")
     except Exception as e:
         logger.error(f"Error retrieving processed image IDs: {e}")
     return processed_ids
 
-def process_image_for_detection(model, image_full_path, message_id, conn):
+def process_image_for_detection(model, image_full_path, message_id, conn, metrics=None, image_cache=None):
     """
-    Performs object detection on a single image and stores results in the database.
+    Performs object detection on a single image and stores results in the database,
+    tagged with the current model (see describe_model). With an `image_cache` the
+    model gets the cached letterboxed array instead of the file.
+    Inference and insert times and the detection count are recorded in `metrics`.
     """
+    if metrics is None:
+        metrics = StageMetrics('detect')
     try:
-        logger.info(f"Processing image: {image_full_path} (Message ID: {message_id})")
-        
+        logger.debug(f"Processing image: {image_full_path} (Message ID: {message_id})")
+
+        source = image_full_path
+        if image_cache is not None:
+            with metrics.timer('preprocess'):
+                source = image_cache.load(image_full_path)
+
+        model_info = describe_model()
+
         # Perform inference
-        results = model(image_full_path) #, conf=0.1,  imgsz=640) # YOLOv8 returns a list of Results objects
+        with metrics.timer('inference'):
+            # YOLOv8 returns a list of Results objects
+            results = model(source, conf=model_info['confidence_threshold'], iou=model_info['iou_threshold'])
 
         detections_found = 0
-        with conn.cursor() as cur:
+        with metrics.timer('db_insert'), conn.cursor() as cur:
             for r in results:
                 # Iterate over detected objects
                 for box, cls, conf in zip(r.boxes.xyxy, r.boxes.cls, r.boxes.conf):
@@ -152,20 +275,33 @@ def process_image_for_detection(model, image_full_path, message_id, conn):
                     # Insert into raw.image_detections
                     insert_query = sql.SQL("""
                         INSERT INTO raw.image_detections (
-                            message_id, image_path, detected_object_class, confidence_score
+                            message_id, image_path, detected_object_class, confidence_score,
+                            model_name, model_version, confidence_threshold, iou_threshold
                         ) VALUES (
-                            %s, %s, %s, %s
-                        ) ON CONFLICT (message_id, image_path, detected_object_class) DO NOTHING;
+                            %s, %s, %s, %s, %s, %s, %s, %s
+                        ) ON CONFLICT (message_id, image_path, detected_object_class, model_name, model_version) DO NOTHING;
                     """)
                     cur.execute(insert_query, (
                         message_id,
                         image_full_path,
                         detected_class,
-                        confidence_score
+                        confidence_score,
+                        model_info['model_name'],
+                        model_info['model_version'],
+                        model_info['confidence_threshold'],
+                        model_info['iou_threshold'],
                     ))
                     detections_found += 1
+            # Record the image as processed by this model, even if nothing was found
+            cur.execute("""
+                INSERT INTO raw.image_detection_runs (message_id, image_path, model_name, model_version, detections)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (image_path, model_name, model_version)
+                DO UPDATE SET detections = EXCLUDED.detections, processed_at = CURRENT_TIMESTAMP;
+            """, (message_id, image_full_path, model_info['model_name'], model_info['model_version'], detections_found))
             conn.commit()
-        logger.info(f"Finished processing {image_full_path}. Found {detections_found} detections.")
+        metrics.increment('detections', detections_found)
+        logger.debug(f"Finished processing {image_full_path}. Found {detections_found} detections.")
         return True
     except Exception as e:
         logger.error(f"Error processing image {image_full_path}: {e}", exc_info=True)
@@ -174,62 +310,356 @@ def process_image_for_detection(model, image_full_path, message_id, conn):
 
 # --- Main Execution Flow ---
 
-def main():
-    """Main function to scan images and perform object detection."""
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp')
+
+def iter_image_files(images_path):
+    """Yields the full path of every image file found under images_path."""
+    for root, _, files in os.walk(images_path):
+        for file in files:
+            # Filter for common image extensions
+            if not file.lower().endswith(IMAGE_EXTENSIONS):
+                logger.debug(f"Skipping non-image file: {file}")
+                continue
+            yield os.path.join(root, file)
+
+def detect_image_file(model, image_full_path, conn, processed_image_ids, metrics, image_cache=None):
+    """
+    Runs detection on one image file unless its message was already processed.
+    `processed_image_ids` is updated in place. Returns True if the image was processed,
+    False if detection failed and None if the image was skipped.
+    Progress so far is logged periodically (see StageMetrics.log_progress).
+    """
+    metrics.log_progress(logger)
+    file = os.path.basename(image_full_path)
+    # Assuming image filenames are message_id.ext
+    try:
+        message_id = int(os.path.splitext(file)[0])
+    except ValueError:
+        logger.warning(f"Skipping non-numeric filename (expected message_id): {file}")
+        return None
+
+    if message_id in processed_image_ids:
+        logger.debug(f"Image {message_id} already processed. Skipping.")
+        metrics.increment('images_skipped')
+        return None
+
+    if not os.path.isfile(image_full_path):
+        logger.warning(f"File not found or not a file: {image_full_path}")
+        return None
+
+    # Process the image and add its message_id to the processed set if successful
+    if process_image_for_detection(model, image_full_path, message_id, conn, metrics=metrics, image_cache=image_cache):
+        processed_image_ids.add(message_id) # Add to set to avoid re-processing in current run
+        metrics.increment('images_processed')
+        return True
+    metrics.increment('images_failed')
+    return False
+
+def record_image_cache_stats(image_cache, metrics):
+    """Adds the cache's hit and miss counts to `metrics`."""
+    if image_cache is not None:
+        metrics.increment('image_cache_hits', image_cache.hits)
+        metrics.increment('image_cache_misses', image_cache.misses)
+
+def preprocess_images(images_path=None, image_paths=None, image_cache=None, metrics=None):
+    """
+    Decodes and letterboxes images into the image cache without running the model,
+    so later detection runs skip the JPEG decode. Returns the StageMetrics for the run.
+    """
+    images_path = images_path or TELEGRAM_IMAGES_PATH
+    if image_cache is None:
+        image_cache = ImageCache(IMAGE_CACHE_PATH, size=MODEL_INPUT_SIZE)
+    if metrics is None:
+        metrics = StageMetrics('preprocess', rate_counters=('images_preprocessed',))
+    if image_paths is None:
+        image_paths = iter_image_files(images_path)
+    for image_full_path in image_paths:
+        metrics.log_progress(logger)
+        try:
+            with metrics.timer('preprocess'):
+                image_cache.load(image_full_path)
+            metrics.increment('images_preprocessed')
+        except Exception as e:
+            logger.error(f"Error preprocessing image {image_full_path}: {e}")
+            metrics.increment('preprocess_errors')
+    record_image_cache_stats(image_cache, metrics)
+    logger.info(f"Preprocessed images into {image_cache.cache_dir} ({image_cache.hits} already cached).")
+    return metrics
+
+def run_detection(images_path=None, metrics=None, image_paths=None, image_cache=None):
+    """
+    Scans the images directory and performs object detection on new images, i.e.
+    images no model has processed yet; images enriched by an older model are left
+    to reenrich_detections. `images_path` defaults to TELEGRAM_IMAGES_PATH. If `image_paths` is given, only
+    those files are considered (e.g. the images of a single date/channel partition).
+    `image_cache` (an ImageCache) feeds the model cached preprocessed images.
+    Returns the StageMetrics for the run.
+    """
+    images_path = images_path or TELEGRAM_IMAGES_PATH
+    if metrics is None:
+        metrics = StageMetrics('detect', rate_counters=('images_processed', 'detections'))
     conn = None
     try:
         conn = get_db_connection()
         setup_raw_image_detections_table(conn)
 
-        yolo_model = load_yolo_model()
+        with metrics.timer('model_load'):
+            yolo_model = load_yolo_model()
 
-        processed_image_ids = get_processed_image_ids(conn)
+        processed_image_ids = get_processed_image_ids(conn, any_model=True)
 
-        # Walk through the images directory
-        logger.info(f"Scanning for images in: {TELEGRAM_IMAGES_PATH}")
-        if not os.path.exists(TELEGRAM_IMAGES_PATH):
-            logger.error(f"Image directory does not exist: {TELEGRAM_IMAGES_PATH}")
-            logger.error("Please ensure you have run the scraping script and images are in data/raw/images on your host.")
-            return
+        if image_paths is None:
+            # Walk through the images directory
+            logger.info(f"Scanning for images in: {images_path}")
+            if not os.path.exists(images_path):
+                logger.error(f"Image directory does not exist: {images_path}")
+                logger.error("Please ensure you have run the scraping script and images are in data/raw/images on your host.")
+                return metrics
+            image_paths = iter_image_files(images_path)
 
         images_found = False
-        for root, _, files in os.walk(TELEGRAM_IMAGES_PATH):
-            for file in files:
-                # Filter for common image extensions
-                if not file.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp')):
-                    logger.debug(f"Skipping non-image file: {file}")
-                    continue
+        for image_full_path in image_paths:
+            images_found = True
+            detect_image_file(yolo_model, image_full_path, conn, processed_image_ids, metrics, image_cache=image_cache)
+
+        if not images_found:
+            logger.warning(f"No image files found in {images_path}. Please ensure images are scraped and present.")
+
+    except Exception as e:
+        logger.critical(f"An error occurred during object detection process: {e}", exc_info=True)
+        metrics.increment('detect_errors')
+    finally:
+        record_image_cache_stats(image_cache, metrics)
+        if conn:
+            conn.close()
+            logger.info("PostgreSQL connection closed.")
+    return metrics
+
+def prioritize_newest_first(conn, image_paths):
+    """
+    Orders image paths by the date of their message in raw.telegram_messages, newest
+    first. Images whose message is not loaded follow, newest file first.
+    """
+    message_ids = {}
+    for image_full_path in image_paths:
+        try:
+            message_ids[image_full_path] = int(os.path.splitext(os.path.basename(image_full_path))[0])
+        except ValueError:
+            continue
+
+    message_dates = {}
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT id, message_date FROM raw.telegram_messages WHERE id = ANY(%s)",
+                (list(set(message_ids.values())),),
+            )
+            message_dates = dict(cur.fetchall())
+    except psycopg2.Error as e:
+        logger.warning(f"Could not read message dates, ordering by file time instead: {e}")
+        conn.rollback()
+
+    def priority(image_full_path):
+        message_date = message_dates.get(message_ids.get(image_full_path))
+        if message_date is not None:
+            return (0, -message_date.timestamp())
+        return (1, -os.path.getmtime(image_full_path))
+
+    return sorted(message_ids, key=priority)
+
+def reenrich_detections(images_path=None, max_images=None, time_budget_s=None, metrics=None, image_cache=None):
+    """
+    Re-enrichment mode for model upgrades: processes only images without results
+    for the current model (see describe_model), newest message first, and stops after
+    `max_images` images or `time_budget_s` seconds so the rollout can proceed gradually
+    over several runs. Images left for later are counted as 'images_deferred'.
+    Returns the StageMetrics for the run.
+    """
+    images_path = images_path or TELEGRAM_IMAGES_PATH
+    if metrics is None:
+        metrics = StageMetrics('detect', rate_counters=('images_processed', 'detections'))
+    conn = None
+    try:
+        conn = get_db_connection()
+        setup_raw_image_detections_table(conn)
 
-                images_found = True
-                # Assuming image filenames are message_id.ext
+        processed_image_ids = get_processed_image_ids(conn)
+        pending_paths = []
+        if os.path.exists(images_path):
+            for image_full_path in iter_image_files(images_path):
                 try:
-                    message_id = int(os.path.splitext(file)[0])
+                    message_id = int(os.path.splitext(os.path.basename(image_full_path))[0])
                 except ValueError:
-                    logger.warning(f"Skipping non-numeric filename (expected message_id): {file}")
                     continue
+                if message_id not in processed_image_ids:
+                    pending_paths.append(image_full_path)
+        pending_paths = prioritize_newest_first(conn, pending_paths)
+        model_info = describe_model()
+        logger.info(
+            f"{len(pending_paths)} image(s) lack results for {model_info['model_name']} "
+            f"({model_info['model_version']})."
+        )
+        if not pending_paths:
+            return metrics
 
-                if message_id in processed_image_ids:
-                    logger.debug(f"Image {message_id} already processed. Skipping.")
-                    continue
+        with metrics.timer('model_load'):
+            yolo_model = load_yolo_model()
 
-                image_full_path = os.path.join(root, file)
-                if not os.path.isfile(image_full_path):
-                    logger.warning(f"File not found or not a file (after path join): {image_full_path}")
-                    continue
+        start = time.monotonic()
+        attempted = 0
+        for image_full_path in pending_paths:
+            if max_images is not None and attempted >= max_images:
+                break
+            if time_budget_s is not None and time.monotonic() - start >= time_budget_s:
+                break
+            attempted += 1
+            detect_image_file(yolo_model, image_full_path, conn, processed_image_ids, metrics, image_cache=image_cache)
 
-                # Process the image and add its message_id to the processed set if successful
-                if process_image_for_detection(yolo_model, image_full_path, message_id, conn):
-                    processed_image_ids.add(message_id) # Add to set to avoid re-processing in current run
-        
-        if not images_found:
-            logger.warning(f"No image files found in {TELEGRAM_IMAGES_PATH}. Please ensure images are scraped and present.")
+        deferred = len(pending_paths) - attempted
+        metrics.increment('images_deferred', deferred)
+        if deferred:
+            logger.info(f"Budget reached; {deferred} image(s) left for a later re-enrichment run.")
 
     except Exception as e:
-        logger.critical(f"An error occurred during object detection process: {e}", exc_info=True)
+        logger.critical(f"An error occurred during re-enrichment: {e}", exc_info=True)
+        metrics.increment('detect_errors')
     finally:
+        record_image_cache_stats(image_cache, metrics)
         if conn:
             conn.close()
             logger.info("PostgreSQL connection closed.")
+    return metrics
+
+def watch_for_images(images_path=None, poll_interval=5.0, idle_timeout=300.0, stop_file=None, metrics=None,
+                     image_cache=None, max_wait=None):
+    """
+    Streaming mode: polls the images directory and runs detection on each image as
+    soon as the scraper lands it. With a `stop_file`, stops once that file exists and
+    a final scan finds nothing new, so a scraper held up by a FLOOD_WAIT is waited
+    for; if the file has not appeared after `max_wait` seconds (WATCH_MAX_WAIT_S by
+    default) without new images, stops anyway. Without a `stop_file`, stops after
+    `idle_timeout` seconds without new images.
+    Images whose detection fails are retried on later scans, up to WATCH_MAX_ATTEMPTS
+    attempts in all. Returns the StageMetrics for the run.
+    """
+    images_path = images_path or TELEGRAM_IMAGES_PATH
+    max_wait = WATCH_MAX_WAIT_S if max_wait is None else max_wait
+    if metrics is None:
+        metrics = StageMetrics('detect', rate_counters=('images_processed', 'detections'))
+    conn = None
+    try:
+        conn = get_db_connection()
+        setup_raw_image_detections_table(conn)
+
+        with metrics.timer('model_load'):
+            yolo_model = load_yolo_model()
+
+        processed_image_ids = get_processed_image_ids(conn, any_model=True)
+        seen_paths = set()
+        failed_attempts = {} # Image path -> failed detection attempts so far
+        last_activity = time.monotonic()
+        logger.info(f"Watching {images_path} for new images (poll every {poll_interval}s).")
+
+        while True:
+            # Check the stop signal before scanning so the final scan sees every image
+            stop_requested = stop_file is not None and os.path.exists(stop_file)
+            new_paths = []
+            if os.path.exists(images_path):
+                new_paths = [p for p in iter_image_files(images_path) if p not in seen_paths]
+            found_new_image = False
+            for image_full_path in new_paths:
+                found_new_image = found_new_image or image_full_path not in failed_attempts
+                seen_paths.add(image_full_path)
+                processed = detect_image_file(
+                    yolo_model, image_full_path, conn, processed_image_ids, metrics, image_cache=image_cache
+                )
+                if processed is False:
+                    attempts = failed_attempts[image_full_path] = failed_attempts.get(image_full_path, 0) + 1
+                    if attempts < WATCH_MAX_ATTEMPTS:
+                        seen_paths.discard(image_full_path) # Retried on the next scan
+                    else:
+                        logger.error(f"Giving up on {image_full_path} after {attempts} failed attempts.")
+            retries_pending = any(p not in seen_paths and os.path.exists(p) for p in failed_attempts)
+
+            if found_new_image:
+                last_activity = time.monotonic()
+            elif stop_requested and not retries_pending:
+                logger.info("Scraping finished and no new images remain. Stopping watch.")
+                break
+            elif stop_file is None and time.monotonic() - last_activity > idle_timeout:
+                logger.info(f"No new images for {idle_timeout}s. Stopping watch.")
+                break
+            elif stop_file is not None and time.monotonic() - last_activity > max_wait:
+                logger.warning(f"{stop_file} did not appear within {max_wait}s of the last new image. Stopping watch.")
+                metrics.increment('watch_timeouts')
+                break
+            else:
+                time.sleep(poll_interval)
+
+    except Exception as e:
+        logger.critical(f"An error occurred during streaming object detection: {e}", exc_info=True)
+        metrics.increment('detect_errors')
+    finally:
+        record_image_cache_stats(image_cache, metrics)
+        if conn:
+            conn.close()
+            logger.info("PostgreSQL connection closed.")
+    return metrics
+
+def main():
+    """Main function to scan images and perform object detection."""
+    parser = argparse.ArgumentParser(description="Run YOLO object detection on scraped images.")
+    parser.add_argument('--images-path', default=TELEGRAM_IMAGES_PATH,
+                        help='Directory containing the scraped images.')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep polling for new images and process them as they arrive.')
+    parser.add_argument('--poll-interval', type=float, default=5.0,
+                        help='Seconds between directory scans in --watch mode.')
+    parser.add_argument('--idle-timeout', type=float, default=300.0,
+                        help='Stop --watch mode after this many seconds without new images (ignored with --stop-file).')
+    parser.add_argument('--stop-file', default=None,
+                        help='Stop --watch mode once this file exists and no new images remain.')
+    parser.add_argument('--max-wait', type=float, default=WATCH_MAX_WAIT_S,
+                        help='Stop --watch mode after this many seconds without new images even if --stop-file never appears.')
+    parser.add_argument('--image-cache', nargs='?', const=IMAGE_CACHE_PATH, default=None,
+                        help=f'Feed the model cached letterboxed images (default directory: {IMAGE_CACHE_PATH}).')
+    parser.add_argument('--preprocess-only', action='store_true',
+                        help='Only fill the image cache; do not run detection.')
+    parser.add_argument('--reenrich', action='store_true',
+                        help='Process only images without results for the current model, newest first.')
+    parser.add_argument('--max-images', type=int, default=None,
+                        help='Stop --reenrich after this many images.')
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help='Stop --reenrich after this many seconds.')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    configure_logging(LOG_FILE)
+
+    with profiled('detect', args.profile):
+        image_cache = None
+        if args.image_cache or args.preprocess_only:
+            image_cache = ImageCache(args.image_cache or IMAGE_CACHE_PATH, size=MODEL_INPUT_SIZE)
+
+        if args.preprocess_only:
+            metrics = preprocess_images(images_path=args.images_path, image_cache=image_cache)
+        elif args.reenrich:
+            metrics = reenrich_detections(
+                images_path=args.images_path,
+                max_images=args.max_images,
+                time_budget_s=args.time_budget,
+                image_cache=image_cache,
+            )
+        elif args.watch:
+            metrics = watch_for_images(
+                images_path=args.images_path,
+                poll_interval=args.poll_interval,
+                idle_timeout=args.idle_timeout,
+                stop_file=args.stop_file,
+                image_cache=image_cache,
+            )
+        else:
+            metrics = run_detection(images_path=args.images_path, image_cache=image_cache)
+    metrics.emit()
 
 if __name__ == '__main__':
     main()
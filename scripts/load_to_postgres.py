@@ -1,14 +1,32 @@
 import os
+import sys
 import json
+import time
+import asyncio
+import argparse
 import logging
 import psycopg2
+from contextlib import contextmanager
 from psycopg2 import sql
+from psycopg2.extras import execute_values
 from dotenv import load_dotenv
 from datetime import datetime
 
+# Allow `python scripts/load_to_postgres.py` to import the shared helpers under src/
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.utils.metrics import StageMetrics  # noqa: E402
+from src.utils.logging_config import configure_logging  # noqa: E402
+from src.utils.profiling import add_profile_argument, profiled  # noqa: E402
+from src.utils.data_lake import is_compacted, iter_message_json_files, read_compacted_records  # noqa: E402
+
 # --- Configuration and Environment Setup ---
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file when run as a script; importers
+# (src/cli.py, the Dagster ops) load the environment themselves.
+if __name__ == '__main__':
+    load_dotenv()
 
 # PostgreSQL Database Credentials from environment variables
 DB_HOST = os.getenv('POSTGRES_HOST')
@@ -17,22 +35,44 @@ DB_NAME = os.getenv('POSTGRES_DB')
 DB_USER = os.getenv('POSTGRES_USER')
 DB_PASSWORD = os.getenv('POSTGRES_PASSWORD')
 
-# Data Lake path where raw messages are stored
-RAW_MESSAGES_PATH = 'data/raw/telegram_messages'
+# Data Lake path where raw messages are stored, anchored at the project root like the
+# scraper's, so every stage reads the same tree whatever the working directory
+RAW_MESSAGES_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw', 'telegram_messages')
 
 # Target schema and table in PostgreSQL
 TARGET_SCHEMA = 'raw'
 TARGET_TABLE = 'telegram_messages'
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("load_to_postgres.log"), # Log to a file
-        logging.StreamHandler()                      # Also log to console
-    ]
-)
+# Typed columns of the raw table, keyed by the message record field they are loaded from.
+# Fields without a column (e.g. extra projected fields) are kept in the raw_data JSONB column.
+TYPED_COLUMNS = {
+    'message': ('message_text', 'TEXT'),
+    'sender_id': ('sender_id', 'BIGINT'),
+    'channel_name': ('channel_name', 'TEXT'),
+    'views': ('views', 'INTEGER'),
+    'forwards': ('forwards', 'INTEGER'),
+    'replies_count': ('replies_count', 'INTEGER'),
+    'has_media': ('has_media', 'BOOLEAN'),
+    'media_type': ('media_type', 'TEXT'),
+    'media_local_path': ('media_local_path', 'TEXT'),
+}
+# Fields stored in dedicated key columns
+KEY_FIELDS = ('id', 'channel_id', 'date')
+
+# Streaming writer: rows per INSERT, longest a buffered row waits for a flush, and how
+# many rows may queue up before producers are made to wait.
+STREAM_BATCH_SIZE = int(os.getenv('STREAM_BATCH_SIZE', '500'))
+STREAM_FLUSH_INTERVAL_S = float(os.getenv('STREAM_FLUSH_INTERVAL_S', '2.0'))
+STREAM_QUEUE_SIZE = int(os.getenv('STREAM_QUEUE_SIZE', '5000'))
+# Retries of a flush after a connection error, waiting STREAM_RETRY_BACKOFF_S, then twice
+# as long each time up to STREAM_MAX_BACKOFF_S, before the writer gives up
+STREAM_FLUSH_RETRIES = int(os.getenv('STREAM_FLUSH_RETRIES', '5'))
+STREAM_RETRY_BACKOFF_S = 1.0
+STREAM_MAX_BACKOFF_S = 30.0
+
+# Log file used when run from the command line (see configure_logging)
+LOG_FILE = 'load_to_postgres.log'
+
 logger = logging.getLogger(__name__)
 
 def get_db_connection():
@@ -54,7 +94,9 @@ def get_db_connection():
 def create_raw_table_if_not_exists(cursor):
     """
     Creates the raw schema and the telegram_messages table if they don't exist.
-    The table will store raw JSON data in a jsonb column.
+    Message fields are stored in typed columns (see TYPED_COLUMNS); any remaining
+    fields go to the raw_data jsonb column. Tables created before the typed columns
+    existed are migrated by adding them.
     """
     try:
         # Create schema if not exists
@@ -73,16 +115,309 @@ def create_raw_table_if_not_exists(cursor):
             );
         """).format(sql.Identifier(TARGET_SCHEMA), sql.Identifier(TARGET_TABLE))
         cursor.execute(create_table_query)
+
+        # Add typed columns missing from older tables. Checked first, since ALTER TABLE
+        # locks out concurrent readers even when there is nothing to add.
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_schema = %s AND table_name = %s;",
+            (TARGET_SCHEMA, TARGET_TABLE),
+        )
+        existing_columns = {row[0] for row in cursor.fetchall()}
+        for column_name, column_type in TYPED_COLUMNS.values():
+            if column_name in existing_columns:
+                continue
+            logger.info(f"Adding column '{column_name}' to '{TARGET_SCHEMA}.{TARGET_TABLE}'.")
+            cursor.execute(
+                sql.SQL("ALTER TABLE {}.{} ADD COLUMN {} " + column_type + ";").format(
+                    sql.Identifier(TARGET_SCHEMA), sql.Identifier(TARGET_TABLE), sql.Identifier(column_name)
+                )
+            )
         logger.info(f"Table '{TARGET_SCHEMA}.{TARGET_TABLE}' ensured.")
     except Exception as e:
         logger.error(f"Error creating schema or table: {e}", exc_info=True)
         raise
 
-def load_json_to_postgres():
+def typed_row(message_data):
+    """
+    Splits a message record into typed column values (in TYPED_COLUMNS order) and the
+    JSON of the remaining fields for raw_data, or None when nothing is left over.
+    Records from older scrapes that embed 'raw_message_json' keep it in raw_data.
+    """
+    values = [message_data.get(field) for field in TYPED_COLUMNS]
+    extra = {k: v for k, v in message_data.items() if k not in TYPED_COLUMNS and k not in KEY_FIELDS}
+    return values, json.dumps(extra) if extra else None
+
+def insert_columns():
+    """Returns the raw table columns a message row is inserted into, in row order."""
+    return ['id', 'channel_id', 'message_date', *(column_name for column_name, _ in TYPED_COLUMNS.values()), 'raw_data']
+
+def message_row(message_data):
+    """
+    Returns the insert row for a message record (see insert_columns), or None when
+    the record lacks one of the key fields.
+    """
+    message_id = message_data.get('id')
+    channel_id = message_data.get('channel_id')
+    message_date_str = message_data.get('date')
+    if message_id is None or channel_id is None or message_date_str is None:
+        return None
+    typed_values, raw_data = typed_row(message_data)
+    return (message_id, channel_id, datetime.fromisoformat(message_date_str), *typed_values, raw_data)
+
+class StreamWriterError(RuntimeError):
+    """Raised by BufferedMessageWriter.put and close once its flush task has stopped."""
+
+class BufferedMessageWriter:
+    """
+    Async writer that streams message records into the raw table.
+
+    Records are queued with `put()` and a background task inserts them in batches of
+    up to `batch_size` rows, or whatever has accumulated after `flush_interval_s`,
+    whichever comes first. The queue is bounded: when the database falls behind,
+    `put()` waits for room instead of buffering without limit, which slows the
+    producer down to the rate Postgres can absorb. Inserts run in a worker thread so
+    the event loop keeps receiving messages during a flush, and duplicates are
+    skipped with ON CONFLICT, so streamed rows and a later file load can overlap.
+
+    A flush that loses the connection reconnects and retries with exponential
+    backoff, up to STREAM_FLUSH_RETRIES times. A batch the database rejects is
+    retried row by row, so only the offending rows are dropped. If the flush task
+    stops anyway, `put()` and `close()` raise StreamWriterError instead of waiting
+    on a queue nobody drains.
+    """
+
+    def __init__(self, batch_size=None, flush_interval_s=None, max_queue_size=None, metrics=None):
+        self.batch_size = batch_size or STREAM_BATCH_SIZE
+        self.flush_interval_s = flush_interval_s or STREAM_FLUSH_INTERVAL_S
+        self.metrics = metrics if metrics is not None else StageMetrics('stream_load')
+        self.queue = asyncio.Queue(maxsize=max_queue_size or STREAM_QUEUE_SIZE)
+        self.conn = None
+        self._task = None
+        self._insert_query = sql.SQL("INSERT INTO {}.{} ({}) VALUES %s ON CONFLICT (id) DO NOTHING RETURNING id;").format(
+            sql.Identifier(TARGET_SCHEMA),
+            sql.Identifier(TARGET_TABLE),
+            sql.SQL(', ').join(sql.Identifier(c) for c in insert_columns()),
+        )
+
+    async def start(self):
+        """Connects, ensures the raw table exists and starts the flush task."""
+        self.conn = await asyncio.to_thread(get_db_connection)
+        with self.conn.cursor() as cursor:
+            create_raw_table_if_not_exists(cursor)
+        self.conn.commit()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def put(self, message_data):
+        """Queues a message record, waiting while the buffer is full."""
+        self._raise_if_stopped()
+        if self.queue.full():
+            self.metrics.increment('backpressure_waits')
+            with self.metrics.timer('backpressure_wait'):
+                await self._put_while_running(message_data)
+        else:
+            self.queue.put_nowait(message_data)
+
+    async def close(self):
+        """Flushes everything still queued, stops the flush task and disconnects."""
+        try:
+            if self._task is not None:
+                if not self._task.done():
+                    await self._put_while_running(None)
+                    await self._task
+                self._raise_if_stopped()
+        finally:
+            self._task = None
+            if self.conn is not None:
+                self.conn.close()
+                self.conn = None
+
+    def _raise_if_stopped(self):
+        if self._task is None or not self._task.done():
+            return
+        error = None if self._task.cancelled() else self._task.exception()
+        if error is not None:
+            raise StreamWriterError(f"Streaming writer stopped: {error}") from error
+        if self.queue.qsize():
+            raise StreamWriterError("Streaming writer stopped with messages still queued.")
+
+    async def _put_while_running(self, item):
+        """Waits for room in the queue, giving up if the flush task stops meanwhile."""
+        put = asyncio.ensure_future(self.queue.put(item))
+        await asyncio.wait({put, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            put.cancel()
+            self._raise_if_stopped()
+            raise StreamWriterError("Streaming writer stopped.")
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            batch = []
+            first = await self.queue.get()
+            if first is None:
+                break
+            batch.append(first)
+            deadline = time.monotonic() + self.flush_interval_s
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            await asyncio.to_thread(self._flush, batch)
+
+    def _flush(self, batch):
+        """
+        Inserts one batch in a single transaction, reconnecting and retrying after
+        connection errors. Raises once STREAM_FLUSH_RETRIES retries are used up.
+        """
+        rows = []
+        for message_data in batch:
+            try:
+                row = message_row(message_data)
+            except Exception as e:
+                logger.warning(f"Skipping streamed message {message_data.get('id')}: {e}")
+                row = None
+            if row is None:
+                logger.warning(f"Skipping streamed message {message_data.get('id')} due to missing required fields.")
+                self.metrics.increment('invalid_records')
+                continue
+            rows.append(row)
+        if not rows:
+            return
+
+        attempt = 0
+        rejected = 0
+        while True:
+            try:
+                if self.conn is None:
+                    self.conn = get_db_connection()
+                    self.metrics.increment('reconnects')
+                inserted = self._insert(rows)
+                break
+            except (psycopg2.OperationalError, psycopg2.InterfaceError) as e:
+                self._discard_connection()
+                if attempt >= STREAM_FLUSH_RETRIES:
+                    logger.error(f"Giving up on a batch of {len(rows)} streamed messages after {attempt + 1} attempts: {e}")
+                    self.metrics.increment('flush_errors')
+                    raise
+                delay = min(STREAM_RETRY_BACKOFF_S * 2 ** attempt, STREAM_MAX_BACKOFF_S)
+                logger.warning(f"Writing streamed messages failed ({e}); reconnecting in {delay:.1f}s.")
+                self.metrics.increment('flush_retries')
+                time.sleep(delay)
+                attempt += 1
+            except psycopg2.Error as e:
+                # The batch itself was rejected: retry row by row so only bad rows are lost
+                logger.warning(f"A batch of {len(rows)} streamed messages was rejected ({e}); retrying row by row.")
+                self.conn.rollback()
+                inserted, rejected = self._insert_rows_individually(rows)
+                break
+
+        self.metrics.increment('flushes')
+        self.metrics.increment('messages_loaded', len(inserted))
+        duplicates = len(rows) - rejected - len(inserted)
+        self.metrics.increment('duplicates_skipped', duplicates)
+        logger.debug(f"Flushed {len(inserted)} streamed messages ({duplicates} duplicates).")
+
+    def _insert(self, rows):
+        with self.metrics.timer('flush'), self.conn.cursor() as cursor:
+            inserted = execute_values(cursor, self._insert_query, rows, page_size=len(rows), fetch=True)
+        self.conn.commit()
+        return inserted
+
+    def _insert_rows_individually(self, rows):
+        """Inserts rows one at a time; returns the inserted ids and the number rejected."""
+        inserted = []
+        rejected = 0
+        for row in rows:
+            try:
+                inserted.extend(self._insert([row]))
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                raise
+            except psycopg2.Error as e:
+                logger.error(f"Dropping streamed message {row[0]} rejected by the database: {e}")
+                self.conn.rollback()
+                self.metrics.increment('flush_errors')
+                rejected += 1
+        return inserted, rejected
+
+    def _discard_connection(self):
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except psycopg2.Error:
+                pass
+            self.conn = None
+
+@contextmanager
+def savepoint(cursor, name='load_file'):
+    """
+    Runs the block inside a SAVEPOINT. If the block raises, only its statements are
+    rolled back, so the channel transaction stays usable for the remaining files.
+    """
+    cursor.execute(sql.SQL("SAVEPOINT {};").format(sql.Identifier(name)))
+    try:
+        yield
+    except BaseException:
+        cursor.execute(sql.SQL("ROLLBACK TO SAVEPOINT {};").format(sql.Identifier(name)))
+        raise
+    cursor.execute(sql.SQL("RELEASE SAVEPOINT {};").format(sql.Identifier(name)))
+
+def load_compacted_partition(cursor, channel_path, insert_query, metrics):
     """
-    Reads JSON files from the data lake and loads them into the PostgreSQL table.
-    Handles incremental loading by checking if a message ID already exists.
+    Loads the messages of a compacted partition (see src/utils/data_lake.py).
+    Existing IDs are looked up with one query for the whole partition instead of
+    one per message. Returns (messages loaded, duplicates skipped); the loaded and
+    duplicate counters are only updated once every insert has succeeded.
     """
+    records = read_compacted_records(channel_path)
+    metrics.increment('compacted_partitions')
+    message_ids = [r['id'] for r in records if r.get('id') is not None]
+    cursor.execute(
+        sql.SQL("SELECT id FROM {}.{} WHERE id = ANY(%s);").format(
+            sql.Identifier(TARGET_SCHEMA), sql.Identifier(TARGET_TABLE)
+        ),
+        (message_ids,),
+    )
+    existing_ids = {row[0] for row in cursor.fetchall()}
+
+    loaded = duplicates = 0
+    for message_data in records:
+        metrics.increment('compacted_records')
+        metrics.log_progress(logger)
+        row = message_row(message_data)
+        if row is None:
+            logger.warning(f"Skipping compacted message {message_data.get('id')} in {channel_path} due to missing required fields.")
+            metrics.increment('invalid_records')
+            continue
+        if row[0] in existing_ids:
+            duplicates += 1
+            continue
+        cursor.execute(insert_query, row)
+        existing_ids.add(row[0])
+        loaded += 1
+    metrics.increment('messages_loaded', loaded)
+    metrics.increment('duplicates_skipped', duplicates)
+    return loaded, duplicates
+
+def load_json_to_postgres(raw_messages_path=None, metrics=None, dates=None, channels=None):
+    """
+    Reads JSON files and compacted partitions from the data lake and loads them into
+    the PostgreSQL table. Handles incremental loading by checking if a message ID already exists.
+    `raw_messages_path` defaults to RAW_MESSAGES_PATH. `dates` (YYYY-MM-DD) and
+    `channels` restrict the load to those partition directories.
+    Returns the StageMetrics (files, rows loaded, duplicates, errors) for the run.
+    """
+    raw_messages_path = raw_messages_path or RAW_MESSAGES_PATH
+    if metrics is None:
+        metrics = StageMetrics('load', rate_counters=('files_processed', 'messages_loaded'))
     conn = None
     try:
         conn = get_db_connection()
@@ -95,63 +430,97 @@ def load_json_to_postgres():
         total_messages_loaded = 0
         total_duplicates_skipped = 0
 
+        columns = insert_columns()
+        insert_query = sql.SQL("INSERT INTO {}.{} ({}) VALUES ({});").format(
+            sql.Identifier(TARGET_SCHEMA),
+            sql.Identifier(TARGET_TABLE),
+            sql.SQL(', ').join(sql.Identifier(c) for c in columns),
+            sql.SQL(', ').join(sql.Placeholder() * len(columns)),
+        )
+
+        # Channel usernames are case-insensitive on Telegram
+        channel_filter = {c.lower() for c in channels} if channels is not None else None
+
         # Iterate through partitioned directories (YYYY-MM-DD/channel_name)
-        for date_dir in os.listdir(RAW_MESSAGES_PATH):
-            date_path = os.path.join(RAW_MESSAGES_PATH, date_dir)
+        if not os.path.isdir(raw_messages_path):
+            logger.warning(f"Raw messages directory does not exist: {raw_messages_path}")
+            return metrics
+        for date_dir in os.listdir(raw_messages_path):
+            date_path = os.path.join(raw_messages_path, date_dir)
             if not os.path.isdir(date_path):
                 continue # Skip non-directory files
+            if dates is not None and date_dir not in dates:
+                continue # Outside the requested partitions
 
             for channel_dir in os.listdir(date_path):
                 channel_path = os.path.join(date_path, channel_dir)
                 if not os.path.isdir(channel_path):
                     continue # Skip non-directory files
+                if channel_filter is not None and channel_dir.lower() not in channel_filter:
+                    continue # Outside the requested partitions
+
+                logger.debug(f"Processing directory: {channel_path}")
+                if is_compacted(channel_path):
+                    try:
+                        with savepoint(cursor):
+                            loaded, duplicates = load_compacted_partition(cursor, channel_path, insert_query, metrics)
+                        total_messages_loaded += loaded
+                        total_duplicates_skipped += duplicates
+                    except Exception as e:
+                        logger.error(f"Error loading compacted partition {channel_path}: {e}", exc_info=True)
+                        metrics.increment('file_errors')
+                # JSON files not (yet) compacted, e.g. the current day or late re-scrapes
+                for file_path in iter_message_json_files(channel_path):
+                    filename = os.path.basename(file_path)
+                    total_files_processed += 1
+                    metrics.increment('files_processed')
+                    metrics.log_progress(logger)
+                    try:
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            message_data = json.load(f)
 
-                logger.info(f"Processing directory: {channel_path}")
-                for filename in os.listdir(channel_path):
-                    if filename.endswith('.json'):
-                        file_path = os.path.join(channel_path, filename)
-                        total_files_processed += 1
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                message_data = json.load(f)
-
-                            message_id = message_data.get('id')
-                            channel_id = message_data.get('channel_id')
-                            message_date_str = message_data.get('date')
-                            raw_message_json = json.dumps(message_data) # Store the entire loaded JSON
-
-                            if message_id is None or channel_id is None or message_date_str is None:
-                                logger.warning(f"Skipping file {filename} due to missing required fields (id, channel_id, or date).")
-                                continue
-
-                            # Convert date string to datetime object for PostgreSQL TIMESTAMP WITH TIME ZONE
-                            message_date = datetime.fromisoformat(message_date_str)
-
-                            # Check if message_id already exists to prevent duplicates
-                            check_query = sql.SQL("SELECT id FROM {}.{} WHERE id = %s;").format(
-                                sql.Identifier(TARGET_SCHEMA), sql.Identifier(TARGET_TABLE)
-                            )
+                        message_id = message_data.get('id')
+                        channel_id = message_data.get('channel_id')
+                        message_date_str = message_data.get('date')
+
+                        if message_id is None or channel_id is None or message_date_str is None:
+                            logger.warning(f"Skipping file {filename} due to missing required fields (id, channel_id, or date).")
+                            metrics.increment('invalid_records')
+                            continue
+
+                        # Convert date string to datetime object for PostgreSQL TIMESTAMP WITH TIME ZONE
+                        message_date = datetime.fromisoformat(message_date_str)
+
+                        # Check if message_id already exists to prevent duplicates
+                        check_query = sql.SQL("SELECT id FROM {}.{} WHERE id = %s;").format(
+                            sql.Identifier(TARGET_SCHEMA), sql.Identifier(TARGET_TABLE)
+                        )
+                        # A failed statement (bad cast, overflow) only rolls back this file
+                        with savepoint(cursor):
                             cursor.execute(check_query, (message_id,))
                             existing_id = cursor.fetchone()
+                            if not existing_id:
+                                typed_values, raw_data = typed_row(message_data)
+                                cursor.execute(insert_query, (message_id, channel_id, message_date, *typed_values, raw_data))
 
-                            if existing_id:
-                                logger.debug(f"Message ID {message_id} already exists in DB. Skipping: {file_path}")
-                                total_duplicates_skipped += 1
-                            else:
-                                insert_query = sql.SQL("""
-                                    INSERT INTO {}.{} (id, channel_id, message_date, raw_data)
-                                    VALUES (%s, %s, %s, %s);
-                                """).format(sql.Identifier(TARGET_SCHEMA), sql.Identifier(TARGET_TABLE))
-                                cursor.execute(insert_query, (message_id, channel_id, message_date, raw_message_json))
-                                total_messages_loaded += 1
-                                logger.debug(f"Loaded message {message_id} from {file_path}")
-
-                        except json.JSONDecodeError as e:
-                            logger.error(f"Error decoding JSON from {file_path}: {e}")
-                        except Exception as e:
-                            logger.error(f"Error processing file {file_path}: {e}", exc_info=True)
-                conn.commit() # Commit after processing each channel's directory
-                logger.info(f"Committed changes for channel directory: {channel_path}")
+                        if existing_id:
+                            logger.debug(f"Message ID {message_id} already exists in DB. Skipping: {file_path}")
+                            total_duplicates_skipped += 1
+                            metrics.increment('duplicates_skipped')
+                        else:
+                            total_messages_loaded += 1
+                            metrics.increment('messages_loaded')
+                            logger.debug(f"Loaded message {message_id} from {file_path}")
+
+                    except json.JSONDecodeError as e:
+                        logger.error(f"Error decoding JSON from {file_path}: {e}")
+                        metrics.increment('decode_errors')
+                    except Exception as e:
+                        logger.error(f"Error processing file {file_path}: {e}", exc_info=True)
+                        metrics.increment('file_errors')
+                with metrics.timer('commit'):
+                    conn.commit() # Commit after processing each channel's directory
+                logger.debug(f"Committed changes for channel directory: {channel_path}")
 
         logger.info(f"Data loading complete. Total files processed: {total_files_processed}")
         logger.info(f"Total new messages loaded: {total_messages_loaded}")
@@ -159,6 +528,7 @@ def load_json_to_postgres():
 
     except Exception as e:
         logger.critical(f"An error occurred during data loading: {e}", exc_info=True)
+        metrics.increment('load_errors')
         if conn:
             conn.rollback() # Rollback in case of error
             logger.info("Transaction rolled back due to error.")
@@ -166,6 +536,18 @@ def load_json_to_postgres():
         if conn:
             conn.close()
             logger.info("PostgreSQL connection closed.")
+    return metrics
+
+def main():
+    """Loads every partition of the data lake into the raw table."""
+    parser = argparse.ArgumentParser(description="Load the JSON data lake into raw.telegram_messages.")
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    configure_logging(LOG_FILE)
+
+    with profiled('load', args.profile):
+        metrics = load_json_to_postgres()
+    metrics.emit()
 
 if __name__ == '__main__':
-    load_json_to_postgres()
+    main()
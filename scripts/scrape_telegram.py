@@ -1,52 +1,73 @@
 import os
 import json
+import time
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+import sys
 import asyncio
 import argparse
-from telethon.sync import TelegramClient
-from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
-# Correct import for RPCError
-from telethon.errors import RPCError # Corrected import
+from functools import lru_cache
 from dotenv import load_dotenv
 
+# Allow `python scripts/scrape_telegram.py` to import the shared helpers under src/
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from src.utils.metrics import StageMetrics  # noqa: E402
+from src.utils.rate_limit import AdaptiveRateLimiter  # noqa: E402
+from src.utils.media_index import MediaIndex, link_or_copy  # noqa: E402
+from src.utils.logging_config import configure_logging  # noqa: E402
+from src.utils.profiling import add_profile_argument, profiled  # noqa: E402
+
 # --- Configuration and Environment Setup ---
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from .env file when run as a script; importers
+# (src/cli.py, the Dagster ops) load the environment themselves. Telethon and
+# config.settings are imported by the functions that use them, so importing this
+# module stays cheap and free of side effects.
+if __name__ == '__main__':
+    load_dotenv()
 
 # Telegram API credentials from environment variables
 API_ID = os.getenv('TELEGRAM_API_ID')
 API_HASH = os.getenv('TELEGRAM_API_HASH')
-SESSION_NAME = 'telegram_scraper_session' # Session file to store auth info
+# Session file to store auth info, shared by the command line and the Dagster ops
+SESSION_NAME = os.path.join(PROJECT_ROOT, 'telegram_scraper_session')
+
+# Request pacing and FLOOD_WAIT handling
+REQUESTS_PER_SECOND = float(os.getenv('TELEGRAM_REQUESTS_PER_SECOND', '1.0'))
+REQUEST_BURST = int(os.getenv('TELEGRAM_REQUEST_BURST', '5'))
+MAX_FLOOD_WAIT_RETRIES = int(os.getenv('TELEGRAM_MAX_FLOOD_WAIT_RETRIES', '5'))
+MAX_FLOOD_WAIT_SECONDS = int(os.getenv('TELEGRAM_MAX_FLOOD_WAIT_SECONDS', '3600'))
+# Telethon sleeps through flood waits shorter than this itself; 0 routes all of them
+# through our handler so they are counted and slow the rate limiter down.
+FLOOD_SLEEP_THRESHOLD = int(os.getenv('TELEGRAM_FLOOD_SLEEP_THRESHOLD', '0'))
+ITER_MESSAGES_PAGE_SIZE = 100 # Messages fetched per GetHistory request by iter_messages
 
-# Data Lake paths
-BASE_DATA_PATH = 'data/raw'
+# Media download limits: 'full' downloads the original file (skipping files larger than
+# MEDIA_MAX_BYTES, 0 = no limit); 'thumbnail' downloads the smallest photo size whose
+# longer side is at least MEDIA_THUMB_MIN_SIDE pixels, which is plenty for detection.
+MEDIA_DOWNLOAD_MODE = os.getenv('MEDIA_DOWNLOAD_MODE', 'full')
+MEDIA_MAX_BYTES = int(os.getenv('MEDIA_MAX_BYTES', '0'))
+MEDIA_THUMB_MIN_SIDE = int(os.getenv('MEDIA_THUMB_MIN_SIDE', '640'))
+
+# Data Lake paths, anchored at the project root like the Dagster op configs, so
+# in-process runs write to the same place whatever the working directory
+BASE_DATA_PATH = os.path.join(PROJECT_ROOT, 'data', 'raw')
 TELEGRAM_MESSAGES_PATH = os.path.join(BASE_DATA_PATH, 'telegram_messages')
 TELEGRAM_IMAGES_PATH = os.path.join(BASE_DATA_PATH, 'images')
+# Index of downloaded media by Telegram file identity, used to skip re-downloads of forwards
+MEDIA_INDEX_PATH = os.path.join(BASE_DATA_PATH, 'media_index.sqlite3')
+# Full Telethon payloads, kept apart so the loader never reads them
+TELEGRAM_RAW_PAYLOAD_PATH = os.path.join(BASE_DATA_PATH, 'telegram_messages_full')
 
-# Ensure data directories exist
-os.makedirs(TELEGRAM_MESSAGES_PATH, exist_ok=True)
-os.makedirs(TELEGRAM_IMAGES_PATH, exist_ok=True)
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("scraper.log"), # Log to a file
-        logging.StreamHandler()             # Also log to console
-    ]
-)
-logger = logging.getLogger(__name__)
+# Fields always stored for each message (see message_fields)
+REQUIRED_MESSAGE_FIELDS = ('id', 'date', 'channel_id', 'channel_name')
 
-# List of Telegram channels to scrape
-# Add more channels from https://et.tgstat.com/medicine as needed
-TELEGRAM_CHANNELS = [
-    'https://t.me/CheMed123',
-    'https://t.me/lobelia4cosmetics',
-    'https://t.me/tikvahpharma',
-    # Add more channels here
-]
+# Log file used when run from the command line (see configure_logging)
+LOG_FILE = 'scraper.log'
+
+logger = logging.getLogger(__name__)
 
 # --- Helper Functions ---
 
@@ -72,12 +93,172 @@ def get_latest_processed_message_id(channel_output_dir):
             logger.info(f"Found latest processed message ID in {channel_output_dir}: {latest_id}")
     return latest_id
 
-async def download_media(message, channel_name, message_id):
+@lru_cache(maxsize=None)
+def message_fields():
+    """Fields stored for each message (see TELEGRAM_MESSAGE_FIELDS in config/settings.py)."""
+    from config.settings import settings
+    return tuple(REQUIRED_MESSAGE_FIELDS) + tuple(
+        field for field in settings.TELEGRAM_MESSAGE_FIELDS if field not in REQUIRED_MESSAGE_FIELDS
+    )
+
+def project_message(message, entity, channel_name, media_path):
+    """
+    Builds the data lake record for a message, keeping only message_fields().
+    Fields are computed lazily so unused ones cost nothing.
+    """
+    extractors = {
+        'id': lambda: message.id,
+        'date': lambda: message.date.isoformat(),
+        'message': lambda: message.message,
+        'sender_id': lambda: message.sender_id,
+        'channel_id': lambda: entity.id,
+        'channel_name': lambda: channel_name,
+        'views': lambda: message.views,
+        'forwards': lambda: message.forwards,
+        'replies_count': lambda: message.replies.replies if message.replies else 0,
+        'has_media': lambda: bool(message.media),
+        'media_type': lambda: type(message.media).__name__ if message.media else None,
+        # Path of the downloaded media, relative to the project root (data/raw/images/...)
+        'media_local_path': lambda: os.path.relpath(media_path, PROJECT_ROOT) if media_path else None,
+        'raw_message_json': lambda: message.to_json(), # Full raw message, only if explicitly requested
+    }
+    record = {}
+    for field in message_fields():
+        if field in extractors:
+            record[field] = extractors[field]()
+        else:
+            # Any other top-level attribute of the Telethon message, if it is JSON-serializable
+            value = getattr(message, field, None)
+            record[field] = value if isinstance(value, (str, int, float, bool, type(None))) else str(value)
+    return record
+
+def save_raw_payload(message, date_str, channel_name):
+    """Writes the full Telethon payload of a message to cold storage."""
+    payload_dir = os.path.join(TELEGRAM_RAW_PAYLOAD_PATH, date_str, channel_name)
+    os.makedirs(payload_dir, exist_ok=True)
+    with open(os.path.join(payload_dir, f"{message.id}.json"), 'w', encoding='utf-8') as f:
+        f.write(message.to_json())
+
+def save_message_record(message, message_data, channel_output_dir, date_str, channel_name, metrics):
+    """Writes a projected message record, and its raw payload if kept, to the data lake."""
+    from config.settings import settings
+
+    message_file_path = os.path.join(channel_output_dir, f"{message.id}.json")
+    try:
+        with open(message_file_path, 'w', encoding='utf-8') as f:
+            json.dump(message_data, f, ensure_ascii=False, separators=(',', ':'))
+        logger.debug(f"Saved message {message.id} to {message_file_path}")
+        if settings.KEEP_RAW_MESSAGE_PAYLOAD:
+            save_raw_payload(message, date_str, channel_name)
+    except Exception as e:
+        logger.error(f"Error saving message {message.id} to JSON: {e}")
+        metrics.increment('save_errors')
+
+def media_file(media):
+    """Returns the Telegram Photo or Document behind a message's media, or None."""
+    from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
+
+    if isinstance(media, MessageMediaPhoto):
+        return media.photo
+    if isinstance(media, MessageMediaDocument):
+        return media.document
+    return None
+
+def media_size_bytes(telegram_file):
+    """Returns the size of the full file in bytes as reported by Telegram, or None."""
+    from telethon.tl.types import PhotoSize, PhotoSizeProgressive
+
+    if isinstance(getattr(telegram_file, 'size', None), int):
+        return telegram_file.size # Documents report their size directly
+    largest = 0
+    for photo_size in getattr(telegram_file, 'sizes', None) or []:
+        if isinstance(photo_size, PhotoSizeProgressive):
+            largest = max(largest, max(photo_size.sizes))
+        elif isinstance(photo_size, PhotoSize):
+            largest = max(largest, photo_size.size)
+    return largest or None
+
+def select_thumb(telegram_file):
+    """
+    Picks the smallest photo size / thumbnail whose longer side is at least
+    MEDIA_THUMB_MIN_SIDE pixels (the largest one if none is), or None if there are none.
+    """
+    from telethon.tl.types import PhotoSize, PhotoSizeProgressive
+
+    candidates = [
+        t for t in (getattr(telegram_file, 'sizes', None) or getattr(telegram_file, 'thumbs', None) or [])
+        if isinstance(t, (PhotoSize, PhotoSizeProgressive))
+    ]
+    if not candidates:
+        return None
+    candidates.sort(key=lambda t: max(t.w, t.h))
+    for thumb in candidates:
+        if max(thumb.w, thumb.h) >= MEDIA_THUMB_MIN_SIDE:
+            return thumb
+    return candidates[-1]
+
+def create_rate_limiter():
+    """Creates the adaptive rate limiter shared by all requests of one client."""
+    return AdaptiveRateLimiter(rate=REQUESTS_PER_SECOND, burst=REQUEST_BURST)
+
+async def pace(limiter, metrics):
+    """Waits for the rate limiter, recording the time spent throttled."""
+    with metrics.timer('rate_limit_wait'):
+        await limiter.acquire()
+
+async def wait_out_flood(error, attempt, limiter, metrics, description):
+    """
+    Handles a FloodWaitError: records it, slows the limiter down and sleeps for the
+    requested time. Re-raises the error if the retry budget or maximum wait is exceeded.
+    """
+    metrics.increment('flood_waits')
+    metrics.increment('flood_wait_seconds', error.seconds)
+    limiter.record_flood_wait(error.seconds)
+    if attempt >= MAX_FLOOD_WAIT_RETRIES or error.seconds > MAX_FLOOD_WAIT_SECONDS:
+        logger.error(f"Giving up on {description} after FLOOD_WAIT of {error.seconds}s (attempt {attempt + 1}).")
+        raise error
+    logger.warning(
+        f"FLOOD_WAIT of {error.seconds}s on {description}. Sleeping, then resuming "
+        f"at {limiter.rate:.2f} requests/s."
+    )
+    with metrics.timer('flood_wait'):
+        await asyncio.sleep(error.seconds)
+
+async def resolve_channel(client, channel_url, limiter, metrics):
+    """Resolves a channel URL to its entity and name, waiting out FLOOD_WAITs."""
+    from telethon.errors import FloodWaitError
+
+    attempt = 0
+    while True:
+        try:
+            await pace(limiter, metrics)
+            entity = await client.get_entity(channel_url)
+            limiter.record_success()
+            break
+        except FloodWaitError as e:
+            await wait_out_flood(e, attempt, limiter, metrics, f"resolving {channel_url}")
+            attempt += 1
+    channel_name = entity.username if entity.username else entity.title.replace(' ', '_')
+    return entity, channel_name
+
+async def download_media(message, channel_name, message_id, metrics=None, limiter=None, media_index=None):
     """
     Downloads media (photos/documents) from a Telegram message.
     Returns the local path to the downloaded file if successful, otherwise None.
+    Downloads are paced by `limiter` and retried after FLOOD_WAIT errors.
+    Files already in `media_index` (e.g. forwarded photos) are hard-linked instead of
+    downloaded again. MEDIA_DOWNLOAD_MODE and MEDIA_MAX_BYTES limit what is fetched.
+    Download failures are counted under 'media_errors' in `metrics`.
     """
+    from telethon.errors import FloodWaitError
+    from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
+
+    if metrics is None:
+        metrics = StageMetrics('scrape')
+    if limiter is None:
+        limiter = create_rate_limiter()
     if message.media:
+        partial_path = None
         try:
             # Determine file extension based on media type
             if isinstance(message.media, MessageMediaPhoto):
@@ -90,14 +271,20 @@ async def download_media(message, channel_name, message_id):
                         file_ext = '.' + mime_type.split('/')[-1]
                     else:
                         # For other document types, we might want to skip or handle differently
-                        logger.info(f"Skipping non-image document in message {message_id} from {channel_name}: {mime_type}")
+                        logger.debug(f"Skipping non-image document in message {message_id} from {channel_name}: {mime_type}")
                         return None
                 else:
                     file_ext = '.bin' # Default binary if mime_type is missing
             else:
-                logger.info(f"Unsupported media type in message {message_id} from {channel_name}: {type(message.media)}")
+                logger.debug(f"Unsupported media type in message {message_id} from {channel_name}: {type(message.media)}")
                 return None
 
+            telegram_file = media_file(message.media)
+            thumb = select_thumb(telegram_file) if MEDIA_DOWNLOAD_MODE == 'thumbnail' else None
+            variant = thumb.type if thumb is not None else 'full'
+            if thumb is not None:
+                file_ext = '.jpg' # Telegram serves photo sizes and thumbnails as JPEG
+
             # Define the path to save the image
             # Format: data/raw/images/channel_name/message_id.ext
             channel_image_path = os.path.join(TELEGRAM_IMAGES_PATH, channel_name.replace('@', ''))
@@ -105,39 +292,100 @@ async def download_media(message, channel_name, message_id):
             file_name = f"{message_id}{file_ext}"
             file_path = os.path.join(channel_image_path, file_name)
 
-            logger.info(f"Downloading media for message {message_id} from {channel_name} to {file_path}")
-            await message.download_media(file=file_path)
-            logger.info(f"Successfully downloaded media for message {message_id}.")
+            if variant == 'full' and MEDIA_MAX_BYTES:
+                size_bytes = media_size_bytes(telegram_file)
+                if size_bytes and size_bytes > MEDIA_MAX_BYTES:
+                    logger.debug(f"Skipping media of message {message_id} from {channel_name}: {size_bytes} bytes exceeds MEDIA_MAX_BYTES.")
+                    metrics.increment('media_skipped_oversize')
+                    return None
+
+            # Reuse an earlier download of the same Telegram file
+            identity = None
+            if getattr(telegram_file, 'access_hash', None) is not None:
+                identity = (telegram_file.id, telegram_file.access_hash)
+            if media_index is not None and identity is not None:
+                existing_path = media_index.lookup(*identity, variant=variant)
+                if existing_path:
+                    link_or_copy(existing_path, file_path)
+                    logger.debug(f"Media for message {message_id} already downloaded as {existing_path}; linked.")
+                    metrics.increment('media_deduplicated')
+                    return file_path
+
+            # Download to a temporary name and rename when complete, so a detector
+            # watching the images directory never picks up a half-written file.
+            partial_path = file_path + '.part'
+            logger.debug(f"Downloading media for message {message_id} from {channel_name} to {file_path}")
+            attempt = 0
+            while True:
+                try:
+                    await pace(limiter, metrics)
+                    with metrics.timer('media_download'):
+                        await message.download_media(file=partial_path, thumb=thumb)
+                    limiter.record_success()
+                    break
+                except FloodWaitError as e:
+                    await wait_out_flood(e, attempt, limiter, metrics, f"media of message {message_id}")
+                    attempt += 1
+            os.replace(partial_path, file_path)
+            metrics.increment('media_bytes', os.path.getsize(file_path))
+            if media_index is not None and identity is not None:
+                media_index.record(*identity, file_path, variant=variant)
+            logger.debug(f"Successfully downloaded media for message {message_id}.")
             return file_path
         except Exception as e:
             logger.error(f"Error downloading media for message {message_id} from {channel_name}: {e}")
+            metrics.increment('media_errors')
+            if partial_path is not None and os.path.exists(partial_path):
+                os.remove(partial_path)
             return None
     return None
 
-async def scrape_channel(client, channel_url, limit=None):
+async def scrape_channel(client, channel_url, limit=None, metrics=None, partition_date=None, limiter=None,
+                         media_index=None):
     """
     Scrapes messages and images from a given Telegram channel URL.
     Stores messages as JSON and images in the data lake.
     The 'limit' parameter controls the maximum number of messages to fetch.
     If a previous scrape was interrupted for the current day, it resumes from where it left off.
+    If `partition_date` (a date) is given, only messages posted on that UTC day are
+    fetched and they are stored under that date's directory instead of today's.
+    Requests are paced by `limiter`; after a FLOOD_WAIT the scrape sleeps and then
+    continues from the last saved message ID instead of abandoning the channel.
+    Downloaded media is registered in `media_index` so reposts are not fetched twice.
+    Message, image and error counts are recorded in `metrics` (a StageMetrics).
     """
+    from telethon.errors import RPCError, FloodWaitError
+
+    if metrics is None:
+        metrics = StageMetrics('scrape', rate_counters=('messages', 'images'))
+    if limiter is None:
+        limiter = create_rate_limiter()
     try:
         # Resolve channel entity
-        entity = await client.get_entity(channel_url)
-        channel_name = entity.username if entity.username else entity.title.replace(' ', '_')
-        
-        # Get today's date for partitioning
-        today_str = datetime.now().strftime('%Y-%m-%d')
+        entity, channel_name = await resolve_channel(client, channel_url, limiter, metrics)
+
+        # Get today's date (or the requested message date) for partitioning
+        if partition_date is not None:
+            today_str = partition_date.strftime('%Y-%m-%d')
+        else:
+            today_str = datetime.now().strftime('%Y-%m-%d')
         channel_output_dir = os.path.join(TELEGRAM_MESSAGES_PATH, today_str, channel_name)
         os.makedirs(channel_output_dir, exist_ok=True)
         logger.info(f"Saving messages to: {channel_output_dir}")
 
         # Determine the starting point for scraping (for resuming)
-        start_id = get_latest_processed_message_id(channel_output_dir)
+        start_id = get_latest_processed_message_id(channel_output_dir) if partition_date is None else None
         
         # Prepare arguments for iter_messages
         iter_messages_kwargs = {'limit': limit}
-        if start_id is not None:
+        window_start = None
+        if partition_date is not None:
+            # offset_date returns messages sent before the given date, newest first,
+            # so start at the end of the day and stop once we pass its beginning.
+            window_start = datetime.combine(partition_date, datetime.min.time(), tzinfo=timezone.utc)
+            iter_messages_kwargs['offset_date'] = window_start + timedelta(days=1)
+            logger.info(f"Scraping {channel_name} for messages posted on {today_str}.")
+        elif start_id is not None:
             # If start_id exists, we want messages *older* than this ID.
             # Telethon's max_id parameter means "get messages with ID < max_id".
             iter_messages_kwargs['max_id'] = start_id
@@ -147,88 +395,355 @@ async def scrape_channel(client, channel_url, limit=None):
 
         message_count = 0
         image_count = 0
+        last_message_id = None # Oldest message saved so far; messages arrive newest first
+        attempt = 0
 
-        # Iterate through messages in the channel, applying the limit and max_id for resuming
-        async for message in client.iter_messages(entity, **iter_messages_kwargs):
-            message_count += 1
-            media_path = None
-
-            # Check for media and download images
-            if message.media:
-                media_path = await download_media(message, channel_name, message.id)
-                if media_path:
-                    image_count += 1
-
-            # Prepare message data for JSON storage
-            message_data = {
-                'id': message.id,
-                'date': message.date.isoformat(),
-                'message': message.message,
-                'sender_id': message.sender_id,
-                'channel_id': entity.id,
-                'channel_name': channel_name,
-                'views': message.views,
-                'forwards': message.forwards,
-                'replies_count': message.replies.replies if message.replies else 0,
-                'has_media': bool(message.media),
-                'media_type': type(message.media).__name__ if message.media else None,
-                'media_local_path': media_path, # Store local path to downloaded media
-                'raw_message_json': message.to_json() # Store full raw message for completeness
-            }
-
-            # Save message data as JSON
-            message_file_path = os.path.join(channel_output_dir, f"{message.id}.json")
+        while True:
+            if last_message_id is not None:
+                # Continue after a FLOOD_WAIT from the last message we saved
+                iter_messages_kwargs['max_id'] = last_message_id
+                if limit is not None:
+                    iter_messages_kwargs['limit'] = limit - message_count
+                    if iter_messages_kwargs['limit'] <= 0:
+                        break
             try:
-                with open(message_file_path, 'w', encoding='utf-8') as f:
-                    json.dump(message_data, f, ensure_ascii=False, indent=4)
-                logger.debug(f"Saved message {message.id} to {message_file_path}")
-            except Exception as e:
-                logger.error(f"Error saving message {message.id} to JSON: {e}")
+                await pace(limiter, metrics)
+                # Iterate through messages in the channel, applying the limit and max_id for resuming
+                async for message in client.iter_messages(entity, **iter_messages_kwargs):
+                    if window_start is not None and message.date < window_start:
+                        break # Reached messages older than the requested day
+                    message_count += 1
+                    metrics.increment('messages')
+                    metrics.log_progress(logger)
+                    media_path = None
+
+                    # Check for media and download images
+                    if message.media:
+                        media_path = await download_media(
+                            message, channel_name, message.id,
+                            metrics=metrics, limiter=limiter, media_index=media_index,
+                        )
+                        if media_path:
+                            image_count += 1
+                            metrics.increment('images')
 
+                    # Save the projected message record as JSON
+                    message_data = project_message(message, entity, channel_name, media_path)
+                    save_message_record(message, message_data, channel_output_dir, today_str, channel_name, metrics)
+                    last_message_id = message.id
+
+                    # Pace the next history page request
+                    if message_count % ITER_MESSAGES_PAGE_SIZE == 0:
+                        limiter.record_success()
+                        await pace(limiter, metrics)
+                break
+            except FloodWaitError as e:
+                await wait_out_flood(e, attempt, limiter, metrics, f"history of {channel_name}")
+                attempt += 1
+                logger.info(f"Resuming scrape for {channel_name} after message ID {last_message_id}.")
+
+        metrics.increment('channels_scraped')
         logger.info(f"Finished scraping {channel_name}. Total messages processed in this run: {message_count}, Images downloaded: {image_count}")
 
+    except FloodWaitError as e:
+        logger.error(f"Rate limit for {channel_url} exceeded the retry budget ({e.seconds}s wait requested).")
+        metrics.increment('channels_failed')
     # Corrected RPCError import
     except RPCError as e:
-        if "FLOOD_WAIT" in str(e):
-            wait_time = int(str(e).split('FLOOD_WAIT_')[1].split(' ')[0])
-            logger.warning(f"Rate limit hit for {channel_url}. Waiting for {wait_time} seconds...")
-            await asyncio.sleep(wait_time)
-            logger.info(f"Resuming scrape for {channel_url} after flood wait.")
-        else:
-            logger.error(f"Telegram RPC Error for {channel_url}: {e}")
+        logger.error(f"Telegram RPC Error for {channel_url}: {e}")
+        metrics.increment('channels_failed')
     except Exception as e:
         logger.error(f"An unexpected error occurred while scraping {channel_url}: {e}", exc_info=True)
+        metrics.increment('channels_failed')
+    return metrics
 
-async def main():
+async def scrape_channels(channels=None, limit=None, metrics=None, partition_date=None):
     """
-    Main function to parse arguments, initialize the Telegram client, and scrape all channels.
+    Connects to Telegram and scrapes each channel in turn.
+    `channels` defaults to settings.TELEGRAM_CHANNELS; `partition_date` restricts the scrape to
+    messages posted on that day (see scrape_channel). Returns the StageMetrics for the run.
     """
-    parser = argparse.ArgumentParser(description="Scrape Telegram channel messages and media.")
-    parser.add_argument('--limit', type=int, default=None,
-                        help='Maximum number of messages to scrape per channel. If not provided, scrapes all messages.')
-    args = parser.parse_args()
+    from telethon.sync import TelegramClient
+    from config.settings import settings
+
+    if metrics is None:
+        metrics = StageMetrics('scrape', rate_counters=('messages', 'images'))
 
     if not API_ID or not API_HASH:
         logger.error("TELEGRAM_API_ID and TELEGRAM_API_HASH must be set in the .env file.")
-        return
+        metrics.increment('config_errors')
+        return metrics
 
     # Initialize Telethon client
-    client = TelegramClient(SESSION_NAME, int(API_ID), API_HASH)
+    client = TelegramClient(SESSION_NAME, int(API_ID), API_HASH, flood_sleep_threshold=FLOOD_SLEEP_THRESHOLD)
+    limiter = create_rate_limiter()
+    media_index = MediaIndex(MEDIA_INDEX_PATH, root=PROJECT_ROOT)
 
     try:
         logger.info("Connecting to Telegram...")
         await client.start()
         logger.info("Connected to Telegram successfully.")
 
-        for channel_url in TELEGRAM_CHANNELS:
-            await scrape_channel(client, channel_url, limit=args.limit)
+        for channel_url in (channels or settings.TELEGRAM_CHANNELS):
+            await scrape_channel(
+                client, channel_url, limit=limit, metrics=metrics, partition_date=partition_date,
+                limiter=limiter, media_index=media_index,
+            )
 
     except Exception as e:
         logger.critical(f"Failed to connect or scrape Telegram: {e}", exc_info=True)
+        metrics.increment('connection_errors')
     finally:
+        logger.info(f"Rate limiter stats: {limiter.stats()}")
+        media_index.close()
         if client.is_connected():
             logger.info("Disconnecting from Telegram.")
             await client.disconnect()
+    return metrics
+
+async def stream_message(message, entity, channel_name, writer, metrics, limiter, media_index, write_lake):
+    """
+    Handles one new message in streaming mode: downloads its media, optionally saves
+    the data lake copy under the message's UTC day and queues the record for Postgres.
+    """
+    metrics.increment('messages')
+    metrics.log_progress(logger)
+    media_path = None
+    if message.media:
+        media_path = await download_media(
+            message, channel_name, message.id,
+            metrics=metrics, limiter=limiter, media_index=media_index,
+        )
+        if media_path:
+            metrics.increment('images')
+    message_data = project_message(message, entity, channel_name, media_path)
+    if write_lake:
+        date_str = message.date.strftime('%Y-%m-%d')
+        channel_output_dir = os.path.join(TELEGRAM_MESSAGES_PATH, date_str, channel_name)
+        os.makedirs(channel_output_dir, exist_ok=True)
+        save_message_record(message, message_data, channel_output_dir, date_str, channel_name, metrics)
+    # Waits here while the writer's buffer is full
+    await writer.put(message_data)
+
+async def latest_message_id(client, entity, channel_name, limiter, metrics):
+    """Returns the ID of the newest message in a channel (0 if empty), waiting out FLOOD_WAITs."""
+    from telethon.errors import FloodWaitError
+
+    attempt = 0
+    while True:
+        try:
+            await pace(limiter, metrics)
+            latest = await client.get_messages(entity, limit=1)
+            limiter.record_success()
+            return latest[0].id if latest else 0
+        except FloodWaitError as e:
+            await wait_out_flood(e, attempt, limiter, metrics, f"latest message of {channel_name}")
+            attempt += 1
+
+async def poll_channels(client, targets, writer, metrics, limiter, media_index, write_lake, poll_interval_s,
+                        deadline=None):
+    """
+    Streams new messages by polling each channel's history with min_id, starting
+    after the newest message at the time polling begins. Errors are handled per
+    channel: a channel that cannot be polled is retried on the next round (after
+    the requested wait, for a FLOOD_WAIT beyond the retry budget) while the
+    others keep streaming. Stops with StreamWriterError if the writer dies.
+    """
+    from telethon.errors import FloodWaitError
+    from scripts.load_to_postgres import StreamWriterError
+
+    last_ids = {}
+    for peer_id, (entity, channel_name) in targets.items():
+        try:
+            last_ids[peer_id] = await latest_message_id(client, entity, channel_name, limiter, metrics)
+        except FloodWaitError as e:
+            logger.error(f"Rate limit for {channel_name} exceeded the retry budget ({e.seconds}s wait requested).")
+            metrics.increment('channels_failed')
+        except Exception as e:
+            logger.error(f"Could not start polling {channel_name}: {e}", exc_info=True)
+            metrics.increment('channels_failed')
+    if not last_ids:
+        logger.error("No channel could be polled; nothing to stream.")
+        return
+
+    flood_attempts = dict.fromkeys(last_ids, 0)
+    resume_at = dict.fromkeys(last_ids, 0.0) # Monotonic time before which a channel is not polled
+    while deadline is None or time.monotonic() < deadline:
+        for peer_id in last_ids:
+            if time.monotonic() < resume_at[peer_id]:
+                continue
+            entity, channel_name = targets[peer_id]
+            try:
+                await pace(limiter, metrics)
+                # reverse=True yields messages oldest first, so last_ids only moves forward
+                async for message in client.iter_messages(entity, min_id=last_ids[peer_id], reverse=True):
+                    await stream_message(message, entity, channel_name, writer, metrics, limiter, media_index, write_lake)
+                    last_ids[peer_id] = message.id
+                limiter.record_success()
+                flood_attempts[peer_id] = 0
+            except FloodWaitError as e:
+                try:
+                    await wait_out_flood(e, flood_attempts[peer_id], limiter, metrics, f"polling {channel_name}")
+                    flood_attempts[peer_id] += 1
+                except FloodWaitError:
+                    # Over the retry budget: leave this channel alone for the requested time
+                    resume_at[peer_id] = time.monotonic() + e.seconds
+                    flood_attempts[peer_id] = 0
+                    metrics.increment('stream_errors')
+            except StreamWriterError:
+                raise
+            except Exception as e:
+                logger.error(f"Error polling {channel_name}: {e}", exc_info=True)
+                metrics.increment('stream_errors')
+        await asyncio.sleep(poll_interval_s)
+
+async def stream_channels(channels=None, metrics=None, write_lake=True, poll_interval_s=None, duration_s=None,
+                          batch_size=None, flush_interval_s=None):
+    """
+    Near-real-time ingest: pushes new messages from the channels straight into
+    raw.telegram_messages through a BufferedMessageWriter, skipping the file hop.
+    Subscribes to new-message events, or polls every `poll_interval_s` seconds when
+    given. The data lake copy is still written unless `write_lake` is False, so the
+    batch loader and detection keep working. Runs until disconnected or for
+    `duration_s` seconds. Older history is left to the batch scrape.
+    Returns the StageMetrics for the run, including the writer's counters.
+    """
+    from telethon import events
+    from telethon.errors import RPCError
+    from telethon.sync import TelegramClient
+    from telethon.utils import get_peer_id
+    from config.settings import settings
+    from scripts.load_to_postgres import BufferedMessageWriter, StreamWriterError
+
+    if metrics is None:
+        metrics = StageMetrics('stream', rate_counters=('messages', 'messages_loaded'))
+
+    if not API_ID or not API_HASH:
+        logger.error("TELEGRAM_API_ID and TELEGRAM_API_HASH must be set in the .env file.")
+        metrics.increment('config_errors')
+        return metrics
+
+    client = TelegramClient(SESSION_NAME, int(API_ID), API_HASH, flood_sleep_threshold=FLOOD_SLEEP_THRESHOLD)
+    limiter = create_rate_limiter()
+    media_index = MediaIndex(MEDIA_INDEX_PATH, root=PROJECT_ROOT)
+    writer = BufferedMessageWriter(batch_size=batch_size, flush_interval_s=flush_interval_s, metrics=metrics)
+    deadline = time.monotonic() + duration_s if duration_s else None
+
+    try:
+        await writer.start()
+        logger.info("Connecting to Telegram...")
+        await client.start()
+        logger.info("Connected to Telegram successfully.")
+
+        # Channel entities keyed by the peer id that new-message events carry as chat_id
+        targets = {}
+        for channel_url in (channels or settings.TELEGRAM_CHANNELS):
+            try:
+                entity, channel_name = await resolve_channel(client, channel_url, limiter, metrics)
+            except RPCError as e:
+                logger.error(f"Telegram RPC Error for {channel_url}: {e}")
+                metrics.increment('channels_failed')
+                continue
+            targets[get_peer_id(entity)] = (entity, channel_name)
+        if not targets:
+            logger.error("No channels could be resolved; nothing to stream.")
+            return metrics
+
+        if poll_interval_s:
+            logger.info(f"Polling {len(targets)} channels every {poll_interval_s}s.")
+            await poll_channels(
+                client, targets, writer, metrics, limiter, media_index, write_lake, poll_interval_s, deadline,
+            )
+        else:
+            async def on_new_message(event):
+                entity, channel_name = targets[event.chat_id]
+                try:
+                    await stream_message(
+                        event.message, entity, channel_name, writer, metrics, limiter, media_index, write_lake,
+                    )
+                except StreamWriterError:
+                    # Nothing can be stored any more: stop listening, close() reports why
+                    await client.disconnect()
+                except Exception as e:
+                    logger.error(f"Error streaming message {event.message.id} from {channel_name}: {e}", exc_info=True)
+                    metrics.increment('stream_errors')
+
+            client.add_event_handler(on_new_message, events.NewMessage(chats=list(targets)))
+            logger.info(f"Listening for new messages on {len(targets)} channels.")
+            try:
+                await asyncio.wait_for(client.run_until_disconnected(), duration_s)
+            except asyncio.TimeoutError:
+                pass
+
+    except StreamWriterError:
+        pass # Reported when the writer is closed below
+    except Exception as e:
+        logger.critical(f"Streaming ingest stopped: {e}", exc_info=True)
+        metrics.increment('connection_errors')
+    finally:
+        # Flush whatever is still buffered before shutting down
+        try:
+            await writer.close()
+        except StreamWriterError as e:
+            logger.critical(f"Streaming ingest stopped: {e}", exc_info=True)
+            metrics.increment('writer_errors')
+        logger.info(f"Rate limiter stats: {limiter.stats()}")
+        media_index.close()
+        if client.is_connected():
+            logger.info("Disconnecting from Telegram.")
+            await client.disconnect()
+    return metrics
+
+def run_stream(channels=None, metrics=None, write_lake=True, poll_interval_s=None, duration_s=None,
+               batch_size=None, flush_interval_s=None):
+    """Synchronous entry point for streaming mode."""
+    return asyncio.run(stream_channels(
+        channels=channels, metrics=metrics, write_lake=write_lake, poll_interval_s=poll_interval_s,
+        duration_s=duration_s, batch_size=batch_size, flush_interval_s=flush_interval_s,
+    ))
+
+def run_scrape(channels=None, limit=None, metrics=None, partition_date=None):
+    """Synchronous entry point for callers outside an event loop (e.g. the Dagster ops)."""
+    return asyncio.run(
+        scrape_channels(channels=channels, limit=limit, metrics=metrics, partition_date=partition_date)
+    )
+
+def main():
+    """
+    Main function to parse arguments and scrape all configured channels.
+    """
+    parser = argparse.ArgumentParser(description="Scrape Telegram channel messages and media.")
+    parser.add_argument('--limit', type=int, default=None,
+                        help='Maximum number of messages to scrape per channel. If not provided, scrapes all messages.')
+    parser.add_argument('--channel', action='append', dest='channels', default=None,
+                        help='Channel URL to scrape (repeatable). Defaults to the configured channel list.')
+    parser.add_argument('--date', type=lambda d: datetime.strptime(d, '%Y-%m-%d').date(), default=None,
+                        help='Only scrape messages posted on this UTC day (YYYY-MM-DD).')
+    parser.add_argument('--stream', action='store_true',
+                        help='Stream new messages straight into raw.telegram_messages instead of scraping history.')
+    parser.add_argument('--poll-interval', type=float, default=None,
+                        help='With --stream, poll channels every N seconds instead of subscribing to updates.')
+    parser.add_argument('--duration', type=float, default=None,
+                        help='With --stream, stop after N seconds (default: run until interrupted).')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='With --stream, rows per database insert (default: STREAM_BATCH_SIZE).')
+    parser.add_argument('--flush-interval', type=float, default=None,
+                        help='With --stream, maximum seconds a row is buffered (default: STREAM_FLUSH_INTERVAL_S).')
+    parser.add_argument('--no-lake', action='store_true',
+                        help='With --stream, do not write the JSON data lake copy.')
+    add_profile_argument(parser)
+    args = parser.parse_args()
+    configure_logging(LOG_FILE)
+
+    with profiled('stream' if args.stream else 'scrape', args.profile):
+        if args.stream:
+            metrics = run_stream(
+                channels=args.channels, write_lake=not args.no_lake, poll_interval_s=args.poll_interval,
+                duration_s=args.duration, batch_size=args.batch_size, flush_interval_s=args.flush_interval,
+            )
+        else:
+            metrics = run_scrape(channels=args.channels, limit=args.limit, partition_date=args.date)
+    metrics.emit()
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    main()
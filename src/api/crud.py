@@ -1,4 +1,5 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from datetime import date
 import psycopg2
 from psycopg2 import sql
 
@@ -112,3 +113,173 @@ def search_messages(db_conn: psycopg2.extensions.connection, query_text: str, li
         results = [row_to_dict(cur, row) for row in cur.fetchall()]
     return results
 
+
+def get_object_class_frequency(
+    db_conn: psycopg2.extensions.connection,
+    channel_name: Optional[str] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Returns how often each object class was detected, optionally for one channel and
+    date range. Reads the pre-aggregated agg_daily_detections mart.
+    """
+    conditions = [sql.SQL("TRUE")]
+    params = []
+    if channel_name is not None:
+        conditions.append(sql.SQL("dc.channel_name ILIKE %s"))
+        params.append(channel_name)
+    if start_date is not None:
+        conditions.append(sql.SQL("agg.date_key >= %s"))
+        params.append(int(start_date.strftime('%Y%m%d')))
+    if end_date is not None:
+        conditions.append(sql.SQL("agg.date_key <= %s"))
+        params.append(int(end_date.strftime('%Y%m%d')))
+
+    query = sql.SQL("""
+        SELECT
+            agg.detected_object_class,
+            SUM(agg.detection_count)::bigint AS detection_count,
+            SUM(agg.image_count)::bigint AS image_count,
+            (SUM(agg.avg_confidence * agg.detection_count) / SUM(agg.detection_count))::float AS avg_confidence
+        FROM
+            public.agg_daily_detections agg
+        JOIN
+            public.dim_channels dc ON agg.channel_id = dc.channel_id
+        WHERE
+            {conditions}
+        GROUP BY
+            agg.detected_object_class
+        ORDER BY
+            detection_count DESC
+        LIMIT %s;
+    """).format(conditions=sql.SQL(" AND ").join(conditions))
+
+    with db_conn.cursor() as cur:
+        cur.execute(query, params + [limit])
+        results = [row_to_dict(cur, row) for row in cur.fetchall()]
+    return results
+
+def get_channel_detection_timeline(
+    db_conn: psycopg2.extensions.connection,
+    channel_name: str,
+    object_class: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    Returns a channel's daily detection counts per object class, optionally for a
+    single class. Reads the pre-aggregated agg_daily_detections mart.
+    """
+    class_condition = sql.SQL("AND agg.detected_object_class = %s") if object_class else sql.SQL("")
+    query = sql.SQL("""
+        SELECT
+            dd.full_date::text AS date,
+            agg.detected_object_class,
+            agg.detection_count
+        FROM
+            public.agg_daily_detections agg
+        JOIN
+            public.dim_channels dc ON agg.channel_id = dc.channel_id
+        JOIN
+            public.dim_dates dd ON agg.date_key = dd.date_key
+        WHERE
+            dc.channel_name ILIKE %s
+            {class_condition}
+        ORDER BY
+            dd.full_date, agg.detected_object_class;
+    """).format(class_condition=class_condition)
+
+    params = [channel_name] + ([object_class] if object_class else [])
+    with db_conn.cursor() as cur:
+        cur.execute(query, params)
+        results = [row_to_dict(cur, row) for row in cur.fetchall()]
+    return results
+
+def get_top_detection_images(
+    db_conn: psycopg2.extensions.connection,
+    object_class: str,
+    limit: int = 20
+) -> List[Dict[str, Any]]:
+    """
+    Returns the images with the highest-confidence detections of an object class,
+    once per image: an image with several boxes of the class is ranked by its best one.
+    """
+    query = sql.SQL("""
+        WITH best_per_image AS (
+            SELECT DISTINCT ON (image_path)
+                message_id,
+                image_path,
+                detected_object_class,
+                confidence_score
+            FROM
+                public.fct_image_detections
+            WHERE
+                detected_object_class = %s
+            ORDER BY
+                image_path, confidence_score DESC
+        )
+        SELECT
+            det.message_id,
+            dc.channel_name,
+            det.image_path,
+            det.detected_object_class,
+            det.confidence_score::float AS confidence_score
+        FROM
+            best_per_image det
+        LEFT JOIN
+            public.fct_messages fm ON det.message_id = fm.message_id
+        LEFT JOIN
+            public.dim_channels dc ON fm.channel_id = dc.channel_id
+        ORDER BY
+            det.confidence_score DESC
+        LIMIT %s;
+    """)
+
+    with db_conn.cursor() as cur:
+        cur.execute(query, (object_class, limit))
+        results = [row_to_dict(cur, row) for row in cur.fetchall()]
+    return results
+
+def get_messages_with_object_class(
+    db_conn: psycopg2.extensions.connection,
+    object_class: str,
+    min_confidence: float = 0.0,
+    limit: int = 100
+) -> List[Dict[str, Any]]:
+    """
+    Returns the most recent messages whose image contains an object class.
+    """
+    query = sql.SQL("""
+        WITH class_messages AS (
+            SELECT
+                message_id,
+                MAX(confidence_score) AS max_confidence
+            FROM
+                public.fct_image_detections
+            WHERE
+                detected_object_class = %s
+                AND confidence_score >= %s
+            GROUP BY
+                message_id
+        )
+        SELECT
+            fm.message_id,
+            dc.channel_name,
+            fm.message_date,
+            fm.message_text,
+            cm.max_confidence::float AS max_confidence
+        FROM
+            class_messages cm
+        JOIN
+            public.fct_messages fm ON cm.message_id = fm.message_id
+        JOIN
+            public.dim_channels dc ON fm.channel_id = dc.channel_id
+        ORDER BY
+            fm.message_date DESC
+        LIMIT %s;
+    """)
+
+    with db_conn.cursor() as cur:
+        cur.execute(query, (object_class, min_confidence, limit))
+        results = [row_to_dict(cur, row) for row in cur.fetchall()]
+    return results
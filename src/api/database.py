@@ -1,8 +1,11 @@
 import os
+import time
 import psycopg2
 from psycopg2 import sql
 from dotenv import load_dotenv
 
+from .timing import TimedCursor, add_db_time
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -17,7 +20,8 @@ def get_db_connection():
     """
     Establishes and returns a PostgreSQL database connection.
     This function is designed to be called for each request or as needed
-    to ensure fresh connections.
+    to ensure fresh connections. Cursors are TimedCursors, so query time is
+    reported per request by the timing middleware.
     """
     try:
         conn = psycopg2.connect(
@@ -25,7 +29,8 @@ def get_db_connection():
             port=DB_PORT,
             user=DB_USER,
             password=DB_PASSWORD,
-            dbname=DB_NAME
+            dbname=DB_NAME,
+            cursor_factory=TimedCursor,
         )
         return conn
     except psycopg2.OperationalError as e:
@@ -36,11 +41,14 @@ def get_db_connection():
 def get_db():
     """
     Dependency to provide a database connection for FastAPI endpoints.
-    Ensures the connection is closed after the request.
+    Ensures the connection is closed after the request. Connecting counts as
+    database time in the request timings.
     """
     conn = None
     try:
+        start = time.perf_counter()
         conn = get_db_connection()
+        add_db_time(time.perf_counter() - start)
         yield conn
     finally:
         if conn:
@@ -1,12 +1,20 @@
 from fastapi import FastAPI, Depends, HTTPException, Query
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, date
 import psycopg2.extensions # For type hinting the connection
 from contextlib import asynccontextmanager
 
 from .database import get_db # Relative import
-from .schemas import TopProduct, ChannelActivity, MessageSearchResult, ErrorResponse # Relative import
-from .crud import get_top_products, get_channel_activity, search_messages # Relative import
+from .timing import EndpointTimings, RequestTimingMiddleware # Relative import
+from .schemas import (
+    TopProduct, ChannelActivity, MessageSearchResult, ErrorResponse,
+    ObjectClassFrequency, DetectionTimelinePoint, TopDetectionImage, DetectedClassMessage,
+) # Relative import
+from .crud import (
+    get_top_products, get_channel_activity, search_messages,
+    get_object_class_frequency, get_channel_detection_timeline, get_top_detection_images,
+    get_messages_with_object_class,
+) # Relative import
 
 # --- FastAPI Application Lifecycle (Optional, but good for cleanup) ---
 # This context manager can be used for startup/shutdown events,
@@ -26,6 +34,10 @@ app = FastAPI(
     lifespan=lifespan # Assign the lifespan context manager
 )
 
+# Per-endpoint timings split into database and serialization time (see timing.py)
+endpoint_timings = EndpointTimings()
+app.add_middleware(RequestTimingMiddleware, timings=endpoint_timings)
+
 # --- API Endpoints ---
 
 @app.get(
@@ -86,3 +98,87 @@ async def search_telegram_messages(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to search messages: {e}")
 
+
+@app.get(
+    "/api/detections/classes",
+    response_model=List[ObjectClassFrequency],
+    summary="Get object class frequency",
+    description="Returns how often each object class was detected in images, optionally for one channel and date range.",
+    responses={200: {"description": "Successful Response"}, 500: {"model": ErrorResponse, "description": "Internal Server Error"}}
+)
+async def read_object_class_frequency(
+    channel: Optional[str] = Query(None, description="Restrict to this channel"),
+    start_date: Optional[date] = Query(None, description="First message date to include (YYYY-MM-DD)"),
+    end_date: Optional[date] = Query(None, description="Last message date to include (YYYY-MM-DD)"),
+    limit: int = Query(20, ge=1, le=100, description="Number of object classes to return"),
+    db_conn: psycopg2.extensions.connection = Depends(get_db)
+):
+    try:
+        return get_object_class_frequency(db_conn, channel, start_date, end_date, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve object class frequency: {e}")
+
+@app.get(
+    "/api/channels/{channel_name}/detections",
+    response_model=List[DetectionTimelinePoint],
+    summary="Get channel detections over time",
+    description="Returns the daily number of detections per object class for a specific Telegram channel.",
+    responses={200: {"description": "Successful Response"}, 404: {"model": ErrorResponse, "description": "Channel not found"}, 500: {"model": ErrorResponse, "description": "Internal Server Error"}}
+)
+async def read_channel_detection_timeline(
+    channel_name: str,
+    object_class: Optional[str] = Query(None, description="Only return this object class"),
+    db_conn: psycopg2.extensions.connection = Depends(get_db)
+):
+    try:
+        timeline = get_channel_detection_timeline(db_conn, channel_name, object_class)
+        if not timeline:
+            raise HTTPException(status_code=404, detail=f"No detections found for channel '{channel_name}'. Check channel name or data availability.")
+        return timeline
+    except HTTPException as e:
+        raise e # Re-raise HTTPExceptions
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve channel detections: {e}")
+
+@app.get(
+    "/api/detections/{object_class}/top-images",
+    response_model=List[TopDetectionImage],
+    summary="Get top images for an object class",
+    description="Returns the images in which an object class was detected with the highest confidence.",
+    responses={200: {"description": "Successful Response"}, 500: {"model": ErrorResponse, "description": "Internal Server Error"}}
+)
+async def read_top_detection_images(
+    object_class: str,
+    limit: int = Query(20, ge=1, le=100, description="Number of images to return"),
+    db_conn: psycopg2.extensions.connection = Depends(get_db)
+):
+    try:
+        return get_top_detection_images(db_conn, object_class, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve top images: {e}")
+
+@app.get(
+    "/api/detections/{object_class}/messages",
+    response_model=List[DetectedClassMessage],
+    summary="Get messages containing an object class",
+    description="Returns the most recent messages whose image contains the given object class.",
+    responses={200: {"description": "Successful Response"}, 500: {"model": ErrorResponse, "description": "Internal Server Error"}}
+)
+async def read_messages_with_object_class(
+    object_class: str,
+    min_confidence: float = Query(0.0, ge=0.0, le=1.0, description="Minimum detection confidence"),
+    limit: int = Query(100, ge=1, le=500, description="Maximum number of messages to return"),
+    db_conn: psycopg2.extensions.connection = Depends(get_db)
+):
+    try:
+        return get_messages_with_object_class(db_conn, object_class, min_confidence, limit)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve messages: {e}")
+
+@app.get(
+    "/api/timings",
+    summary="Get per-endpoint request timings",
+    description="Returns request counts and mean total, database and serialization time per endpoint since startup.",
+)
+async def read_endpoint_timings():
+    return endpoint_timings.summary()
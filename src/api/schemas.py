@@ -21,6 +21,35 @@ class MessageSearchResult(BaseModel):
     has_media: bool
     media_type: Optional[str] = None # Optional as it can be NULL
 
+# Schema for object class frequency (per channel or overall)
+class ObjectClassFrequency(BaseModel):
+    detected_object_class: str
+    detection_count: int
+    image_count: int
+    avg_confidence: float
+
+# Schema for a channel's daily detection counts per object class
+class DetectionTimelinePoint(BaseModel):
+    date: str # YYYY-MM-DD format
+    detected_object_class: str
+    detection_count: int
+
+# Schema for the highest-confidence detections of a class
+class TopDetectionImage(BaseModel):
+    message_id: int
+    channel_name: Optional[str] = None # NULL if the message is not loaded yet
+    image_path: str
+    detected_object_class: str
+    confidence_score: float
+
+# Schema for messages whose image contains a given object class
+class DetectedClassMessage(BaseModel):
+    message_id: int
+    channel_name: str
+    message_date: datetime
+    message_text: str
+    max_confidence: float
+
 # Generic error response schema
 class ErrorResponse(BaseModel):
     detail: str
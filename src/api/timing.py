@@ -0,0 +1,129 @@
+"""
+Per-endpoint request timings for the API, split into database time and the rest.
+
+`TimedCursor` adds the time spent in execute/fetch calls (and `get_db` the time to
+connect) to the current request's timer, which `RequestTimingMiddleware` installs
+in a context variable. Everything else a request spends in the app (converting
+rows, validating the response model and encoding JSON) is reported as serialization
+time. Each response carries a Server-Timing header, and `EndpointTimings` keeps
+running totals per route.
+"""
+
+import time
+import threading
+import contextvars
+
+import psycopg2.extensions
+from starlette.datastructures import MutableHeaders
+
+# Timer of the request being handled: {'db': seconds}. A mutable dict, so time added
+# in copied contexts (thread pool, background tasks) is still seen by the middleware.
+_request_timer = contextvars.ContextVar('request_timer', default=None)
+
+
+def add_db_time(seconds):
+    """Charges `seconds` of database work to the request being handled, if any."""
+    timer = _request_timer.get()
+    if timer is not None:
+        timer['db'] += seconds
+
+
+class TimedCursor(psycopg2.extensions.cursor):
+    """Cursor that charges the time spent executing and fetching to the current request."""
+
+    def execute(self, query, vars=None):
+        start = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            add_db_time(time.perf_counter() - start)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchone()
+        finally:
+            add_db_time(time.perf_counter() - start)
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        try:
+            return super().fetchmany(size) if size is not None else super().fetchmany()
+        finally:
+            add_db_time(time.perf_counter() - start)
+
+    def fetchall(self):
+        start = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            add_db_time(time.perf_counter() - start)
+
+
+class EndpointTimings:
+    """Running request count and total/db/serialization seconds per route."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, route, total_s, db_s):
+        with self._lock:
+            totals = self._totals.setdefault(route, {'requests': 0, 'total_s': 0.0, 'db_s': 0.0})
+            totals['requests'] += 1
+            totals['total_s'] += total_s
+            totals['db_s'] += db_s
+
+    def summary(self):
+        """Returns per-route request counts and mean milliseconds per request."""
+        with self._lock:
+            return {
+                route: {
+                    'requests': t['requests'],
+                    'mean_total_ms': round(1000 * t['total_s'] / t['requests'], 3),
+                    'mean_db_ms': round(1000 * t['db_s'] / t['requests'], 3),
+                    'mean_serialization_ms': round(1000 * (t['total_s'] - t['db_s']) / t['requests'], 3),
+                }
+                for route, t in sorted(self._totals.items())
+            }
+
+
+class RequestTimingMiddleware:
+    """
+    ASGI middleware that times each HTTP request up to the start of its response,
+    adds `Server-Timing: db;dur=..., serialization;dur=..., total;dur=...` and
+    records the request in `timings` under its route template.
+    """
+
+    def __init__(self, app, timings):
+        self.app = app
+        self.timings = timings
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timer = {'db': 0.0}
+        token = _request_timer.set(timer)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                total_s = time.perf_counter() - start
+                db_s = timer['db']
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    'Server-Timing',
+                    f"db;dur={1000 * db_s:.3f}, serialization;dur={1000 * (total_s - db_s):.3f}, "
+                    f"total;dur={1000 * total_s:.3f}",
+                )
+                # The router stores the matched route in the scope; unmatched paths are grouped
+                route = scope.get('route')
+                self.timings.record(getattr(route, 'path', 'unmatched'), total_s, db_s)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timer.reset(token)
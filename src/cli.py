@@ -0,0 +1,189 @@
+"""
+Unified command-line entry point for the pipeline:
+
+    telegram-pipeline scrape|load|detect|compact [stage options]
+    telegram-pipeline serve [--host HOST] [--port PORT] [--reload]
+    telegram-pipeline health
+    telegram-pipeline import-time [STAGE ...]
+
+Stage modules, and with them telethon, ultralytics/torch and FastAPI, are imported
+only inside the subcommand that runs them, so `--help` and `health` start without
+loading any of them. Options after a stage name go to that stage script's own
+parser, e.g. `telegram-pipeline detect --reenrich --max-images 100`.
+"""
+
+import os
+import sys
+import time
+import argparse
+import importlib
+import subprocess
+
+from src.utils.profiling import add_profile_argument
+
+# Stage subcommands: name -> (module whose main() runs it, help text)
+STAGE_COMMANDS = {
+    'scrape': ('scripts.scrape_telegram', 'Scrape Telegram channels into the data lake (or --stream into Postgres).'),
+    'load': ('scripts.load_to_postgres', 'Load the JSON data lake into raw.telegram_messages.'),
+    'detect': ('scripts.detect_objects', 'Run YOLO object detection on scraped images.'),
+    'compact': ('scripts.compact_data_lake', 'Compact old data lake partitions and apply image retention.'),
+}
+API_APP = 'src.api.main:app'
+
+# The stages find data/, the dbt project and the Telegram session relative to the
+# source checkout, so the package only works installed in editable mode
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+PROJECT_MARKER = os.path.join('src', 'dbt', 'dbt_project.yml')
+
+# Number of packages listed by `import-time`
+IMPORT_TIME_TOP_N = 15
+
+
+def check_project_root():
+    """Returns an error message if the package is not running from a source checkout, else None."""
+    if os.path.isfile(os.path.join(PROJECT_ROOT, PROJECT_MARKER)):
+        return None
+    return (
+        f"telegram-pipeline is not running from a source checkout ({PROJECT_ROOT} has no {PROJECT_MARKER}). "
+        "Install it in editable mode from the repository: pip install -e ."
+    )
+
+
+def load_environment():
+    """Loads .env before any stage module reads its settings from the environment."""
+    from dotenv import load_dotenv
+    load_dotenv()
+
+
+def run_stage(command, stage_args, report_import_time=False):
+    """Imports a stage script and runs its main() with `stage_args` as its command line."""
+    module_name = STAGE_COMMANDS[command][0]
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    if report_import_time:
+        print(f"Imported {module_name} in {time.perf_counter() - start:.3f}s", file=sys.stderr)
+    sys.argv = [f"telegram-pipeline {command}", *stage_args]
+    module.main()
+
+
+def serve(host, port, reload, profile=None):
+    """Runs the analytics API with uvicorn, optionally profiling the server until it stops."""
+    import uvicorn
+    from src.utils.profiling import profiled
+
+    with profiled('api', profile):
+        uvicorn.run(API_APP, host=host, port=port, reload=reload)
+
+
+def health():
+    """Checks that PostgreSQL is reachable. Returns the process exit code."""
+    from src.api.database import get_db_connection
+
+    try:
+        conn = get_db_connection()
+    except Exception as e:
+        print(f"database: unreachable ({e})", file=sys.stderr)
+        return 1
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1;")
+    finally:
+        conn.close()
+    print("database: ok")
+    return 0
+
+
+def parse_import_times(stderr_output):
+    """
+    Parses `python -X importtime` output into {top-level package: cumulative seconds},
+    keeping the largest cumulative time seen for each package (its first import).
+    """
+    packages = {}
+    for line in stderr_output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue # Header line
+        package = fields[2].strip().split('.')[0]
+        cumulative_s = int(fields[1]) / 1e6
+        packages[package] = max(packages.get(package, 0.0), cumulative_s)
+    return packages
+
+
+def report_import_time(stages):
+    """
+    Imports each stage module in a fresh interpreter under `-X importtime` and prints
+    its total import time and the slowest packages it pulls in.
+    """
+    modules = {name: STAGE_COMMANDS[name][0] for name in STAGE_COMMANDS}
+    modules['serve'] = API_APP.split(':')[0]
+    for stage in stages or modules:
+        module_name = modules[stage]
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', f'import {module_name}'],
+            capture_output=True, text=True, cwd=os.getcwd(),
+        )
+        elapsed = time.perf_counter() - start
+        if result.returncode != 0:
+            print(f"{stage}: import of {module_name} failed:\n{result.stderr.splitlines()[-1]}")
+            continue
+        packages = parse_import_times(result.stderr)
+        print(f"{stage}: {module_name} imported in {packages.get(module_name.split('.')[0], 0.0):.3f}s "
+              f"(interpreter total {elapsed:.3f}s)")
+        for package, seconds in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:IMPORT_TIME_TOP_N]:
+            print(f"  {seconds:8.3f}s  {package}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='telegram-pipeline', description="Telegram medical data pipeline.")
+    parser.add_argument('--import-time', action='store_true',
+                        help='Print how long the stage module took to import.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in STAGE_COMMANDS.items():
+        # Stage options (including --help) are passed through to the stage script
+        subparsers.add_parser(name, help=help_text, add_help=False)
+
+    serve_parser = subparsers.add_parser('serve', help='Run the analytics API.')
+    serve_parser.add_argument('--host', default='0.0.0.0')
+    serve_parser.add_argument('--port', type=int, default=8000)
+    serve_parser.add_argument('--reload', action='store_true', help='Restart the server on code changes.')
+    add_profile_argument(serve_parser)
+
+    subparsers.add_parser('health', help='Check that PostgreSQL is reachable.')
+
+    import_time_parser = subparsers.add_parser(
+        'import-time', help='Report the import time of the stage modules using -X importtime.'
+    )
+    import_time_parser.add_argument('stages', nargs='*', metavar='STAGE',
+                                    help=f"Stages to measure: {', '.join([*STAGE_COMMANDS, 'serve'])} (default: all).")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args, rest = parser.parse_known_args(argv)
+    if rest and args.command not in STAGE_COMMANDS:
+        parser.error(f"unrecognized arguments: {' '.join(rest)}")
+    if args.command == 'import-time':
+        unknown = set(args.stages) - {*STAGE_COMMANDS, 'serve'}
+        if unknown:
+            parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    error = check_project_root()
+    if error:
+        parser.exit(2, f"{parser.prog}: error: {error}\n")
+    load_environment()
+    if args.command in STAGE_COMMANDS:
+        run_stage(args.command, rest, report_import_time=args.import_time)
+    elif args.command == 'serve':
+        serve(args.host, args.port, args.reload, args.profile)
+    elif args.command == 'health':
+        sys.exit(health())
+    elif args.command == 'import-time':
+        report_import_time(args.stages)
+
+
+if __name__ == '__main__':
+    main()
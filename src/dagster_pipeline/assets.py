@@ -0,0 +1,163 @@
+"""
+Software-defined assets for the Telegram pipeline.
+
+The raw messages, raw images, loaded rows and detections are partitioned by message
+date and channel, so a backfill or the rerun of one failed channel/day only touches
+that slice, and independent partitions can run in parallel. The dbt marts are rebuilt
+as a whole from all loaded partitions.
+"""
+import os
+from datetime import datetime
+from dagster import (
+    asset, multi_asset, AssetSpec, AssetKey, AssetExecutionContext, MaterializeResult, Failure,
+    DailyPartitionsDefinition, StaticPartitionsDefinition, MultiPartitionsDefinition,
+)
+
+from config.settings import settings, channel_name_from_url
+from src.utils.metrics import summary_to_metadata
+from src.utils.data_lake import partition_media_paths
+from .ops import (
+    PROJECT_ROOT, DBT_PROJECT_PATH, TELEGRAM_API_POOL,
+    RAW_MESSAGES_ASSET_KEY, RAW_TABLE_ASSET_KEY, DETECTIONS_ASSET_KEY, DBT_MARTS_ASSET_KEY,
+    forward_script_logs, stream_subprocess, dbt_run_results_metadata,
+)
+
+RAW_IMAGES_ASSET_KEY = AssetKey(["telegram", "raw_images"])
+
+RAW_MESSAGES_PATH = os.path.join(PROJECT_ROOT, "data", "raw", "telegram_messages")
+
+# --- Partitions ---
+
+date_partitions = DailyPartitionsDefinition(start_date=settings.PARTITIONS_START_DATE)
+channel_partitions = StaticPartitionsDefinition(
+    [channel_name_from_url(url) for url in settings.TELEGRAM_CHANNELS]
+)
+date_channel_partitions = MultiPartitionsDefinition({"date": date_partitions, "channel": channel_partitions})
+
+# --- Helpers ---
+
+def partition_slice(context: AssetExecutionContext):
+    """Returns the (YYYY-MM-DD date, channel name) of the partition being materialized."""
+    keys = context.partition_key.keys_by_dimension
+    return keys["date"], keys["channel"]
+
+def channel_url_for(channel: str) -> str:
+    """Maps a channel partition key back to its configured URL."""
+    for url in settings.TELEGRAM_CHANNELS:
+        if channel_name_from_url(url).lower() == channel.lower():
+            return url
+    raise Failure(description=f"Channel '{channel}' is not configured in settings.TELEGRAM_CHANNELS.")
+
+def partition_image_paths(date_str: str, channel: str):
+    """
+    Returns the downloaded image paths referenced by the messages of one date/channel
+    partition, whether or not it has been compacted. Images removed by the retention
+    job are left out.
+    """
+    image_paths = []
+    date_path = os.path.join(RAW_MESSAGES_PATH, date_str)
+    if not os.path.isdir(date_path):
+        return image_paths
+    for channel_dir in os.listdir(date_path):
+        if channel_dir.lower() != channel.lower():
+            continue
+        for media_path in partition_media_paths(os.path.join(date_path, channel_dir)):
+            full_path = media_path if os.path.isabs(media_path) else os.path.join(PROJECT_ROOT, media_path)
+            if os.path.exists(full_path):
+                image_paths.append(full_path)
+    return image_paths
+
+# --- Assets ---
+# As in ops.py, the stage scripts are imported inside each asset to keep
+# definition loading free of telethon, ultralytics and torch.
+
+@multi_asset(
+    specs=[
+        AssetSpec(RAW_MESSAGES_ASSET_KEY, description="Per-message JSON files in data/raw/telegram_messages."),
+        AssetSpec(RAW_IMAGES_ASSET_KEY, description="Images downloaded to data/raw/images."),
+    ],
+    partitions_def=date_channel_partitions,
+    pool=TELEGRAM_API_POOL,
+    group_name="telegram",
+)
+def raw_telegram_messages_and_images(context: AssetExecutionContext):
+    """Scrapes the messages (and their images) posted to one channel on one day."""
+    from scripts import scrape_telegram
+
+    date_str, channel = partition_slice(context)
+    partition_date = datetime.strptime(date_str, "%Y-%m-%d").date()
+    with forward_script_logs(context, scrape_telegram):
+        metrics = scrape_telegram.run_scrape(channels=[channel_url_for(channel)], partition_date=partition_date)
+
+    summary = metrics.summary()
+    counters = summary["counters"]
+    if counters.get("config_errors") or counters.get("connection_errors") or counters.get("channels_failed"):
+        raise Failure(description=f"Scraping {channel} for {date_str} failed.", metadata=summary_to_metadata(summary))
+
+    yield MaterializeResult(asset_key=RAW_MESSAGES_ASSET_KEY, metadata=summary_to_metadata(summary))
+    yield MaterializeResult(
+        asset_key=RAW_IMAGES_ASSET_KEY,
+        metadata={"images": counters.get("images", 0), "media_errors": counters.get("media_errors", 0)},
+    )
+
+@asset(
+    key=RAW_TABLE_ASSET_KEY,
+    deps=[RAW_MESSAGES_ASSET_KEY],
+    partitions_def=date_channel_partitions,
+    group_name="warehouse",
+    description="Rows of raw.telegram_messages loaded from one date/channel partition.",
+)
+def raw_telegram_messages_table(context: AssetExecutionContext):
+    """Loads one date/channel partition of the data lake into raw.telegram_messages."""
+    from scripts import load_to_postgres
+
+    date_str, channel = partition_slice(context)
+    with forward_script_logs(context, load_to_postgres):
+        metrics = load_to_postgres.load_json_to_postgres(
+            raw_messages_path=RAW_MESSAGES_PATH, dates=[date_str], channels=[channel]
+        )
+    summary = metrics.summary()
+    if summary["counters"].get("load_errors"):
+        raise Failure(description=f"Loading {channel} for {date_str} failed; the transaction was rolled back.")
+    return MaterializeResult(metadata=summary_to_metadata(summary))
+
+@asset(
+    key=DETECTIONS_ASSET_KEY,
+    deps=[RAW_IMAGES_ASSET_KEY],
+    partitions_def=date_channel_partitions,
+    group_name="warehouse",
+    description="YOLO detections in raw.image_detections for one date/channel partition.",
+)
+def raw_image_detections(context: AssetExecutionContext):
+    """Runs object detection on the images of one date/channel partition."""
+    from scripts import detect_objects
+
+    date_str, channel = partition_slice(context)
+    image_paths = partition_image_paths(date_str, channel)
+    context.log.info(f"Found {len(image_paths)} image(s) for {channel} on {date_str}.")
+    with forward_script_logs(context, detect_objects):
+        metrics = detect_objects.run_detection(image_paths=image_paths)
+    summary = metrics.summary()
+    if summary["counters"].get("detect_errors"):
+        raise Failure(description=f"Object detection for {channel} on {date_str} failed.")
+    return MaterializeResult(metadata=summary_to_metadata(summary))
+
+@asset(
+    key=DBT_MARTS_ASSET_KEY,
+    deps=[RAW_TABLE_ASSET_KEY, DETECTIONS_ASSET_KEY],
+    group_name="analytics",
+    description="dbt staging models and analytics marts built from all loaded partitions.",
+)
+def dbt_marts(context: AssetExecutionContext):
+    """Builds and tests the dbt models."""
+    stream_subprocess(context, ["dbt", "run"], cwd=DBT_PROJECT_PATH)
+    metadata = dbt_run_results_metadata(DBT_PROJECT_PATH)
+    stream_subprocess(context, ["dbt", "test"], cwd=DBT_PROJECT_PATH)
+    return MaterializeResult(metadata=metadata)
+
+telegram_assets = [
+    raw_telegram_messages_and_images,
+    raw_telegram_messages_table,
+    raw_image_detections,
+    dbt_marts,
+]
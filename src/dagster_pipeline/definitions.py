@@ -0,0 +1,33 @@
+from dagster import Definitions
+from .assets import telegram_assets
+from .jobs import (
+    telegram_etl_pipeline,
+    telegram_streaming_etl_pipeline,
+    telegram_partitioned_ingest_job,
+    dbt_marts_job,
+    data_lake_maintenance_job,
+)
+from .schedules import (
+    daily_telegram_etl_schedule,
+    daily_partitioned_ingest_schedule,
+    daily_dbt_marts_schedule,
+    daily_data_lake_maintenance_schedule,
+)
+
+# Entry point for `dagster dev -m src.dagster_pipeline.definitions`
+defs = Definitions(
+    assets=telegram_assets,
+    jobs=[
+        telegram_etl_pipeline,
+        telegram_streaming_etl_pipeline,
+        telegram_partitioned_ingest_job,
+        dbt_marts_job,
+        data_lake_maintenance_job,
+    ],
+    schedules=[
+        daily_telegram_etl_schedule,
+        daily_partitioned_ingest_schedule,
+        daily_dbt_marts_schedule,
+        daily_data_lake_maintenance_schedule,
+    ],
+)
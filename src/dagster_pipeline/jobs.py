@@ -1,9 +1,18 @@
-from dagster import job
+from dagster import job, define_asset_job, AssetSelection
+from .assets import (
+    date_channel_partitions,
+    raw_telegram_messages_and_images,
+    raw_telegram_messages_table,
+    raw_image_detections,
+    dbt_marts,
+)
 from .ops import (
     scrape_telegram_data,
     load_raw_to_postgres,
     run_yolo_enrichment,
+    stream_yolo_enrichment,
     run_dbt_transformations,
+    compact_data_lake,
 )
 
 @job(description="Orchestrates the full Telegram data ETL and enrichment pipeline.")
@@ -12,15 +21,61 @@ def telegram_etl_pipeline():
     The main ETL pipeline job for Telegram data.
     Dependencies:
     - scrape_telegram_data -> load_raw_to_postgres
-    - load_raw_to_postgres -> run_yolo_enrichment
-    - run_yolo_enrichment -> run_dbt_transformations
+    - scrape_telegram_data -> run_yolo_enrichment
+    - load_raw_to_postgres + run_yolo_enrichment -> run_dbt_transformations
+    Detection reads only the image files and loading reads only the JSON files, so
+    both start as soon as scraping finishes and run concurrently.
     """
-    # Define the dependencies between ops using the .after() method for clarity
-    # or by passing outputs as inputs if data is explicitly passed between ops.
-    # Here, we use start_after for sequential execution without explicit data passing.
+    # Here, we use start_after for ordering without explicit data passing.
+
+    scraped_data_result = scrape_telegram_data()
+    loaded_data_result = load_raw_to_postgres(start_after=scraped_data_result)
+    enriched_data_result = run_yolo_enrichment(start_after=scraped_data_result)
+    run_dbt_transformations(start_after=[loaded_data_result, enriched_data_result])
 
+@job(description="Telegram ETL pipeline with object detection streaming alongside the scrape.")
+def telegram_streaming_etl_pipeline():
+    """
+    Variant of telegram_etl_pipeline in which detection starts together with scraping
+    and processes each image as soon as it lands, so end-to-end latency is bounded by
+    the slowest stage rather than the sum of all stages.
+    Dependencies:
+    - scrape_telegram_data -> load_raw_to_postgres
+    - stream_yolo_enrichment (runs concurrently with scraping)
+    - load_raw_to_postgres + stream_yolo_enrichment -> run_dbt_transformations
+    """
     scraped_data_result = scrape_telegram_data()
     loaded_data_result = load_raw_to_postgres(start_after=scraped_data_result)
-    enriched_data_result = run_yolo_enrichment(start_after=loaded_data_result)
-    run_dbt_transformations(start_after=enriched_data_result)
+    enriched_data_result = stream_yolo_enrichment()
+    run_dbt_transformations(start_after=[loaded_data_result, enriched_data_result])
+
+@job(description="Compacts old data lake partitions and applies image retention.")
+def data_lake_maintenance_job():
+    """
+    Rolls per-message JSON files of old daily partitions into Parquet and deletes
+    images past their retention period once they have been loaded and enriched.
+    The loader, the detector and the partitioned assets read compacted partitions
+    transparently, so this can run at any time.
+    """
+    compact_data_lake()
 
+# --- Asset Jobs ---
+# Partitioned ingest (scrape -> load / detect) for a single date/channel slice.
+# Each partition runs as its own run, so backfills execute partitions in parallel.
+telegram_partitioned_ingest_job = define_asset_job(
+    name="telegram_partitioned_ingest_job",
+    selection=AssetSelection.assets(
+        raw_telegram_messages_and_images,
+        raw_telegram_messages_table,
+        raw_image_detections,
+    ),
+    partitions_def=date_channel_partitions,
+    description="Scrapes, loads and enriches one date/channel partition of Telegram data.",
+)
+
+# The marts are rebuilt as a whole from every loaded partition.
+dbt_marts_job = define_asset_job(
+    name="dbt_marts_job",
+    selection=AssetSelection.assets(dbt_marts),
+    description="Builds and tests the dbt staging models and analytics marts.",
+)
@@ -1,128 +1,346 @@
 import subprocess
 import os
-from dagster import op, get_dagster_logger, OpExecutionContext
+import json
+import logging
+from contextlib import contextmanager
+from typing import List, Optional
+from dagster import (
+    op, get_dagster_logger, OpExecutionContext, AssetMaterialization, AssetKey,
+    Config, In, Nothing, Failure,
+)
+
+from src.utils.metrics import parse_metrics_lines, summary_to_metadata
 
 logger = get_dagster_logger()
 
-# Define common environment variables for scripts.
-# These will be passed from the Docker environment to the ops' subprocesses.
-# Using os.getenv directly in the op's execution context is more robust
-# as Dagster ensures these are available.
-# We'll pass os.environ directly to subprocess.run to inherit all Docker env vars.
+# Project root (the /app directory inside the Docker container)
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+DBT_PROJECT_PATH = os.path.join(PROJECT_ROOT, "src", "dbt")
 
-@op
-def scrape_telegram_data(context: OpExecutionContext):
+# Asset keys under which each stage reports its metrics
+RAW_MESSAGES_ASSET_KEY = AssetKey(["telegram", "raw_messages"])
+RAW_TABLE_ASSET_KEY = AssetKey(["raw", "telegram_messages"])
+DETECTIONS_ASSET_KEY = AssetKey(["raw", "image_detections"])
+DBT_MARTS_ASSET_KEY = AssetKey(["analytics", "dbt_marts"])
+
+# Scrapes share one Telethon session file, so they must not run concurrently.
+# dagster.yaml limits every pool to one slot; see the README.
+TELEGRAM_API_POOL = "telegram_api"
+
+# --- Op Configuration ---
+
+class ScrapeConfig(Config):
+    limit: Optional[int] = None # Maximum messages per channel; None scrapes everything
+    channels: Optional[List[str]] = None # Defaults to settings.TELEGRAM_CHANNELS
+
+class LoadConfig(Config):
+    raw_messages_path: str = os.path.join(PROJECT_ROOT, "data", "raw", "telegram_messages")
+
+class DetectConfig(Config):
+    images_path: str = os.path.join(PROJECT_ROOT, "data", "raw", "images")
+    # Run detection in a separate interpreter (e.g. to release GPU memory afterwards)
+    isolated: bool = False
+    # Feed the model cached letterboxed images instead of decoding each JPEG again
+    use_image_cache: bool = False
+
+class StreamDetectConfig(Config):
+    images_path: str = os.path.join(PROJECT_ROOT, "data", "raw", "images")
+    poll_interval_s: float = 5.0 # Seconds between scans of the images directory
+    idle_timeout_s: float = 300.0 # Stop after this long without new images when the run has no scrape op
+    max_wait_s: float = 7200.0 # Stop after this long without new images even if the scrape never finishes
+
+class DbtConfig(Config):
+    commands: List[str] = ["debug", "clean", "run", "test"]
+
+class CompactionConfig(Config):
+    raw_messages_path: str = os.path.join(PROJECT_ROOT, "data", "raw", "telegram_messages")
+    images_path: str = os.path.join(PROJECT_ROOT, "data", "raw", "images")
+    older_than_days: Optional[int] = None # Defaults to DATA_LAKE_COMPACT_AFTER_DAYS
+    image_retention_days: Optional[int] = None # Defaults to IMAGE_RETENTION_DAYS (0 keeps all images)
+    dry_run: bool = False
+
+# --- Helpers ---
+
+class _ContextLogHandler(logging.Handler):
+    """Forwards records from the pipeline scripts' loggers to the Dagster run log."""
+
+    def __init__(self, context: OpExecutionContext):
+        super().__init__(level=logging.INFO)
+        self.context = context
+
+    def emit(self, record):
+        message = self.format(record)
+        if record.levelno >= logging.ERROR:
+            self.context.log.error(message)
+        elif record.levelno >= logging.WARNING:
+            self.context.log.warning(message)
+        else:
+            self.context.log.info(message)
+
+@contextmanager
+def forward_script_logs(context: OpExecutionContext, module):
     """
-    Dagster op to execute the Telegram data scraping script.
+    Streams a script module's log records into context.log while the block runs.
+    The scripts leave logging configuration to their entry points, so the module
+    logger is opened up to INFO here; per-item records stay at DEBUG and only the
+    periodic progress summaries reach the run log.
     """
-    context.log.info("Starting Telegram data scraping...")
+    handler = _ContextLogHandler(context)
+    handler.setFormatter(logging.Formatter("%(name)s - %(message)s"))
+    previous_level = module.logger.level
+    module.logger.setLevel(logging.INFO)
+    module.logger.addHandler(handler)
     try:
-        result = subprocess.run(
-            ["python", "scripts/scrape_telegram.py"],
-            cwd="/app", # Run from /app to find scripts/
-            capture_output=True,
-            text=True,
-            check=True, # Raise an exception if the command returns a non-zero exit code
-            env=os.environ # Pass all environment variables from the container
+        yield
+    finally:
+        module.logger.removeHandler(handler)
+        module.logger.setLevel(previous_level)
+
+def stream_subprocess(context: OpExecutionContext, cmd: List[str], cwd: str) -> str:
+    """
+    Runs a command and streams its combined stdout/stderr into context.log line by
+    line while it runs. Returns the full output; raises CalledProcessError on failure.
+    """
+    context.log.info(f"Executing: {' '.join(cmd)}")
+    lines = []
+    with subprocess.Popen(
+        cmd,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        bufsize=1, # Line-buffered so output arrives as it is produced
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    ) as process:
+        for line in process.stdout:
+            line = line.rstrip("\n")
+            lines.append(line)
+            context.log.info(line)
+        returncode = process.wait()
+    output = "\n".join(lines)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, output=output)
+    return output
+
+def scrape_complete_marker(run_id: str) -> str:
+    """
+    Path of the file the scrape op touches when it finishes, for streaming detection.
+    Kept under the project's data directory, so ops running in separate processes or
+    containers that share the data volume see it.
+    """
+    return os.path.join(PROJECT_ROOT, "data", "processed", "run_markers", f"telegram_scrape_{run_id}.done")
+
+def log_stage_metrics(context: OpExecutionContext, summary: Optional[dict], asset_key: AssetKey):
+    """
+    Records a stage's metrics summary (see src/utils/metrics.py) as asset
+    materialization metadata, so throughput can be charted per run.
+    """
+    if not summary:
+        context.log.warning(f"No metrics summary available for {asset_key.to_user_string()}.")
+        return None
+    if summary.get("error_count"):
+        context.log.warning(f"Stage '{summary['stage']}' reported {summary['error_count']} error(s).")
+    context.log_event(
+        AssetMaterialization(
+            asset_key=asset_key,
+            description=f"Metrics for the '{summary['stage']}' stage.",
+            metadata=summary_to_metadata(summary),
         )
-        context.log.info(f"Scraping stdout:\n{result.stdout}")
-        if result.stderr:
-            context.log.error(f"Scraping stderr:\n{result.stderr}")
+    )
+    return summary
+
+def log_stage_metrics_from_output(context: OpExecutionContext, output: str, asset_key: AssetKey):
+    """Parses the PIPELINE_METRICS line emitted by an isolated script run and records it."""
+    summaries = parse_metrics_lines(output)
+    return log_stage_metrics(context, summaries[-1] if summaries else None, asset_key)
+
+def dbt_run_results_metadata(dbt_cwd: str):
+    """Summarizes target/run_results.json from the last dbt invocation into metadata."""
+    run_results_path = os.path.join(dbt_cwd, "target", "run_results.json")
+    if not os.path.exists(run_results_path):
+        return {}
+    with open(run_results_path, "r", encoding="utf-8") as f:
+        run_results = json.load(f)
+    results = run_results.get("results", [])
+    metadata = {
+        "duration_s": round(run_results.get("elapsed_time", 0.0), 3),
+        "models": len(results),
+        "error_count": sum(1 for r in results if r.get("status") in ("error", "fail")),
+    }
+    for r in results:
+        model_name = r["unique_id"].split(".")[-1]
+        metadata[f"{model_name}_duration_s"] = round(r.get("execution_time", 0.0), 3)
+        rows_affected = (r.get("adapter_response") or {}).get("rows_affected")
+        if rows_affected is not None:
+            metadata[f"{model_name}_rows"] = rows_affected
+    return metadata
+
+# --- Ops ---
+# The stage scripts are imported inside each op so that loading the Dagster
+# definitions does not pull in telethon, ultralytics or torch.
+
+@op(pool=TELEGRAM_API_POOL)
+def scrape_telegram_data(context: OpExecutionContext, config: ScrapeConfig):
+    """
+    Dagster op to scrape Telegram channels in-process via scrape_telegram.run_scrape.
+    """
+    from scripts import scrape_telegram
+
+    context.log.info("Starting Telegram data scraping...")
+    try:
+        with forward_script_logs(context, scrape_telegram):
+            metrics = scrape_telegram.run_scrape(channels=config.channels, limit=config.limit)
+        log_stage_metrics(context, metrics.summary(), RAW_MESSAGES_ASSET_KEY)
         context.log.info("Telegram data scraping completed successfully.")
-    except subprocess.CalledProcessError as e:
-        context.log.error(f"Scraping failed with error: {e.stderr}")
-        raise
     except Exception as e:
         context.log.error(f"An unexpected error occurred during scraping: {e}")
         raise
+    finally:
+        # Signal a concurrently running stream_yolo_enrichment op that no more images will arrive
+        if context.job_def.graph.has_node_named("stream_yolo_enrichment"):
+            marker = scrape_complete_marker(context.run_id)
+            os.makedirs(os.path.dirname(marker), exist_ok=True)
+            with open(marker, "w", encoding="utf-8"):
+                pass
 
-@op
-def load_raw_to_postgres(context: OpExecutionContext):
+@op(ins={"start_after": In(Nothing)})
+def load_raw_to_postgres(context: OpExecutionContext, config: LoadConfig):
     """
-    Dagster op to execute the raw data loading script to PostgreSQL.
+    Dagster op to load raw data to PostgreSQL in-process via load_to_postgres.load_json_to_postgres.
     """
+    from scripts import load_to_postgres
+
     context.log.info("Starting raw data loading to PostgreSQL...")
     try:
-        result = subprocess.run(
-            ["python", "scripts/load_to_postgres.py"],
-            cwd="/app",
-            capture_output=True,
-            text=True,
-            check=True,
-            env=os.environ
-        )
-        context.log.info(f"Loading stdout:\n{result.stdout}")
-        if result.stderr:
-            context.log.error(f"Loading stderr:\n{result.stderr}")
+        with forward_script_logs(context, load_to_postgres):
+            metrics = load_to_postgres.load_json_to_postgres(raw_messages_path=config.raw_messages_path)
+        summary = log_stage_metrics(context, metrics.summary(), RAW_TABLE_ASSET_KEY)
+        if summary.get("counters", {}).get("load_errors"):
+            raise Failure(description="Raw data loading failed; the transaction was rolled back.")
         context.log.info("Raw data loading to PostgreSQL completed successfully.")
-    except subprocess.CalledProcessError as e:
-        context.log.error(f"Loading failed with error: {e.stderr}")
-        raise
     except Exception as e:
         context.log.error(f"An unexpected error occurred during loading: {e}")
         raise
 
-@op
-def run_yolo_enrichment(context: OpExecutionContext):
+@op(ins={"start_after": In(Nothing)})
+def run_yolo_enrichment(context: OpExecutionContext, config: DetectConfig):
     """
-    Dagster op to execute the YOLO object detection enrichment script.
+    Dagster op to run YOLO object detection. Runs in-process by default; with
+    `isolated` it runs detect_objects.py in a subprocess and streams its output.
     """
     context.log.info("Starting YOLO object detection enrichment...")
     try:
-        result = subprocess.run(
-            ["python", "scripts/detect_objects.py"],
-            cwd="/app",
-            capture_output=True,
-            text=True,
-            check=True,
-            env=os.environ
-        )
-        context.log.info(f"YOLO enrichment stdout:\n{result.stdout}")
-        if result.stderr:
-            context.log.error(f"YOLO enrichment stderr:\n{result.stderr}")
+        if config.isolated:
+            cmd = ["python", "-m", "scripts.detect_objects", "--images-path", config.images_path]
+            if config.use_image_cache:
+                cmd.append("--image-cache")
+            output = stream_subprocess(context, cmd, cwd=PROJECT_ROOT)
+            log_stage_metrics_from_output(context, output, DETECTIONS_ASSET_KEY)
+        else:
+            from scripts import detect_objects
+
+            image_cache = None
+            if config.use_image_cache:
+                image_cache = detect_objects.ImageCache(
+                    detect_objects.IMAGE_CACHE_PATH, size=detect_objects.MODEL_INPUT_SIZE
+                )
+            with forward_script_logs(context, detect_objects):
+                metrics = detect_objects.run_detection(images_path=config.images_path, image_cache=image_cache)
+            log_stage_metrics(context, metrics.summary(), DETECTIONS_ASSET_KEY)
         context.log.info("YOLO object detection enrichment completed successfully.")
     except subprocess.CalledProcessError as e:
-        context.log.error(f"YOLO enrichment failed with error: {e.stderr}")
+        context.log.error(f"YOLO enrichment failed with exit code {e.returncode}.")
         raise
     except Exception as e:
         context.log.error(f"An unexpected error occurred during YOLO enrichment: {e}")
         raise
 
 @op
-def run_dbt_transformations(context: OpExecutionContext):
+def stream_yolo_enrichment(context: OpExecutionContext, config: StreamDetectConfig):
+    """
+    Dagster op that runs YOLO detection concurrently with scraping: it picks up each
+    image as soon as the scraper lands it and finishes once the scrape op is done.
+    When the run does not execute the scrape op (e.g. a re-execution of this op
+    alone), it stops after `idle_timeout_s` seconds without new images instead.
+    """
+    from scripts import detect_objects
+
+    # Written by the scrape op when it finishes, even on failure
+    marker = scrape_complete_marker(context.run_id)
+    step_keys = context.dagster_run.step_keys_to_execute
+    if not context.job_def.graph.has_node_named("scrape_telegram_data") or (
+        step_keys is not None and "scrape_telegram_data" not in step_keys
+    ):
+        marker = None
+    context.log.info("Starting streaming YOLO object detection enrichment...")
+    try:
+        with forward_script_logs(context, detect_objects):
+            metrics = detect_objects.watch_for_images(
+                images_path=config.images_path,
+                poll_interval=config.poll_interval_s,
+                idle_timeout=config.idle_timeout_s,
+                stop_file=marker,
+                max_wait=config.max_wait_s,
+            )
+        log_stage_metrics(context, metrics.summary(), DETECTIONS_ASSET_KEY)
+        context.log.info("Streaming YOLO object detection enrichment completed successfully.")
+    except Exception as e:
+        context.log.error(f"An unexpected error occurred during streaming YOLO enrichment: {e}")
+        raise
+    finally:
+        if marker is not None and os.path.exists(marker):
+            os.remove(marker)
+
+@op(ins={"start_after": In(Nothing)})
+def run_dbt_transformations(context: OpExecutionContext, config: DbtConfig):
     """
     Dagster op to execute dbt commands for transformations and tests.
-    Includes dbt clean, run, and test.
+    dbt runs as a subprocess; its output is streamed into the run log as it is produced.
     """
     context.log.info("Starting dbt transformations...")
-    dbt_commands = [
-        ["dbt", "debug"], # Good for initial connection check
-        ["dbt", "clean"],
-        ["dbt", "run"],
-        ["dbt", "test"]
-    ]
-    dbt_cwd = "/app/src/dbt" # dbt commands must be run from the dbt project directory
+    dbt_cwd = DBT_PROJECT_PATH # dbt commands must be run from the dbt project directory
 
     try:
-        for cmd in dbt_commands:
-            command_str = " ".join(cmd)
-            context.log.info(f"Executing dbt command: {command_str}")
-            result = subprocess.run(
-                cmd,
-                cwd=dbt_cwd,
-                capture_output=True,
-                text=True,
-                check=True,
-                env=os.environ
-            )
-            context.log.info(f"dbt {cmd[1]} stdout:\n{result.stdout}")
-            if result.stderr:
-                context.log.error(f"dbt {cmd[1]} stderr:\n{result.stderr}")
+        for command in config.commands:
+            stream_subprocess(context, ["dbt", command], cwd=dbt_cwd)
+            if command == "run":
+                context.log_event(
+                    AssetMaterialization(
+                        asset_key=DBT_MARTS_ASSET_KEY,
+                        description="Per-model timings from dbt run.",
+                        metadata=dbt_run_results_metadata(dbt_cwd),
+                    )
+                )
         context.log.info("dbt transformations and tests completed successfully.")
     except subprocess.CalledProcessError as e:
-        context.log.error(f"dbt command '{' '.join(e.cmd)}' failed with error: {e.stderr}")
+        context.log.error(f"dbt command '{' '.join(e.cmd)}' failed with exit code {e.returncode}.")
         raise
     except Exception as e:
         context.log.error(f"An unexpected error occurred during dbt transformations: {e}")
         raise
 
+@op
+def compact_data_lake(context: OpExecutionContext, config: CompactionConfig):
+    """
+    Dagster op that compacts old message partitions of the data lake into Parquet and
+    deletes old images that have been loaded and enriched, via compact_data_lake.run_maintenance.
+    """
+    from scripts import compact_data_lake as compaction
+
+    context.log.info("Starting data lake compaction and image retention...")
+    try:
+        with forward_script_logs(context, compaction):
+            metrics = compaction.run_maintenance(
+                raw_messages_path=config.raw_messages_path,
+                images_path=config.images_path,
+                older_than_days=config.older_than_days,
+                retention_days=config.image_retention_days,
+                dry_run=config.dry_run,
+            )
+        summary = log_stage_metrics(context, metrics.summary(), RAW_MESSAGES_ASSET_KEY)
+        if summary.get("error_count"):
+            raise Failure(description="Data lake maintenance finished with errors; see the run log.")
+        context.log.info("Data lake compaction and image retention completed successfully.")
+    except Exception as e:
+        context.log.error(f"An unexpected error occurred during data lake maintenance: {e}")
+        raise
@@ -1,5 +1,5 @@
-from dagster import schedule
-from .jobs import telegram_etl_pipeline
+from dagster import schedule, build_schedule_from_partitioned_job, ScheduleDefinition
+from .jobs import telegram_etl_pipeline, telegram_partitioned_ingest_job, dbt_marts_job, data_lake_maintenance_job
 
 @schedule(
     cron_schedule="0 0 * * *", # Run daily at midnight UTC
@@ -14,3 +14,27 @@ def daily_telegram_etl_schedule(context):
     # You can pass run_config here if your job has configurable parameters
     return {}
 
+
+# Shortly after midnight UTC, materialize yesterday's partition for every channel.
+daily_partitioned_ingest_schedule = build_schedule_from_partitioned_job(
+    telegram_partitioned_ingest_job,
+    hour_of_day=0,
+    minute_of_hour=15,
+    description="Daily schedule that ingests the previous day's partition for each channel.",
+)
+
+# Rebuild the marts once the day's partitions have been ingested.
+daily_dbt_marts_schedule = ScheduleDefinition(
+    job=dbt_marts_job,
+    cron_schedule="0 2 * * *", # Run daily at 02:00 UTC
+    execution_timezone="UTC",
+    description="Daily rebuild of the dbt marts from all loaded partitions.",
+)
+
+# Compact the data lake after the night's ingest and mart rebuild.
+daily_data_lake_maintenance_schedule = ScheduleDefinition(
+    job=data_lake_maintenance_job,
+    cron_schedule="0 4 * * *", # Run daily at 04:00 UTC
+    execution_timezone="UTC",
+    description="Daily compaction of old data lake partitions and image retention.",
+)
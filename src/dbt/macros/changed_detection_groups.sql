@@ -0,0 +1,30 @@
+-- macros/changed_detection_groups.sql
+
+{% macro changed_detection_groups() %}
+    {#-
+        Selects the (channel_id, date_key) groups of agg_daily_detections touched by
+        detections, model runs or message loads since its last refresh, with a lookback
+        to catch rows committed while that refresh was running. Shared by the model and
+        its pre-hook, which clears these groups first so a group left without any
+        detections (e.g. after re-enrichment with a model that finds nothing) loses its rows.
+    -#}
+    WITH watermark AS (
+        SELECT COALESCE(MAX(refreshed_at) - INTERVAL '1 hour', '-infinity'::timestamptz) AS since
+        FROM {{ this }}
+    ),
+
+    changed_messages AS (
+        SELECT message_id FROM {{ source('raw', 'image_detection_runs') }}
+        WHERE processed_at > (SELECT since FROM watermark)
+        UNION
+        SELECT message_id FROM {{ source('raw', 'image_detections') }}
+        WHERE detection_timestamp > (SELECT since FROM watermark)
+        UNION
+        SELECT message_id FROM {{ ref('stg_telegram_messages') }}
+        WHERE loaded_at > (SELECT since FROM watermark)
+    )
+
+    SELECT DISTINCT msg.channel_id, msg.date_key
+    FROM {{ ref('fct_messages') }} AS msg
+    INNER JOIN changed_messages USING (message_id)
+{% endmacro %}
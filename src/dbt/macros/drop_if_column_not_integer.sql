@@ -0,0 +1,24 @@
+-- macros/drop_if_column_not_integer.sql
+
+{% macro drop_if_column_not_integer(relation, column_name) %}
+    {#-
+        Drops `relation` when it exists and `column_name` is not an integer column, so
+        an incremental model whose key changed type is rebuilt from scratch (with its
+        indexes) instead of appending to the old table. Called from the model body,
+        which dbt renders before the materialization looks the relation up. Only
+        acts during `dbt run` and `dbt build`.
+    -#}
+    {%- if execute and flags.WHICH in ('run', 'build') -%}
+        {%- set existing_relation = adapter.get_relation(
+            database=relation.database, schema=relation.schema, identifier=relation.identifier
+        ) -%}
+        {%- if existing_relation is not none -%}
+            {%- for column in adapter.get_columns_in_relation(existing_relation) -%}
+                {%- if column.name == column_name and not column.is_integer() -%}
+                    {{ log("Rebuilding " ~ existing_relation ~ ": " ~ column_name ~ " is " ~ column.data_type ~ ", not integer.", info=True) }}
+                    {%- do adapter.drop_relation(existing_relation) -%}
+                {%- endif -%}
+            {%- endfor -%}
+        {%- endif -%}
+    {%- endif -%}
+{% endmacro %}
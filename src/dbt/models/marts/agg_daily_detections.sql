@@ -0,0 +1,72 @@
+-- models/marts/agg_daily_detections.sql
+
+-- Detections aggregated per channel, day and object class, backing the detection
+-- endpoints of the API. Built incrementally: each run recomputes only the
+-- (channel, day) groups touched by detections, model runs or message loads since
+-- the previous run (see macros/changed_detection_groups.sql). The pre-hook deletes
+-- every touched group first, since delete+insert alone would keep the old rows of
+-- a group that no longer has any detections.
+-- depends_on: {{ ref('stg_telegram_messages') }}
+
+{{
+    config(
+        materialized='incremental',
+        incremental_strategy='delete+insert',
+        unique_key=['channel_id', 'date_key'],
+        schema='analytics',
+        indexes=[
+            {'columns': ['channel_id', 'date_key']},
+            {'columns': ['detected_object_class', 'date_key']},
+        ],
+        pre_hook="""
+            {% if is_incremental() %}
+            DELETE FROM {{ this }} AS agg
+            USING ({{ changed_detection_groups() }}) AS changed
+            WHERE agg.channel_id = changed.channel_id
+                AND agg.date_key = changed.date_key
+            {% endif %}
+        """
+    )
+}}
+
+{% if is_incremental() %}
+WITH changed_groups AS (
+    {{ changed_detection_groups() }}
+),
+{% else %}
+WITH
+{% endif %}
+
+detections AS (
+    SELECT
+        msg.channel_id,
+        msg.date_key,
+        det.detected_object_class,
+        det.image_path,
+        det.confidence_score
+    FROM
+        {{ ref('fct_image_detections') }} AS det
+    INNER JOIN {{ ref('fct_messages') }} AS msg
+        ON det.message_id = msg.message_id
+    {% if is_incremental() %}
+    INNER JOIN changed_groups AS changed
+        ON msg.channel_id = changed.channel_id
+        AND msg.date_key = changed.date_key
+    {% endif %}
+)
+
+SELECT
+    channel_id,
+    date_key,
+    detected_object_class,
+    COUNT(*) AS detection_count,
+    COUNT(DISTINCT image_path) AS image_count,
+    AVG(confidence_score)::NUMERIC(5, 4) AS avg_confidence,
+    MAX(confidence_score) AS max_confidence,
+    CURRENT_TIMESTAMP AS refreshed_at
+FROM
+    detections
+GROUP BY
+    channel_id,
+    date_key,
+    detected_object_class
@@ -3,16 +3,18 @@
 {{
     config(
         materialized='table',
-        schema='analytics'
+        schema='analytics',
+        indexes=[
+            {'columns': ['channel_id'], 'unique': True},
+        ]
     )
 }}
 
 SELECT
-    DISTINCT channel_id,
-    -- Extract channel name from message_raw_data
-    COALESCE(
-        (message_raw_data ->> 'peer_id')::text,
-        'Unknown Channel'
-    ) AS channel_name
+    channel_id,
+    -- One row per channel even if its name changed between scrapes
+    COALESCE(MAX(channel_name), 'Unknown Channel') AS channel_name
 FROM
     {{ ref('stg_telegram_messages') }}
+GROUP BY
+    channel_id
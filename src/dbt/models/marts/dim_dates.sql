@@ -1,19 +1,40 @@
 -- models/marts/dim_dates.sql
 
+-- Covers every day from the earliest message to the latest message (or today, if
+-- later) plus a horizon of `date_dim_horizon_days` days. Built incrementally:
+-- runs only append days outside the range already in the table. A table built
+-- before date_key became an integer is dropped and rebuilt in full.
+
 {{
     config(
-        materialized='table',
-        schema='analytics'
+        materialized='incremental',
+        incremental_strategy='append',
+        schema='analytics',
+        indexes=[
+            {'columns': ['date_key'], 'unique': True},
+            {'columns': ['full_date']},
+        ]
     )
 }}
 
-WITH date_series AS (
-    -- Generate dates from the start of 2021 to the end of 2025
-    SELECT generate_series('2021-01-01'::date, '2025-12-31'::date, '1 day'::interval) as date_day -- <-- CHANGED START DATE
+{{ drop_if_column_not_integer(this, 'date_key') }}
+
+WITH date_bounds AS (
+    SELECT
+        COALESCE(MIN(message_date)::date, CURRENT_DATE) AS start_date,
+        GREATEST(COALESCE(MAX(message_date)::date, CURRENT_DATE), CURRENT_DATE)
+            + {{ var('date_dim_horizon_days', 365) }} AS end_date
+    FROM
+        {{ ref('stg_telegram_messages') }}
+),
+
+date_series AS (
+    SELECT generate_series(start_date, end_date, '1 day'::interval)::date AS date_day
+    FROM date_bounds
 )
 
 SELECT
-    TO_CHAR(date_day, 'YYYY-MM-DD') AS date_key,
+    TO_CHAR(date_day, 'YYYYMMDD')::integer AS date_key,
     date_day AS full_date,
     EXTRACT(YEAR FROM date_day) AS year,
     EXTRACT(MONTH FROM date_day) AS month,
@@ -28,3 +49,8 @@ SELECT
     TO_CHAR(date_day, 'YYYY-MM') AS year_month
 FROM
     date_series
+{% if is_incremental() %}
+WHERE
+    date_day < (SELECT MIN(full_date) FROM {{ this }})
+    OR date_day > (SELECT MAX(full_date) FROM {{ this }})
+{% endif %}
@@ -3,19 +3,54 @@
 {{
     config(
         materialized='table',
-        schema='analytics'
+        schema='analytics',
+        indexes=[
+            {'columns': ['detection_id'], 'unique': True},
+            {'columns': ['message_id']},
+            {'columns': ['detected_object_class', 'confidence_score DESC']},
+        ]
     )
 }}
 
+WITH model_runs AS (
+    -- Every model run per image. Detections from before runs were recorded only
+    -- appear in image_detections, so they count as runs at their detection time.
+    SELECT image_path, model_name, model_version, processed_at
+    FROM {{ source('raw', 'image_detection_runs') }}
+    UNION ALL
+    SELECT image_path, model_name, model_version, MAX(detection_timestamp) AS processed_at
+    FROM {{ source('raw', 'image_detections') }}
+    GROUP BY image_path, model_name, model_version
+),
+
+latest_model_per_image AS (
+    -- After a model upgrade images are re-enriched gradually, so each image
+    -- reports the detections of the most recent model that processed it
+    SELECT DISTINCT ON (image_path)
+        image_path,
+        model_name,
+        model_version
+    FROM model_runs
+    ORDER BY image_path, processed_at DESC
+)
+
 SELECT
     det.id AS detection_id,
     det.message_id,
     det.image_path,
     det.detected_object_class,
     det.confidence_score,
-    det.detection_timestamp
+    det.detection_timestamp,
+    det.model_name,
+    det.model_version,
+    det.confidence_threshold,
+    det.iou_threshold
 FROM
     {{ source('raw', 'image_detections') }} AS det
+INNER JOIN latest_model_per_image AS latest
+    ON det.image_path = latest.image_path
+    AND det.model_name = latest.model_name
+    AND det.model_version = latest.model_version
 -- Optional: INNER JOIN with fct_messages if you want to only include detections
 -- that have a corresponding message in fct_messages, which would fix the relationships test
 -- if the data inconsistency is acceptable.
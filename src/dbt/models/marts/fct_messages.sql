@@ -3,18 +3,27 @@
 {{
     config(
         materialized='table',
-        schema='analytics'
+        schema='analytics',
+        indexes=[
+            {'columns': ['message_id'], 'unique': True},
+            {'columns': ['channel_id', 'date_key']},
+            {'columns': ['date_key']},
+            {'columns': ['message_date DESC']},
+        ]
     )
 }}
 
 SELECT
     stg.message_id,
     stg.channel_id,
-    TO_CHAR(stg.message_date, 'YYYY-MM-DD') AS date_key, -- Foreign key to dim_dates
+    TO_CHAR(stg.message_date, 'YYYYMMDD')::integer AS date_key, -- Foreign key to dim_dates
     stg.message_date,
     -- Use COALESCE to handle cases where 'message' field might be NULL or missing
-    COALESCE(stg.message_raw_data ->> 'message', '') AS message_text,
-    (stg.message_raw_data ->> 'media') IS NOT NULL AS has_media,
-    stg.message_raw_data ->> 'media_type' AS media_type
+    COALESCE(stg.message_text, '') AS message_text,
+    COALESCE(stg.has_media, FALSE) AS has_media,
+    stg.media_type,
+    stg.views,
+    stg.forwards,
+    stg.replies_count
 FROM
     {{ ref('stg_telegram_messages') }} stg
@@ -1,9 +1,21 @@
 -- models/staging/stg_telegram_messages.sql
 
+-- Extracts and types the message fields once. Built incrementally: each run only
+-- processes rows loaded since the previous run, so marts never re-parse JSONB.
+-- load_timestamp is the start of the loading transaction, so a transaction that
+-- commits after a later one was staged has older timestamps; the one-hour
+-- lookback picks those rows up, and the unique key makes the overlap harmless.
+
 {{
     config(
-        materialized='view',
-        schema='staging' 
+        materialized='incremental',
+        unique_key='message_id',
+        on_schema_change='append_new_columns',
+        schema='staging',
+        indexes=[
+            {'columns': ['message_id'], 'unique': True},
+            {'columns': ['loaded_at']},
+        ]
     )
 }}
 
@@ -12,15 +24,39 @@ WITH source_messages AS (
         id,
         channel_id,
         message_date,
-        raw_data
+        message_text,
+        sender_id,
+        channel_name,
+        views,
+        forwards,
+        replies_count,
+        has_media,
+        media_type,
+        media_local_path,
+        raw_data,
+        load_timestamp
     FROM
         {{ source('raw', 'telegram_messages') }}
+    {% if is_incremental() %}
+    WHERE
+        load_timestamp > (SELECT COALESCE(MAX(loaded_at) - INTERVAL '1 hour', '-infinity'::timestamptz) FROM {{ this }})
+    {% endif %}
 )
 
 SELECT
     id AS message_id,
     channel_id,
     message_date,
-    raw_data AS message_raw_data
+    -- Rows loaded before the typed columns existed only have raw_data
+    COALESCE(message_text, raw_data ->> 'message') AS message_text,
+    COALESCE(sender_id, (raw_data ->> 'sender_id')::bigint) AS sender_id,
+    COALESCE(channel_name, raw_data ->> 'channel_name') AS channel_name,
+    COALESCE(views, (raw_data ->> 'views')::integer) AS views,
+    COALESCE(forwards, (raw_data ->> 'forwards')::integer) AS forwards,
+    COALESCE(replies_count, (raw_data ->> 'replies_count')::integer) AS replies_count,
+    COALESCE(has_media, (raw_data ->> 'has_media')::boolean) AS has_media,
+    COALESCE(media_type, raw_data ->> 'media_type') AS media_type,
+    COALESCE(media_local_path, raw_data ->> 'media_local_path') AS media_local_path,
+    load_timestamp AS loaded_at
 FROM
     source_messages
@@ -1,9 +1,10 @@
-    -- This test asserts that all date_key values in dim_dates are valid dates.
-    -- It will return rows (and thus fail the test) if a date_key cannot be cast to a date.
+    -- This test asserts that every date_key in dim_dates is the YYYYMMDD form of its full_date.
+    -- It will return rows (and thus fail the test) if a date_key does not match its date.
     SELECT
-        date_key
+        date_key,
+        full_date
     FROM
         {{ ref('dim_dates') }}
     WHERE
-        date_key::date IS NULL
+        TO_DATE(date_key::text, 'YYYYMMDD') IS DISTINCT FROM full_date::date
     
\ No newline at end of file
@@ -0,0 +1,138 @@
+"""
+Reading and compacting the message partitions of the data lake.
+
+The scraper writes one JSON file per message to
+`data/raw/telegram_messages/YYYY-MM-DD/<channel>/<message_id>.json`. Once a daily
+partition is old enough, compaction rolls its files into a single
+zstd-compressed Parquet file, `messages.parquet`, in the same directory. Next to
+it, `_index.json` is a small readable index listing the row count, ID and date
+range, columns and message IDs. Files starting with '_' are never message
+records.
+
+Readers go through `iter_message_json_files`, `read_compacted_records` and
+`partition_media_paths`, so compacted and uncompacted partitions (or a compacted
+partition that has since received late JSON files) look the same to them.
+pyarrow is imported only when a Parquet file is actually read or written.
+"""
+
+import os
+import json
+from datetime import datetime, timezone
+
+COMPACTED_FILE_NAME = 'messages.parquet'
+INDEX_FILE_NAME = '_index.json'
+COMPACTION_CODEC = 'zstd'
+
+
+def iter_message_json_files(channel_path):
+    """Yields the paths of the per-message JSON files in a partition directory."""
+    for filename in os.listdir(channel_path):
+        if filename.endswith('.json') and not filename.startswith('_'):
+            yield os.path.join(channel_path, filename)
+
+
+def is_compacted(channel_path):
+    return os.path.isfile(os.path.join(channel_path, COMPACTED_FILE_NAME))
+
+
+def read_compacted_records(channel_path, columns=None):
+    """
+    Returns the message records of a compacted partition as dicts, or [] if the
+    partition is not compacted. Fields a record did not have (null in the
+    Parquet schema) are left out, as in the original JSON. `columns` restricts
+    which fields are read.
+    """
+    if not is_compacted(channel_path):
+        return []
+    import pyarrow.parquet as pq
+
+    table = pq.read_table(os.path.join(channel_path, COMPACTED_FILE_NAME), columns=columns)
+    return [{k: v for k, v in row.items() if v is not None} for row in table.to_pylist()]
+
+
+def read_partition_index(channel_path):
+    """Returns the compaction index of a partition, or None if it is not compacted."""
+    index_path = os.path.join(channel_path, INDEX_FILE_NAME)
+    if not os.path.isfile(index_path):
+        return None
+    with open(index_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def partition_media_paths(channel_path):
+    """Returns the media_local_path of every message in a partition that has one."""
+    media_paths = []
+    if is_compacted(channel_path):
+        # Older compacted partitions may lack the column if no message had media
+        import pyarrow.parquet as pq
+
+        schema = pq.read_schema(os.path.join(channel_path, COMPACTED_FILE_NAME))
+        if 'media_local_path' in schema.names:
+            media_paths.extend(
+                r['media_local_path'] for r in read_compacted_records(channel_path, columns=['media_local_path'])
+                if r.get('media_local_path')
+            )
+    for file_path in sorted(iter_message_json_files(channel_path)):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            media_path = json.load(f).get('media_local_path')
+        if media_path:
+            media_paths.append(media_path)
+    return media_paths
+
+
+def compact_partition(channel_path):
+    """
+    Rolls the JSON files of a partition (plus any existing compacted file) into
+    messages.parquet, writes _index.json and then deletes the JSON files.
+    The Parquet file and index are written under temporary names and renamed into
+    place, and the JSON files are removed only after the new file has been read
+    back, so an interrupted run never loses messages. Returns the index, or None
+    if there was nothing new to compact.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    json_paths = sorted(iter_message_json_files(channel_path))
+    if not json_paths:
+        return None
+
+    records = {record['id']: record for record in read_compacted_records(channel_path)}
+    for file_path in json_paths:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+        records[record['id']] = record # A re-scraped message replaces its compacted copy
+    rows = sorted(records.values(), key=lambda r: r['id'])
+
+    # from_pylist infers columns from the first row only; keep every field any message has
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    table = pa.Table.from_pydict({col: [row.get(col) for row in rows] for col in columns})
+    compacted_path = os.path.join(channel_path, COMPACTED_FILE_NAME)
+    partial_path = compacted_path + '.part'
+    pq.write_table(table, partial_path, compression=COMPACTION_CODEC)
+    if pq.read_metadata(partial_path).num_rows != len(rows):
+        os.remove(partial_path)
+        raise IOError(f"Compacted file for {channel_path} does not contain all {len(rows)} messages.")
+    os.replace(partial_path, compacted_path)
+
+    dates = [r['date'] for r in rows if r.get('date')]
+    index = {
+        'file': COMPACTED_FILE_NAME,
+        'codec': COMPACTION_CODEC,
+        'rows': len(rows),
+        'bytes': os.path.getsize(compacted_path),
+        'min_id': rows[0]['id'],
+        'max_id': rows[-1]['id'],
+        'min_date': min(dates) if dates else None,
+        'max_date': max(dates) if dates else None,
+        'columns': table.column_names,
+        'compacted_at': datetime.now(timezone.utc).isoformat(),
+        'message_ids': [r['id'] for r in rows],
+    }
+    index_path = os.path.join(channel_path, INDEX_FILE_NAME)
+    with open(index_path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(index, f, indent=2)
+    os.replace(index_path + '.part', index_path)
+
+    for file_path in json_paths:
+        os.remove(file_path)
+    return index
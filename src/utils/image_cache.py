@@ -0,0 +1,82 @@
+"""
+On-disk cache of decoded, model-input-sized images for object detection.
+
+Each image is decoded once, letterboxed to a square of the model's input size and
+stored as a .npy array keyed by the file's content hash and the target size.
+Later runs (reprocessing, model upgrades, A/B comparisons) memory-map the array
+instead of decoding and resizing the JPEG again.
+"""
+
+import os
+import hashlib
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+# Padding value Ultralytics uses for letterboxing
+LETTERBOX_FILL = 114
+
+
+def content_hash(image_path, chunk_size=1 << 20):
+    """Returns the SHA-256 hex digest of a file's bytes."""
+    digest = hashlib.sha256()
+    with open(image_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def letterbox(image, size):
+    """
+    Resizes a PIL image to fit a size x size square, keeping its aspect ratio, and
+    pads the remainder. Returns a uint8 HWC array in BGR order, the layout YOLO
+    expects for numpy inputs.
+    """
+    image = image.convert('RGB')
+    scale = min(size / image.width, size / image.height)
+    new_width, new_height = max(1, round(image.width * scale)), max(1, round(image.height * scale))
+    resized = image.resize((new_width, new_height), Image.BILINEAR)
+    canvas = Image.new('RGB', (size, size), (LETTERBOX_FILL,) * 3)
+    canvas.paste(resized, ((size - new_width) // 2, (size - new_height) // 2))
+    return np.ascontiguousarray(np.asarray(canvas)[:, :, ::-1])
+
+
+class ImageCache:
+    """Letterboxed image arrays under cache_dir/<size>/<hash[:2]>/<hash>.npy."""
+
+    def __init__(self, cache_dir, size=640):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, digest):
+        return os.path.join(self.cache_dir, str(self.size), digest[:2], f"{digest}.npy")
+
+    def load(self, image_path):
+        """
+        Returns the letterboxed array for an image, memory-mapped from the cache when
+        present; otherwise decodes the image, stores it and returns it.
+        """
+        cached_path = self.path_for(content_hash(image_path))
+        if os.path.exists(cached_path):
+            self.hits += 1
+            return np.load(cached_path, mmap_mode='r')
+
+        self.misses += 1
+        with Image.open(image_path) as image:
+            array = letterbox(image, self.size)
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        # Write under a temporary name unique to this writer, so concurrent readers never
+        # see a partial array and two detectors caching the same image do not collide
+        fd, partial_path = tempfile.mkstemp(dir=os.path.dirname(cached_path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, array)
+            os.replace(partial_path, cached_path)
+        except BaseException:
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        return array
@@ -0,0 +1,107 @@
+"""
+Logging setup for the pipeline's command-line entry points.
+
+The stage scripts only create module loggers when imported. Handlers are attached
+here by whichever entry point actually runs (a script's main(), src/cli.py), so
+importing a stage from the Dagster ops or the benchmark does not open log files
+as a side effect.
+
+Loggers hand records to a QueueHandler, and a QueueListener thread does the
+formatting and I/O, so a log call in a hot loop never waits on the console or
+disk. The log file is size-rotated and written as one JSON object per line;
+the console gets the plain text format. Hot loops log progress summaries through
+StageMetrics.log_progress rather than a line per item.
+"""
+
+import os
+import copy
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Log files are rotated at LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old files
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '5'))
+# 'json' (one object per line) or 'text' (LOG_FORMAT) for the log file
+LOG_FILE_FORMAT = os.getenv('LOG_FILE_FORMAT', 'json').lower()
+
+# Attributes every LogRecord has; anything else was passed via `extra=` and is kept in JSON output
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as a single-line JSON object, including any `extra` fields."""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queues records for the listener thread. The message is rendered here, so it
+    reflects the arguments at call time, but unlike the base class the exception
+    is left on the record for the handlers' formatters (the queue never leaves
+    this process, so nothing has to be picklable).
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def configure_logging(log_file=None, level=None):
+    """
+    Logs to the console and, when `log_file` is given, to that rotated file, through
+    a background listener thread. Does nothing if the root logger is already
+    configured, so the first entry point to call it wins.
+    """
+    global _listener
+    root = logging.getLogger()
+    if root.handlers:
+        return
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [console]
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonFormatter() if LOG_FILE_FORMAT == 'json' else logging.Formatter(LOG_FORMAT))
+        handlers.append(file_handler)
+
+    log_queue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    root.addHandler(_QueueHandler(log_queue))
+    root.setLevel(level or LOG_LEVEL)
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Writes out any queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,80 @@
+"""
+Index of media files already downloaded from Telegram.
+
+Forwards and reposts carry the same Telegram file (same photo/document id and
+access hash) as the original message. The index maps that file identity to the
+local copy, so the scraper can hard-link the existing file instead of
+downloading it again.
+"""
+
+import os
+import shutil
+import sqlite3
+
+
+class MediaIndex:
+    """
+    SQLite-backed map of (file id, access hash, variant) to a local file path.
+    `variant` distinguishes the full file from a downloaded thumbnail size.
+    Relative paths in the index are resolved against `root` (the working directory
+    by default).
+    """
+
+    def __init__(self, index_path, root=None):
+        self.root = root or os.getcwd()
+        os.makedirs(os.path.dirname(index_path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(index_path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS media_files (
+                file_id INTEGER NOT NULL,
+                access_hash INTEGER NOT NULL,
+                variant TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size_bytes INTEGER,
+                PRIMARY KEY (file_id, access_hash, variant)
+            )
+        """)
+        self.conn.commit()
+
+    def lookup(self, file_id, access_hash, variant='full'):
+        """Returns the local path of a previously downloaded file, or None if unknown or deleted."""
+        row = self.conn.execute(
+            "SELECT path FROM media_files WHERE file_id = ? AND access_hash = ? AND variant = ?",
+            (file_id, access_hash, variant),
+        ).fetchone()
+        if row is None:
+            return None
+        path = os.path.join(self.root, row[0]) # row[0] is returned as is when absolute
+        return path if os.path.exists(path) else None
+
+    def record(self, file_id, access_hash, path, variant='full'):
+        """Registers a downloaded file under its Telegram identity, relative to `root` when under it."""
+        stored_path = os.path.relpath(path, self.root)
+        if stored_path.startswith(os.pardir):
+            stored_path = os.path.abspath(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO media_files (file_id, access_hash, variant, path, size_bytes) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (file_id, access_hash, variant, stored_path, os.path.getsize(path)),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def link_or_copy(source_path, target_path):
+    """
+    Makes `target_path` refer to the same content as `source_path`: a hard link
+    where the filesystem allows it, otherwise a copy.
+    """
+    if os.path.abspath(source_path) == os.path.abspath(target_path):
+        return target_path
+    os.makedirs(os.path.dirname(target_path) or '.', exist_ok=True)
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        shutil.copy2(source_path, target_path)
+    return target_path
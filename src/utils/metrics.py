@@ -0,0 +1,184 @@
+"""
+Machine-readable metrics for the pipeline stages.
+
+Each stage script records its counters and timings in a `StageMetrics` object and
+emits one JSON summary line on stdout, prefixed with `METRICS_PREFIX`. The Dagster
+ops parse these lines back into asset materialization metadata. If the
+`METRICS_TEXTFILE_DIR` environment variable is set, the summary is also written as
+a Prometheus textfile (for the node_exporter textfile collector).
+"""
+
+import os
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+METRICS_PREFIX = 'PIPELINE_METRICS '
+METRICS_TEXTFILE_DIR_ENV = 'METRICS_TEXTFILE_DIR'
+
+# Counters whose names end with one of these suffixes are reported as errors
+ERROR_COUNTER_SUFFIXES = ('errors', 'failed')
+
+# Minimum seconds between progress lines logged by StageMetrics.log_progress
+PROGRESS_INTERVAL_S = float(os.getenv('LOG_PROGRESS_INTERVAL_S', '30'))
+
+
+class StageMetrics:
+    """
+    Collects counters and durations for a single run of a pipeline stage.
+    `rate_counters` lists the counters reported as per-second throughput.
+    """
+
+    def __init__(self, stage, rate_counters=()):
+        self.stage = stage
+        self.rate_counters = tuple(rate_counters)
+        self.counters = {}
+        self.durations = {}
+        self.started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._last_progress = self._start
+
+    def increment(self, name, value=1):
+        """Adds `value` to the counter `name`."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def timer(self, name):
+        """Accumulates the wall-clock time spent inside the block under `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = self.durations.get(name, 0.0) + time.perf_counter() - start
+
+    def log_progress(self, logger, interval_s=None):
+        """
+        Logs the counters and throughput so far at INFO, at most once every
+        `interval_s` seconds (PROGRESS_INTERVAL_S by default). Cheap enough to call
+        once per item in a hot loop in place of per-item log lines.
+        """
+        now = time.perf_counter()
+        if now - self._last_progress < (PROGRESS_INTERVAL_S if interval_s is None else interval_s):
+            return
+        self._last_progress = now
+        elapsed = now - self._start
+        counters = ', '.join(f"{name}={value}" for name, value in sorted(self.counters.items()))
+        rates = ', '.join(
+            f"{name}/s={self.counters.get(name, 0) / elapsed:.1f}" for name in self.rate_counters
+        )
+        logger.info(f"{self.stage} progress after {elapsed:.0f}s: {counters}" + (f" ({rates})" if rates else ''))
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self._start
+
+    @property
+    def error_count(self):
+        return sum(v for k, v in self.counters.items() if k.endswith(ERROR_COUNTER_SUFFIXES))
+
+    def summary(self):
+        """Returns the metrics as a JSON-serializable dict."""
+        duration = self.elapsed
+        throughput = {}
+        for name in self.rate_counters:
+            count = self.counters.get(name, 0)
+            throughput[f"{name}_per_s"] = round(count / duration, 3) if duration > 0 else 0.0
+        return {
+            'stage': self.stage,
+            'started_at': self.started_at.isoformat(),
+            'duration_s': round(duration, 3),
+            'counters': dict(self.counters),
+            'durations_s': {k: round(v, 3) for k, v in self.durations.items()},
+            'throughput': throughput,
+            'error_count': self.error_count,
+        }
+
+    def emit(self, stream=None):
+        """
+        Prints the summary line to stdout (or `stream`) and writes the Prometheus
+        textfile when METRICS_TEXTFILE_DIR is configured. Returns the summary.
+        """
+        summary = self.summary()
+        print(METRICS_PREFIX + json.dumps(summary, sort_keys=True), file=stream, flush=True)
+
+        textfile_dir = os.getenv(METRICS_TEXTFILE_DIR_ENV)
+        if textfile_dir:
+            write_prometheus_textfile(summary, textfile_dir)
+        return summary
+
+
+def to_prometheus_text(summary):
+    """Renders a stage summary in the Prometheus text exposition format."""
+    stage = summary['stage']
+    lines = []
+    described = set()
+
+    def gauge(name, value, help_text, labels=None):
+        label_pairs = {'stage': stage}
+        label_pairs.update(labels or {})
+        rendered = ','.join(f'{k}="{v}"' for k, v in sorted(label_pairs.items()))
+        if name not in described:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            described.add(name)
+        lines.append(f"{name}{{{rendered}}} {value}")
+
+    gauge('telegram_pipeline_duration_seconds', summary['duration_s'], 'Duration of the last stage run.')
+    gauge('telegram_pipeline_errors', summary['error_count'], 'Errors counted in the last stage run.')
+    started_at = datetime.fromisoformat(summary['started_at'])
+    gauge('telegram_pipeline_last_run_timestamp_seconds', int(started_at.timestamp()),
+          'Start time of the last stage run.')
+    for name, value in sorted(summary['counters'].items()):
+        gauge(f"telegram_pipeline_{name}_total", value, f"Value of the '{name}' counter in the last run.")
+    for name, value in sorted(summary['durations_s'].items()):
+        gauge('telegram_pipeline_step_duration_seconds', value, 'Time spent in a step of the last run.',
+              labels={'step': name})
+    for name, value in sorted(summary['throughput'].items()):
+        gauge(f"telegram_pipeline_{name}", value, f"Throughput ({name}) of the last run.")
+    return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_textfile(summary, textfile_dir):
+    """Atomically writes the summary to <textfile_dir>/telegram_pipeline_<stage>.prom."""
+    os.makedirs(textfile_dir, exist_ok=True)
+    path = os.path.join(textfile_dir, f"telegram_pipeline_{summary['stage']}.prom")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(to_prometheus_text(summary))
+    os.replace(tmp_path, path)
+    return path
+
+
+def parse_metrics_line(line):
+    """Returns the summary dict for a metrics line, or None for any other line."""
+    line = line.strip()
+    if not line.startswith(METRICS_PREFIX):
+        return None
+    try:
+        return json.loads(line[len(METRICS_PREFIX):])
+    except json.JSONDecodeError:
+        return None
+
+
+def parse_metrics_lines(text):
+    """Extracts all stage summaries from captured script output."""
+    summaries = []
+    for line in (text or '').splitlines():
+        summary = parse_metrics_line(line)
+        if summary is not None:
+            summaries.append(summary)
+    return summaries
+
+
+def summary_to_metadata(summary):
+    """Flattens a stage summary into a dict suitable for Dagster materialization metadata."""
+    metadata = {
+        'duration_s': summary.get('duration_s', 0.0),
+        'error_count': summary.get('error_count', 0),
+    }
+    metadata.update(summary.get('counters', {}))
+    metadata.update(summary.get('throughput', {}))
+    for name, value in summary.get('durations_s', {}).items():
+        metadata[f"{name}_duration_s"] = value
+    return metadata
@@ -0,0 +1,94 @@
+"""
+On-demand profiling of a pipeline stage.
+
+Each entry point accepts `--profile [cprofile|pyinstrument]` and runs its work
+inside `profiled(stage, profiler)`. cProfile writes a `.prof` file, which can be
+opened with snakeviz or turned into a flame graph with flameprof, plus a text
+summary of the most expensive functions. pyinstrument, if installed, is a
+sampling profiler that follows async tasks and writes an HTML flame view and a
+text call tree. Profiles go to PROFILE_OUTPUT_DIR, next to the stage logs.
+"""
+
+import os
+import io
+import pstats
+import logging
+import cProfile
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_OUTPUT_DIR = os.getenv('PROFILE_OUTPUT_DIR', 'profiles')
+PROFILERS = ('cprofile', 'pyinstrument')
+
+# Functions listed in the cProfile text summary
+PROFILE_SUMMARY_LINES = 40
+
+logger = logging.getLogger(__name__)
+
+
+def add_profile_argument(parser):
+    """Adds the shared --profile option to a stage's argument parser."""
+    parser.add_argument('--profile', nargs='?', const='cprofile', default=None, choices=PROFILERS,
+                        help=f'Profile the run and write the profile to {PROFILE_OUTPUT_DIR}/ '
+                             '(cprofile by default; pyinstrument if installed).')
+
+
+def _write_cprofile(profile, base_path):
+    profile.dump_stats(base_path + '.prof')
+    summary = io.StringIO()
+    stats = pstats.Stats(profile, stream=summary)
+    stats.sort_stats('cumulative').print_stats(PROFILE_SUMMARY_LINES)
+    with open(base_path + '.txt', 'w', encoding='utf-8') as f:
+        f.write(summary.getvalue())
+    return base_path + '.prof'
+
+
+def _write_pyinstrument(profiler, base_path):
+    with open(base_path + '.html', 'w', encoding='utf-8') as f:
+        f.write(profiler.output_html())
+    with open(base_path + '.txt', 'w', encoding='utf-8') as f:
+        f.write(profiler.output_text(unicode=True))
+    return base_path + '.html'
+
+
+@contextmanager
+def profiled(stage, profiler=None, output_dir=None):
+    """
+    Profiles the enclosed block when `profiler` is set ('cprofile' or 'pyinstrument')
+    and writes `<output_dir>/<stage>_<timestamp>.*`; otherwise does nothing.
+    Falls back to cProfile when pyinstrument is not installed. Only the calling
+    thread is profiled, so work handed to thread pools shows up as waiting time.
+    """
+    if not profiler:
+        yield
+        return
+
+    output_dir = output_dir or PROFILE_OUTPUT_DIR
+    os.makedirs(output_dir, exist_ok=True)
+    base_path = os.path.join(output_dir, f"{stage}_{datetime.now().strftime('%Y%m%dT%H%M%S')}")
+
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument is not installed; profiling with cProfile instead.")
+            profiler = 'cprofile'
+
+    if profiler == 'pyinstrument':
+        sampler = Profiler(async_mode='enabled')
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            path = _write_pyinstrument(sampler, base_path)
+            logger.info(f"Wrote {stage} profile to {path}")
+    else:
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            path = _write_cprofile(profile, base_path)
+            logger.info(f"Wrote {stage} profile to {path}")
@@ -0,0 +1,76 @@
+"""
+Adaptive token-bucket rate limiting for Telegram API calls.
+
+Requests acquire a token before they are sent. When Telegram answers with a
+FLOOD_WAIT the bucket's rate is cut multiplicatively, and it creeps back up
+towards the configured rate after each run of successful requests, so the scraper
+settles just under the rate Telegram tolerates instead of repeatedly hitting it.
+"""
+
+import time
+import asyncio
+
+
+class AdaptiveRateLimiter:
+    """
+    Async token bucket with multiplicative decrease on flood waits and additive
+    increase on success. One instance should be shared per Telegram client.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=0.05, backoff_factor=0.5,
+                 recovery_step=0.05, recovery_after=50):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self.min_rate = float(min_rate)
+        self.backoff_factor = backoff_factor
+        self.recovery_step = recovery_step
+        self.recovery_after = recovery_after
+
+        self.tokens = float(self.burst)
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0
+        self.throttled_seconds = 0.0
+        self._successes = 0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Waits until a token is available and consumes it."""
+        async with self._lock:
+            self._refill()
+            if self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                self.throttled_seconds += wait
+                await asyncio.sleep(wait)
+                self._refill()
+            self.tokens -= 1
+
+    def record_success(self):
+        """Counts a successful request; slowly restores the rate after a backoff."""
+        self._successes += 1
+        if self.rate < self.max_rate and self._successes >= self.recovery_after:
+            self.rate = min(self.max_rate, self.rate + self.recovery_step * self.max_rate)
+            self._successes = 0
+
+    def record_flood_wait(self, seconds):
+        """Registers a FLOOD_WAIT: cuts the rate and drains the bucket."""
+        self.flood_waits += 1
+        self.flood_wait_seconds += seconds
+        self.rate = max(self.min_rate, self.rate * self.backoff_factor)
+        self.tokens = 0.0
+        self._successes = 0
+
+    def stats(self):
+        """Returns the limiter's counters for logging and metrics."""
+        return {
+            'rate_per_s': round(self.rate, 3),
+            'flood_waits': self.flood_waits,
+            'flood_wait_seconds': self.flood_wait_seconds,
+            'throttled_seconds': round(self.throttled_seconds, 3),
+        }
@@ -0,0 +1,136 @@
+"""
+EXPLAIN checks for the API queries: every listed mart must be read through one
+of the indexes declared in the dbt model configs.
+
+The crud functions are handed a connection wrapper that EXPLAINs each query
+instead of running it, so the plans checked are those of the exact queries the
+API runs. Sequential scans are disabled for the session, so small test tables
+still show whether an index is usable at all. Needs the PostgreSQL database
+configured in .env with the dbt marts built; skipped otherwise.
+"""
+import os
+import json
+
+import psycopg2
+import pytest
+from psycopg2 import sql
+
+from src.api import crud
+from src.api.database import get_db_connection
+
+# Plan node types that read a table through an index
+INDEX_SCAN_NODES = {'Index Scan', 'Index Only Scan', 'Bitmap Index Scan'}
+
+# Channel used for the per-channel queries
+CHANNEL_NAME = os.getenv('QUERY_PLAN_CHANNEL', 'CheMed123')
+
+# API queries to check: (crud call, tables that must be read through an index).
+# get_top_products is not listed: its ILIKE keyword filter cannot use a btree index.
+API_QUERY_CHECKS = [
+    pytest.param(
+        lambda conn: crud.get_channel_activity(conn, CHANNEL_NAME),
+        ['fct_messages', 'dim_dates'],
+        id='channel_activity',
+    ),
+    pytest.param(
+        lambda conn: crud.search_messages(conn, 'tablet', 100),
+        ['fct_messages'],
+        id='search_messages',
+    ),
+    pytest.param(
+        lambda conn: crud.get_channel_detection_timeline(conn, CHANNEL_NAME),
+        ['agg_daily_detections', 'dim_dates'],
+        id='channel_detections',
+    ),
+    pytest.param(
+        lambda conn: crud.get_top_detection_images(conn, 'person', 20),
+        ['fct_image_detections'],
+        id='top_detection_images',
+    ),
+    pytest.param(
+        lambda conn: crud.get_messages_with_object_class(conn, 'person', 0.5, 100),
+        ['fct_image_detections', 'fct_messages'],
+        id='messages_with_object_class',
+    ),
+]
+
+
+class _ExplainCursor:
+    """Cursor wrapper that runs EXPLAIN (FORMAT JSON) instead of the query itself."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, query, params=None):
+        if isinstance(query, sql.Composable):
+            query = query.as_string(self._cursor.connection)
+        self._cursor.execute("EXPLAIN (FORMAT JSON) " + query, params)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+
+class _ExplainConnection:
+    """Connection wrapper handed to the crud functions in place of the real connection."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return _ExplainCursor(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def plan_nodes(node):
+    """Yields every node of a JSON query plan."""
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def table_access(plan):
+    """Maps each table in a plan to the set of node types used to read it."""
+    access = {}
+    for node in plan_nodes(plan):
+        relation = node.get('Relation Name')
+        if relation:
+            access.setdefault(relation, set()).add(node['Node Type'])
+    return access
+
+
+@pytest.fixture(scope='module')
+def db_conn():
+    try:
+        conn = get_db_connection()
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    with conn.cursor() as cur:
+        cur.execute("SET enable_seqscan = off;")
+    yield conn
+    conn.rollback()
+    conn.close()
+
+
+@pytest.mark.parametrize('run_query, indexed_tables', API_QUERY_CHECKS)
+def test_api_query_reads_marts_through_indexes(db_conn, run_query, indexed_tables):
+    try:
+        rows = run_query(_ExplainConnection(db_conn))
+    except (psycopg2.errors.UndefinedTable, psycopg2.errors.UndefinedColumn) as e:
+        db_conn.rollback()
+        pytest.skip(f"The dbt marts are not built (run `dbt run` first): {e}")
+
+    plan = rows[0]['QUERY PLAN']
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    access = table_access(plan[0]['Plan'])
+    for table in indexed_tables:
+        node_types = access.get(table, set())
+        assert node_types & INDEX_SCAN_NODES, f"{table} is read with {sorted(node_types) or 'no scan'}, not an index."
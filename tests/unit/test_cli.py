@@ -0,0 +1,31 @@
+from src import cli
+from src.cli import check_project_root, parse_import_times
+
+IMPORTTIME_OUTPUT = """\
+import time: self [us] | cumulative | imported package
+import time:       150 |        150 |   _io
+import time:      2000 |       2500 |     telethon.errors
+import time:      1000 |       9000 |   telethon
+import time:       300 |        300 |       telethon.sync
+Traceback lines and other output are ignored
+import time:       400 |       1200 | psycopg2
+"""
+
+
+def test_parse_import_times_keeps_largest_cumulative_time_per_package():
+    packages = parse_import_times(IMPORTTIME_OUTPUT)
+
+    assert packages == {'_io': 150e-6, 'telethon': 9000e-6, 'psycopg2': 1200e-6}
+
+
+def test_parse_import_times_ignores_header_only_output():
+    assert parse_import_times("import time: self [us] | cumulative | imported package\n") == {}
+
+
+def test_check_project_root_accepts_the_source_checkout():
+    assert check_project_root() is None
+
+
+def test_check_project_root_rejects_an_installed_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(cli, 'PROJECT_ROOT', str(tmp_path))
+    assert 'pip install -e .' in check_project_root()
@@ -0,0 +1,70 @@
+import json
+import os
+
+from src.utils.data_lake import (
+    COMPACTED_FILE_NAME, compact_partition, is_compacted, iter_message_json_files, partition_media_paths,
+    read_compacted_records, read_partition_index,
+)
+
+
+def write_message(channel_path, record):
+    with open(os.path.join(channel_path, f"{record['id']}.json"), 'w', encoding='utf-8') as f:
+        json.dump(record, f)
+
+
+def make_partition(tmp_path, records):
+    channel_path = tmp_path / '2026-10-19' / 'CheMed123'
+    channel_path.mkdir(parents=True)
+    for record in records:
+        write_message(str(channel_path), record)
+    return str(channel_path)
+
+
+RECORDS = [
+    {'id': 2, 'date': '2026-10-19T10:00:00+00:00', 'channel_id': 7, 'message': 'second', 'views': 5},
+    {'id': 1, 'date': '2026-10-19T09:00:00+00:00', 'channel_id': 7, 'message': 'first',
+     'media_local_path': 'data/raw/images/2026-10-19/CheMed123/1.jpg'},
+]
+
+
+def test_compact_partition_round_trip(tmp_path):
+    channel_path = make_partition(tmp_path, RECORDS)
+    index = compact_partition(channel_path)
+
+    assert is_compacted(channel_path)
+    assert list(iter_message_json_files(channel_path)) == []
+    # Fields a message did not have are left out again when read back
+    assert read_compacted_records(channel_path) == sorted(RECORDS, key=lambda r: r['id'])
+    assert index == read_partition_index(channel_path)
+    assert index['rows'] == 2
+    assert index['message_ids'] == [1, 2]
+    assert (index['min_date'], index['max_date']) == ('2026-10-19T09:00:00+00:00', '2026-10-19T10:00:00+00:00')
+    assert partition_media_paths(channel_path) == ['data/raw/images/2026-10-19/CheMed123/1.jpg']
+
+
+def test_compact_partition_merges_late_files(tmp_path):
+    channel_path = make_partition(tmp_path, RECORDS)
+    compact_partition(channel_path)
+
+    late = {'id': 3, 'date': '2026-10-19T11:00:00+00:00', 'channel_id': 7, 'message': 'late', 'pinned': True}
+    rescraped = dict(RECORDS[0], views=50)
+    write_message(channel_path, late)
+    write_message(channel_path, rescraped)
+    index = compact_partition(channel_path)
+
+    records = read_compacted_records(channel_path)
+    assert [r['id'] for r in records] == [1, 2, 3]
+    assert records[1] == rescraped
+    assert records[2] == late
+    assert index['rows'] == 3
+    assert 'pinned' in index['columns']
+    assert list(iter_message_json_files(channel_path)) == []
+
+
+def test_compact_partition_without_json_files_is_a_no_op(tmp_path):
+    channel_path = make_partition(tmp_path, RECORDS)
+    compact_partition(channel_path)
+    mtime = os.path.getmtime(os.path.join(channel_path, COMPACTED_FILE_NAME))
+
+    assert compact_partition(channel_path) is None
+    assert os.path.getmtime(os.path.join(channel_path, COMPACTED_FILE_NAME)) == mtime
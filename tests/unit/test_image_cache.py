@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from src.utils.image_cache import LETTERBOX_FILL, ImageCache, content_hash, letterbox
+
+
+def test_letterbox_pads_wide_image_top_and_bottom():
+    image = Image.new('RGB', (200, 100), (255, 0, 0))
+    array = letterbox(image, 64)
+
+    assert array.shape == (64, 64, 3)
+    assert array.dtype == np.uint8
+    assert array.flags['C_CONTIGUOUS']
+    # 200x100 scales to 64x32, centred with 16 rows of padding above and below
+    assert (array[:16] == LETTERBOX_FILL).all()
+    assert (array[-16:] == LETTERBOX_FILL).all()
+    # Red in RGB is (0, 0, 255) in BGR
+    assert array[32, 32].tolist() == [0, 0, 255]
+
+
+def test_letterbox_pads_tall_image_left_and_right():
+    image = Image.new('RGB', (50, 100), (0, 255, 0))
+    array = letterbox(image, 64)
+
+    assert (array[:, :16] == LETTERBOX_FILL).all()
+    assert (array[:, -16:] == LETTERBOX_FILL).all()
+    assert array[32, 32].tolist() == [0, 255, 0]
+
+
+def test_letterbox_converts_grayscale_to_three_channels():
+    image = Image.new('L', (64, 64), 200)
+    array = letterbox(image, 32)
+
+    assert array.shape == (32, 32, 3)
+    assert (array == 200).all()
+
+
+def test_image_cache_stores_and_reuses_arrays(tmp_path):
+    image_path = tmp_path / '1.jpg'
+    Image.new('RGB', (100, 50), (10, 20, 30)).save(image_path)
+    cache = ImageCache(str(tmp_path / 'cache'), size=32)
+
+    first = cache.load(str(image_path))
+    second = cache.load(str(image_path))
+
+    assert (cache.misses, cache.hits) == (1, 1)
+    assert np.array_equal(first, second)
+    cached_files = [name for _, _, files in os.walk(tmp_path / 'cache') for name in files]
+    assert cached_files == [os.path.basename(cache.path_for(content_hash(str(image_path))))]
+
+
+def test_image_cache_writers_use_separate_temporary_files(tmp_path, monkeypatch):
+    image_path = tmp_path / '1.jpg'
+    Image.new('RGB', (40, 40)).save(image_path)
+    cache = ImageCache(str(tmp_path / 'cache'), size=32)
+    cached_path = cache.path_for(content_hash(str(image_path)))
+    partial_paths = []
+    replace = os.replace
+
+    def record_replace(source, target):
+        partial_paths.append(source)
+        replace(source, target)
+
+    monkeypatch.setattr(os, 'replace', record_replace)
+    for _ in range(3):
+        cache.load(str(image_path))
+        os.remove(cached_path) # Each load is a miss, as for separate detector processes
+
+    assert len(set(partial_paths)) == 3
+    assert os.listdir(os.path.dirname(cached_path)) == []
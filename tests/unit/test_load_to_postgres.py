@@ -0,0 +1,262 @@
+import asyncio
+import contextlib
+import json
+import threading
+from datetime import datetime, timezone
+
+import psycopg2
+import pytest
+
+from scripts import load_to_postgres
+from scripts.load_to_postgres import (
+    TYPED_COLUMNS, BufferedMessageWriter, StreamWriterError, insert_columns, message_row, typed_row,
+)
+
+RECORD = {
+    'id': 42,
+    'date': '2026-10-19T08:30:00+00:00',
+    'channel_id': 1001,
+    'channel_name': 'CheMed123',
+    'message': 'Paracetamol 500mg in stock',
+    'sender_id': None,
+    'views': 120,
+    'forwards': 3,
+    'replies_count': 0,
+    'has_media': True,
+    'media_type': 'MessageMediaPhoto',
+    'media_local_path': 'data/raw/images/2026-10-19/CheMed123/42.jpg',
+}
+
+
+def test_typed_row_maps_fields_to_typed_columns():
+    values, raw_data = typed_row(RECORD)
+
+    assert values == [RECORD.get(field) for field in TYPED_COLUMNS]
+    assert raw_data is None
+
+
+def test_typed_row_keeps_unknown_fields_in_raw_data():
+    record = dict(RECORD, pinned=True, raw_message_json='{"_": "Message"}')
+    record.pop('views')
+    values, raw_data = typed_row(record)
+
+    assert values[list(TYPED_COLUMNS).index('views')] is None
+    assert json.loads(raw_data) == {'pinned': True, 'raw_message_json': '{"_": "Message"}'}
+
+
+def test_message_row_matches_insert_columns():
+    row = message_row(RECORD)
+    columns = insert_columns()
+
+    assert len(row) == len(columns)
+    by_column = dict(zip(columns, row))
+    assert by_column['id'] == 42
+    assert by_column['channel_id'] == 1001
+    assert by_column['message_date'] == datetime(2026, 10, 19, 8, 30, tzinfo=timezone.utc)
+    assert by_column['message_text'] == RECORD['message']
+    assert by_column['raw_data'] is None
+
+
+def test_message_row_requires_key_fields():
+    for field in ('id', 'channel_id', 'date'):
+        record = dict(RECORD)
+        del record[field]
+        assert message_row(record) is None
+
+
+class FakeDatabase:
+    """Stands in for PostgreSQL behind BufferedMessageWriter's connections."""
+
+    def __init__(self, connection_failures=0, bad_ids=()):
+        self.rows = {}
+        self.connection_failures = connection_failures
+        self.bad_ids = set(bad_ids)
+        self.connections = 0
+        self.release = None # threading.Event that inserts wait for, when set
+
+    def connect(self):
+        self.connections += 1
+        return FakeConnection(self)
+
+    def insert(self, rows):
+        if self.release is not None:
+            self.release.wait(5)
+        if self.connection_failures:
+            self.connection_failures -= 1
+            raise psycopg2.OperationalError('server closed the connection unexpectedly')
+        if any(row[0] in self.bad_ids for row in rows):
+            raise psycopg2.DataError('bigint out of range')
+        inserted = [(row[0],) for row in rows if row[0] not in self.rows]
+        self.rows.update((row[0], row) for row in rows)
+        return inserted
+
+
+class FakeConnection:
+    def __init__(self, database):
+        self.database = database
+        self.closed = False
+
+    def cursor(self):
+        return contextlib.nullcontext(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+def fake_execute_values(cursor, query, rows, page_size=None, fetch=False):
+    return cursor.database.insert(rows)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(load_to_postgres, 'get_db_connection', database.connect)
+    monkeypatch.setattr(load_to_postgres, 'create_raw_table_if_not_exists', lambda cursor: None)
+    monkeypatch.setattr(load_to_postgres, 'execute_values', fake_execute_values)
+    monkeypatch.setattr(load_to_postgres, 'STREAM_RETRY_BACKOFF_S', 0.0)
+    return database
+
+
+def stream_records(ids, batch_size=10, max_queue_size=100):
+    """Streams records with the given IDs through a writer; returns its metrics."""
+    async def run():
+        writer = await BufferedMessageWriter(
+            batch_size=batch_size, flush_interval_s=0.05, max_queue_size=max_queue_size,
+        ).start()
+        for message_id in ids:
+            await writer.put(dict(RECORD, id=message_id))
+        await writer.close()
+        return writer.metrics
+
+    return asyncio.run(run())
+
+
+def test_writer_reconnects_and_retries_after_connection_errors(database):
+    database.connection_failures = 2
+    metrics = stream_records(range(1, 6))
+
+    assert sorted(database.rows) == [1, 2, 3, 4, 5]
+    assert metrics.counters['flush_retries'] == 2
+    assert metrics.counters['reconnects'] == 2
+    assert metrics.counters['messages_loaded'] == 5
+    assert 'flush_errors' not in metrics.counters
+
+
+def test_writer_drops_only_rows_the_database_rejects(database):
+    database.bad_ids = {3}
+    metrics = stream_records([1, 2, 3, 4, 2])
+
+    assert sorted(database.rows) == [1, 2, 4]
+    assert metrics.counters['messages_loaded'] == 3
+    assert metrics.counters['flush_errors'] == 1
+    assert metrics.counters['duplicates_skipped'] == 1
+
+
+def test_dead_writer_raises_from_put_and_close(database, monkeypatch):
+    monkeypatch.setattr(load_to_postgres, 'STREAM_FLUSH_RETRIES', 1)
+    database.connection_failures = 100
+
+    async def run():
+        writer = await BufferedMessageWriter(batch_size=1, flush_interval_s=0.05, max_queue_size=1).start()
+        with pytest.raises(StreamWriterError):
+            for message_id in range(1, 100):
+                await asyncio.wait_for(writer.put(dict(RECORD, id=message_id)), 5)
+        with pytest.raises(StreamWriterError):
+            await asyncio.wait_for(writer.close(), 5)
+        return writer.metrics
+
+    metrics = asyncio.run(run())
+    assert metrics.counters['flush_errors'] == 1
+    assert database.rows == {}
+
+
+def test_full_queue_makes_put_wait(database):
+    database.release = threading.Event()
+
+    async def run():
+        writer = await BufferedMessageWriter(batch_size=1, flush_interval_s=0.05, max_queue_size=2).start()
+        for message_id in range(1, 4):
+            await writer.put(dict(RECORD, id=message_id)) # One in the stalled flush, two queued
+        blocked_put = asyncio.ensure_future(writer.put(dict(RECORD, id=4)))
+        await asyncio.sleep(0.1)
+        assert not blocked_put.done()
+
+        database.release.set()
+        await asyncio.wait_for(blocked_put, 5)
+        await writer.close()
+        return writer.metrics
+
+    metrics = asyncio.run(run())
+    assert metrics.counters['backpressure_waits'] >= 1
+    assert sorted(database.rows) == [1, 2, 3, 4]
+
+
+class TransactionalConnection:
+    """Connection with PostgreSQL's transaction rules: after a failed statement
+    everything but ROLLBACK TO SAVEPOINT fails, and COMMIT rolls back."""
+
+    def __init__(self, bad_ids=()):
+        self.bad_ids = set(bad_ids)
+        self.rows = {}
+        self.pending = {}
+        self.savepoints = []
+        self.aborted = False
+        self.result = None
+
+    def cursor(self):
+        return self
+
+    def execute(self, query, params=None):
+        statement = repr(query)
+        if self.aborted and 'ROLLBACK TO SAVEPOINT' not in statement:
+            raise psycopg2.errors.InFailedSqlTransaction('current transaction is aborted')
+        if "SQL('SAVEPOINT " in statement:
+            self.savepoints.append(dict(self.pending))
+        elif 'ROLLBACK TO SAVEPOINT' in statement:
+            self.pending = dict(self.savepoints[-1])
+            self.aborted = False
+        elif 'RELEASE SAVEPOINT' in statement:
+            self.savepoints.pop()
+        elif 'SELECT id' in statement:
+            self.result = (params[0],) if params[0] in {**self.rows, **self.pending} else None
+        elif 'INSERT INTO' in statement:
+            if params[0] in self.bad_ids:
+                self.aborted = True
+                raise psycopg2.errors.NumericValueOutOfRange('integer out of range')
+            self.pending[params[0]] = params
+
+    def fetchone(self):
+        return self.result
+
+    def commit(self):
+        if not self.aborted:
+            self.rows.update(self.pending)
+        self.pending, self.savepoints, self.aborted = {}, [], False
+
+    def rollback(self):
+        self.pending, self.savepoints, self.aborted = {}, [], False
+
+    def close(self):
+        pass
+
+
+def test_failed_insert_only_discards_its_own_file(tmp_path, monkeypatch):
+    channel_path = tmp_path / '2026-10-19' / 'CheMed123'
+    channel_path.mkdir(parents=True)
+    for message_id in (1, 2, 3):
+        (channel_path / f'{message_id}.json').write_text(json.dumps(dict(RECORD, id=message_id)))
+    conn = TransactionalConnection(bad_ids={2})
+    monkeypatch.setattr(load_to_postgres, 'get_db_connection', lambda: conn)
+    monkeypatch.setattr(load_to_postgres, 'create_raw_table_if_not_exists', lambda cursor: None)
+
+    metrics = load_to_postgres.load_json_to_postgres(str(tmp_path))
+
+    assert sorted(conn.rows) == [1, 3]
+    assert metrics.counters['messages_loaded'] == 2
+    assert metrics.counters['file_errors'] == 1
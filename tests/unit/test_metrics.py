@@ -0,0 +1,59 @@
+import io
+
+from src.utils.metrics import METRICS_PREFIX, StageMetrics, parse_metrics_lines
+
+
+def test_counters_and_error_count():
+    metrics = StageMetrics('load', rate_counters=('messages_loaded',))
+    metrics.increment('messages_loaded', 10)
+    metrics.increment('messages_loaded')
+    metrics.increment('flush_errors', 2)
+    metrics.increment('channels_failed')
+    metrics.increment('duplicates_skipped', 5)
+
+    assert metrics.counters == {'messages_loaded': 11, 'flush_errors': 2, 'channels_failed': 1, 'duplicates_skipped': 5}
+    assert metrics.error_count == 3
+
+
+def test_timer_accumulates():
+    metrics = StageMetrics('detect')
+    with metrics.timer('inference'):
+        pass
+    first = metrics.durations['inference']
+    with metrics.timer('inference'):
+        pass
+    assert metrics.durations['inference'] >= first >= 0.0
+
+
+def test_summary_reports_throughput_for_rate_counters():
+    metrics = StageMetrics('scrape', rate_counters=('messages', 'images'))
+    metrics.increment('messages', 4)
+    summary = metrics.summary()
+
+    assert summary['stage'] == 'scrape'
+    assert summary['counters'] == {'messages': 4}
+    assert set(summary['throughput']) == {'messages_per_s', 'images_per_s'}
+    assert summary['throughput']['images_per_s'] == 0.0
+    assert summary['error_count'] == 0
+
+
+def test_emitted_summary_is_parsed_back(monkeypatch):
+    monkeypatch.delenv('METRICS_TEXTFILE_DIR', raising=False)
+    metrics = StageMetrics('load')
+    metrics.increment('messages_loaded', 3)
+    stream = io.StringIO()
+    summary = metrics.emit(stream)
+
+    output = "INFO starting\n" + stream.getvalue() + "INFO done\n"
+    assert parse_metrics_lines(output) == [summary]
+
+
+def test_parse_metrics_lines_skips_other_and_malformed_lines():
+    output = "\n".join([
+        "plain log line",
+        METRICS_PREFIX + '{"stage": "a"}',
+        METRICS_PREFIX + '{not json',
+        "  " + METRICS_PREFIX + '{"stage": "b"}  ',
+    ])
+    assert parse_metrics_lines(output) == [{'stage': 'a'}, {'stage': 'b'}]
+    assert parse_metrics_lines(None) == []
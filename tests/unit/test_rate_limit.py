@@ -0,0 +1,59 @@
+import asyncio
+
+from src.utils.rate_limit import AdaptiveRateLimiter
+
+
+def test_flood_wait_cuts_rate_and_drains_bucket():
+    limiter = AdaptiveRateLimiter(rate=2.0, burst=5, backoff_factor=0.5)
+    limiter.record_flood_wait(30)
+
+    assert limiter.rate == 1.0
+    assert limiter.tokens == 0.0
+    assert limiter.stats()['flood_waits'] == 1
+    assert limiter.stats()['flood_wait_seconds'] == 30
+
+
+def test_rate_never_drops_below_min_rate():
+    limiter = AdaptiveRateLimiter(rate=1.0, min_rate=0.2, backoff_factor=0.5)
+    for _ in range(10):
+        limiter.record_flood_wait(1)
+    assert limiter.rate == 0.2
+
+
+def test_rate_recovers_after_runs_of_successes_up_to_max_rate():
+    limiter = AdaptiveRateLimiter(rate=1.0, backoff_factor=0.5, recovery_step=0.25, recovery_after=3)
+    limiter.record_flood_wait(1)
+    assert limiter.rate == 0.5
+
+    for _ in range(2):
+        limiter.record_success()
+    assert limiter.rate == 0.5 # Not enough successes yet
+    limiter.record_success()
+    assert limiter.rate == 0.75
+
+    for _ in range(30):
+        limiter.record_success()
+    assert limiter.rate == 1.0
+
+
+def test_flood_wait_resets_success_run():
+    limiter = AdaptiveRateLimiter(rate=1.0, backoff_factor=0.5, recovery_step=0.25, recovery_after=3)
+    limiter.record_flood_wait(1)
+    limiter.record_success()
+    limiter.record_success()
+    limiter.record_flood_wait(1)
+    limiter.record_success()
+    assert limiter.rate == 0.25
+
+
+def test_acquire_uses_burst_then_throttles():
+    limiter = AdaptiveRateLimiter(rate=100.0, burst=3)
+
+    async def acquire(count):
+        for _ in range(count):
+            await limiter.acquire()
+
+    asyncio.run(acquire(3))
+    assert limiter.throttled_seconds == 0.0
+    asyncio.run(acquire(2))
+    assert limiter.throttled_seconds > 0.0
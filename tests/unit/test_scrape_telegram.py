@@ -0,0 +1,232 @@
+import asyncio
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+from telethon.errors import FloodWaitError
+from telethon.tl.types import (
+    Document, MessageMediaDocument, MessageMediaPhoto, Photo, PhotoSize, PhotoSizeProgressive, PhotoStrippedSize,
+)
+
+from scripts import scrape_telegram
+from src.utils.media_index import MediaIndex, link_or_copy
+from src.utils.metrics import StageMetrics
+from src.utils.rate_limit import AdaptiveRateLimiter
+
+PHOTO_SIZES = [
+    PhotoStrippedSize(type='i', bytes=b'\x01'),
+    PhotoSize(type='m', w=320, h=240, size=15_000),
+    PhotoSize(type='x', w=800, h=600, size=60_000),
+    PhotoSizeProgressive(type='y', w=1280, h=960, sizes=[40_000, 120_000, 250_000]),
+]
+
+
+def make_photo(sizes=PHOTO_SIZES, photo_id=1):
+    return Photo(id=photo_id, access_hash=99, file_reference=b'', date=None, sizes=sizes, dc_id=1)
+
+
+def make_document(mime_type='image/png', size=500_000):
+    thumbs = [PhotoSize(type='m', w=320, h=320, size=10_000), PhotoSize(type='x', w=800, h=800, size=40_000)]
+    return Document(id=2, access_hash=98, file_reference=b'', date=None, mime_type=mime_type, size=size,
+                    dc_id=1, attributes=[], thumbs=thumbs)
+
+
+class FakeMessage:
+    """Message whose download_media writes `content` to the requested file."""
+
+    def __init__(self, media, content=b'image-bytes', error=None):
+        self.media = media
+        self.content = content
+        self.error = error
+        self.downloads = []
+
+    async def download_media(self, file, thumb=None):
+        self.downloads.append((file, thumb))
+        with open(file, 'wb') as f:
+            f.write(self.content[:3]) # Part of the file lands before a failure
+            if self.error is not None:
+                raise self.error
+            f.write(self.content[3:])
+        return file
+
+
+@pytest.fixture
+def images_path(tmp_path, monkeypatch):
+    path = tmp_path / 'images'
+    monkeypatch.setattr(scrape_telegram, 'TELEGRAM_IMAGES_PATH', str(path))
+    monkeypatch.setattr(scrape_telegram, 'MEDIA_DOWNLOAD_MODE', 'full')
+    monkeypatch.setattr(scrape_telegram, 'MEDIA_MAX_BYTES', 0)
+    return path
+
+
+def download(message, metrics, media_index=None, message_id=10):
+    limiter = AdaptiveRateLimiter(rate=1000, burst=100)
+    return asyncio.run(scrape_telegram.download_media(
+        message, 'CheMed123', message_id, metrics=metrics, limiter=limiter, media_index=media_index,
+    ))
+
+
+def test_select_thumb_picks_smallest_size_covering_min_side(monkeypatch):
+    monkeypatch.setattr(scrape_telegram, 'MEDIA_THUMB_MIN_SIDE', 640)
+    assert scrape_telegram.select_thumb(make_photo()).type == 'x'
+
+    monkeypatch.setattr(scrape_telegram, 'MEDIA_THUMB_MIN_SIDE', 2000)
+    assert scrape_telegram.select_thumb(make_photo()).type == 'y' # Largest when none is big enough
+
+
+def test_select_thumb_uses_document_thumbs_and_ignores_stripped_sizes(monkeypatch):
+    monkeypatch.setattr(scrape_telegram, 'MEDIA_THUMB_MIN_SIDE', 640)
+    assert scrape_telegram.select_thumb(make_document()).type == 'x'
+    assert scrape_telegram.select_thumb(make_photo(sizes=[PhotoStrippedSize(type='i', bytes=b'')])) is None
+
+
+def test_media_size_bytes():
+    assert scrape_telegram.media_size_bytes(make_photo()) == 250_000
+    assert scrape_telegram.media_size_bytes(make_document(size=500_000)) == 500_000
+
+
+def test_oversize_media_is_skipped(images_path, monkeypatch):
+    monkeypatch.setattr(scrape_telegram, 'MEDIA_MAX_BYTES', 100_000)
+    message = FakeMessage(MessageMediaPhoto(photo=make_photo()))
+    metrics = StageMetrics('scrape')
+
+    assert download(message, metrics) is None
+    assert message.downloads == []
+    assert metrics.counters == {'media_skipped_oversize': 1}
+
+
+def test_thumbnail_mode_saves_jpeg_for_image_documents(images_path, monkeypatch):
+    monkeypatch.setattr(scrape_telegram, 'MEDIA_DOWNLOAD_MODE', 'thumbnail')
+    monkeypatch.setattr(scrape_telegram, 'MEDIA_MAX_BYTES', 100_000) # Only limits full downloads
+    message = FakeMessage(MessageMediaDocument(document=make_document(mime_type='image/png')))
+
+    file_path = download(message, StageMetrics('scrape'))
+    assert file_path == os.path.join(str(images_path), 'CheMed123', '10.jpg')
+    assert message.downloads[0][1].type == 'x'
+
+
+def test_failed_download_leaves_no_partial_file(images_path):
+    message = FakeMessage(MessageMediaPhoto(photo=make_photo()), error=ConnectionError('reset'))
+    metrics = StageMetrics('scrape')
+
+    assert download(message, metrics) is None
+    assert metrics.counters['media_errors'] == 1
+    assert os.listdir(images_path / 'CheMed123') == []
+
+
+def test_repeated_media_is_linked_from_the_index(images_path, tmp_path):
+    media_index = MediaIndex(str(tmp_path / 'media_index.sqlite3'), root=str(tmp_path))
+    metrics = StageMetrics('scrape')
+    original = FakeMessage(MessageMediaPhoto(photo=make_photo()))
+    forward = FakeMessage(MessageMediaPhoto(photo=make_photo()))
+
+    first_path = download(original, metrics, media_index, message_id=10)
+    second_path = download(forward, metrics, media_index, message_id=11)
+
+    assert forward.downloads == []
+    assert metrics.counters['media_deduplicated'] == 1
+    with open(second_path, 'rb') as f:
+        assert f.read() == b'image-bytes'
+    # Stored relative to the index root, so the entry survives a move of the checkout
+    stored_path = media_index.conn.execute("SELECT path FROM media_files").fetchone()[0]
+    assert stored_path == os.path.join('images', 'CheMed123', '10.jpg')
+    assert media_index.lookup(1, 99) == first_path
+    media_index.close()
+
+
+def test_media_index_lookup_ignores_deleted_files(tmp_path):
+    media_index = MediaIndex(str(tmp_path / 'media_index.sqlite3'), root=str(tmp_path))
+    image_path = tmp_path / 'a.jpg'
+    image_path.write_bytes(b'x')
+    media_index.record(1, 2, str(image_path))
+    image_path.unlink()
+
+    assert media_index.lookup(1, 2) is None
+    assert media_index.lookup(3, 4) is None
+    media_index.close()
+
+
+def test_link_or_copy_replaces_existing_target(tmp_path):
+    source = tmp_path / 'source.jpg'
+    source.write_bytes(b'new')
+    target = tmp_path / 'channel' / 'target.jpg'
+    target.parent.mkdir()
+    target.write_bytes(b'old')
+
+    link_or_copy(str(source), str(target))
+    assert target.read_bytes() == b'new'
+    assert link_or_copy(str(source), str(source)) == str(source)
+
+
+
+class FloodingClient:
+    """Channel history of messages 1..count that raises FLOOD_WAITs part-way through."""
+
+    def __init__(self, count=250, flood_after=(40, 120)):
+        self.messages = [
+            SimpleNamespace(id=i, date=datetime(2026, 10, 19, tzinfo=timezone.utc), message=f"message {i}",
+                            sender_id=None, views=1, forwards=0, replies=None, media=None)
+            for i in range(count, 0, -1)
+        ]
+        self.flood_after = list(flood_after) # Messages yielded in total before each FLOOD_WAIT
+        self.yielded = 0
+        self.requests = []
+
+    async def get_entity(self, channel_url):
+        return SimpleNamespace(id=7, username='CheMed123', title='CheMed')
+
+    async def iter_messages(self, entity, limit=None, max_id=None, offset_date=None):
+        self.requests.append({'limit': limit, 'max_id': max_id})
+        sent = 0
+        for message in self.messages:
+            if max_id is not None and message.id >= max_id:
+                continue
+            if limit is not None and sent >= limit:
+                return
+            if self.flood_after and self.yielded == self.flood_after[0]:
+                self.flood_after.pop(0)
+                raise FloodWaitError(request=None, capture=0)
+            self.yielded += 1
+            sent += 1
+            yield message
+
+
+@pytest.fixture
+def saved_ids(tmp_path, monkeypatch):
+    monkeypatch.setattr(scrape_telegram, 'TELEGRAM_MESSAGES_PATH', str(tmp_path / 'telegram_messages'))
+    saved = []
+    save_message_record = scrape_telegram.save_message_record
+
+    def record_save(message, *args):
+        saved.append(message.id)
+        save_message_record(message, *args)
+
+    monkeypatch.setattr(scrape_telegram, 'save_message_record', record_save)
+    return saved
+
+
+def scrape(client, limit=None):
+    metrics = StageMetrics('scrape')
+    limiter = AdaptiveRateLimiter(rate=1000, burst=100)
+    asyncio.run(scrape_telegram.scrape_channel(client, 'https://t.me/CheMed123', limit=limit, metrics=metrics,
+                                               limiter=limiter))
+    return metrics
+
+
+def test_scrape_resumes_after_flood_wait_without_gaps_or_duplicates(saved_ids):
+    client = FloodingClient()
+    metrics = scrape(client)
+
+    assert saved_ids == list(range(250, 0, -1))
+    assert metrics.counters['flood_waits'] == 2
+    assert metrics.counters['channels_scraped'] == 1
+    assert [request['max_id'] for request in client.requests] == [None, 211, 131]
+
+
+def test_scrape_resume_after_flood_wait_respects_limit(saved_ids):
+    client = FloodingClient(flood_after=(40,))
+    scrape(client, limit=100)
+
+    assert saved_ids == list(range(250, 150, -1))
+    assert client.requests[1] == {'limit': 60, 'max_id': 211}